@@ -6,7 +6,8 @@ accounting_system.code 包初始化文件
 
 __version__ = "1.0.0"
 
-from .database import get_connection, init_database, get_records_with_leak, get_connection_insecure
+from .database import get_connection, get_backend, set_backend, get_pool, get_pool_stats, close_pool, init_database, get_records_with_leak, get_connection_insecure
+from .cache import get_cache_stats, clear_cache
 from .category import Category
 from .record import Record
 from .utils import log, validate_amount, confirm_exit, format_currency, parse_date, backup_data_unsafe, get_api_config
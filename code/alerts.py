@@ -0,0 +1,216 @@
+"""
+预算提醒模块：记录写入后由后台线程实时检测预算阈值穿越
+
+Record.save / save_many 提交后发布 RECORDS_WRITTEN 事件，AlertWorker 只把增量放入队列；
+后台线程合并队列中的全部增量，一次查询取出受影响（日期覆盖且分类匹配）的预算，
+与该预算上次观察到的状态比较，状态升级（正常→接近、→超支）时推送到各个 sink。
+
+上次状态在 start() 时按全部预算初始化，之后每次检测更新。不能用“当前 spent_cents 减本批增量”
+还原写入前状态：本批入队之后提交的写入已计入 spent_cents 却不在本批增量中，会高估写入前的支出而漏报。
+只有 start() 之后新建的预算第一次出现时才用这种还原作为初值。
+"""
+
+import json
+import os
+import queue
+import threading
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+from .budget import Budget
+from .database import get_connection
+from .events import RECORDS_WRITTEN, subscribe
+from .utils import as_date, log, to_cents
+
+# 状态严重程度，只有升级才推送
+SEVERITY = {'ok': 0, 'warning': 1, 'exceeded': 2}
+
+AFFECTED_BUDGETS_SQL = """
+    SELECT b.id, b.period, b.amount, b.start_date, b.end_date, b.spent_cents,
+           b.category_id, c.name AS category
+    FROM budgets b
+    LEFT JOIN categories c ON b.category_id = c.id
+    WHERE b.start_date <= %s AND b.end_date >= %s AND b.category_id IN ({categories})
+"""
+
+
+# ==================== 推送目标 ====================
+
+class LogFileSink:
+    """以 JSON Lines 追加写入本地文件"""
+
+    def __init__(self, path="logs/alerts.log"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, alert):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(alert, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class CallbackSink:
+    """调用任意函数"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __call__(self, alert):
+        self.callback(alert)
+
+
+class WebhookSink:
+    """以 JSON POST 到 HTTP 地址（如本地的通知服务）"""
+
+    def __init__(self, url, timeout=2.0):
+        if not url.startswith(("http://", "https://")):
+            raise ValueError("Webhook 地址必须以 http:// 或 https:// 开头")
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, alert):
+        body = json.dumps(alert, ensure_ascii=False, default=str).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers={"Content-Type": "application/json; charset=utf-8"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+# ==================== 后台检测 ====================
+
+def _deltas(rows):
+    """写入行 → {(日期, 分类 id): 支出金额（分）}，收入不影响预算"""
+    deltas = defaultdict(int)
+    for record_type, amount, category_id, _, date_value in rows:
+        if record_type == 'expense':
+            deltas[(as_date(date_value), category_id or 0)] += to_cents(amount)
+    return deltas
+
+
+class AlertWorker:
+    """
+    预算提醒后台线程
+    sinks: 可调用对象列表，接收提醒字典（Budget.evaluate 的结果加 previous_status / detected_at）
+    """
+
+    def __init__(self, sinks=(), threshold=0.8):
+        self.sinks = list(sinks)
+        self.threshold = threshold
+        self._queue = queue.Queue()
+        self._thread = None
+        self._unsubscribe = None
+        self._statuses = {}  # 预算 id -> 上次观察到的状态（只在后台线程中读写）
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        # 先订阅再取状态：两者之间提交的写入既在状态里也在队列里，只会少报重复、不会漏报
+        self._unsubscribe = subscribe(RECORDS_WRITTEN, self._on_written)
+        self._statuses = {
+            budget['id']: Budget.evaluate(budget, self.threshold)['status'] for budget in Budget.get_all_budgets()
+        }
+        self._thread = threading.Thread(target=self._run, name="budget-alerts", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """停止接收事件，处理完队列中已有的增量后退出"""
+        if self._thread is None:
+            return
+        self._unsubscribe()
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def flush(self):
+        """阻塞直到队列中的增量全部处理完"""
+        self._queue.join()
+
+    def _on_written(self, rows):
+        # 在写入线程中执行，只做入队
+        deltas = _deltas(rows)
+        if deltas:
+            self._queue.put(deltas)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # 合并已排队的增量，批量导入时一次检测
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            merged = defaultdict(int)
+            for deltas in batch:
+                for key, cents in (deltas or {}).items():
+                    merged[key] += cents
+            try:
+                if merged:
+                    self.check(merged)
+            except Exception as e:
+                log(f"预算提醒检测失败: {e}", "ERROR")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping:
+                return
+
+    def check(self, deltas):
+        """根据 {(日期, 分类 id): 金额分} 增量检测受影响预算，返回推送的提醒列表"""
+        days = [day for day, _ in deltas]
+        categories = sorted({0} | {category_id for _, category_id in deltas})
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                AFFECTED_BUDGETS_SQL.format(categories=", ".join(["%s"] * len(categories))),
+                [max(days), min(days)] + categories,
+            )
+            budgets = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        alerts = []
+        for budget in budgets:
+            delta = sum(
+                cents for (day, category_id), cents in deltas.items()
+                if budget['start_date'] <= day <= budget['end_date']
+                and budget['category_id'] in (0, category_id)
+            )
+            if not delta:
+                continue
+            after = Budget.evaluate(budget, self.threshold)
+            previous = self._statuses.get(budget['id'])
+            if previous is None:
+                # start() 之后新建的预算：以扣除本批增量的状态为初值
+                before = {**budget, 'spent_cents': budget['spent_cents'] - delta}
+                previous = Budget.evaluate(before, self.threshold)['status']
+            self._statuses[budget['id']] = after['status']
+            if SEVERITY[after['status']] > SEVERITY[previous]:
+                alert = dict(after, previous_status=previous,
+                             detected_at=datetime.now().isoformat(timespec="milliseconds"))
+                alerts.append(alert)
+                self._dispatch(alert)
+        return alerts
+
+    def _dispatch(self, alert):
+        for sink in self.sinks:
+            try:
+                sink(alert)
+            except Exception as e:
+                log(f"预算提醒推送失败（{type(sink).__name__}）: {e}", "ERROR")
+
+
+def start_alert_worker(sinks=(), threshold=0.8):
+    """创建并启动预算提醒线程"""
+    return AlertWorker(sinks, threshold).start()
@@ -0,0 +1,265 @@
+"""
+分析引擎模块：把账本一次性载入 NumPy 列式数组，在内存中完成向量化分组统计
+
+列布局：
+- cents      int64   金额（分）
+- days       int32   自 1970-01-01 起的天数
+- months     int32   自 1970-01 起的月数（由 days 派生）
+- categories uint16  分类名编码，0 为“未分类”
+- types      uint8   类型位掩码：TYPE_INCOME / TYPE_EXPENSE
+
+AnalyticsStatistics 与 Statistics 的方法同名、返回结构相同（金额为 Money），Chart 可直接使用。
+"""
+
+from datetime import date
+
+import numpy as np
+
+from .cache import data_version
+from .database import get_backend, get_connection
+from .formula import FormulaError, compile_formula
+from .money import Money
+
+TYPE_INCOME = 1
+TYPE_EXPENSE = 2
+TYPE_CODES = {"income": TYPE_INCOME, "expense": TYPE_EXPENSE}
+
+UNCATEGORIZED = "未分类"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+LOAD_CHUNK_SIZE = 5000
+
+
+def load_sql(backend):
+    """
+    读取账本列的查询：类型编码与金额（分）在 SQL 中算好，Python 端按列批量转换为数组
+    没有日期的记录不属于任何日期或月份，与月度汇总一样不载入
+    """
+    # 与 utils.to_cents / 月度汇总一致：逐行四舍五入到分
+    cents = backend.cast_integer("ROUND(amount * 100)")
+    return f"""
+        SELECT CASE type WHEN 'income' THEN {TYPE_INCOME} WHEN 'expense' THEN {TYPE_EXPENSE} ELSE 0 END,
+               {cents}, COALESCE(category_id, 0), date
+        FROM records
+        WHERE date IS NOT NULL
+    """
+
+
+class Ledger:
+    """列式账本（只读快照）"""
+
+    def __init__(self, cents, days, categories, types, category_names):
+        self.cents = np.asarray(cents, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.categories = np.asarray(categories, dtype=np.uint16)
+        self.types = np.asarray(types, dtype=np.uint8)
+        self.category_names = list(category_names)
+        self.months = self.days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+
+    def __len__(self):
+        return len(self.cents)
+
+    @staticmethod
+    def load(chunk_size=LOAD_CHUNK_SIZE):
+        """从数据库流式读取全部记录构建账本"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, name FROM categories")
+            # 同名分类与 SQL 的 GROUP BY c.name 一样合并为一组
+            names = [UNCATEGORIZED]
+            name_codes = {UNCATEGORIZED: 0}
+            id_codes = {}
+            for category_id, name in cursor.fetchall():
+                code = name_codes.get(name)
+                if code is None:
+                    code = name_codes[name] = len(names)
+                    names.append(name)
+                id_codes[category_id] = code
+            if len(names) > np.iinfo(np.uint16).max:
+                raise ValueError("分类数量超出 uint16 编码范围")
+            # 分类 id -> 编码的查找表；未分类（0）与已删除的分类都映射为 0
+            lookup = np.zeros(max(id_codes, default=0) + 1, dtype=np.uint16)
+            for category_id, code in id_codes.items():
+                lookup[category_id] = code
+
+            cents, days, categories, types = [], [], [], []
+            cursor.execute(load_sql(get_backend()))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                count = len(rows)
+                type_col, cents_col, category_col, day_col = zip(*rows)
+                types.append(np.fromiter(type_col, dtype=np.uint8, count=count))
+                cents.append(np.fromiter(cents_col, dtype=np.int64, count=count))
+                ids = np.fromiter(category_col, dtype=np.int64, count=count)
+                known = (ids >= 0) & (ids < len(lookup))
+                categories.append(np.where(known, lookup[np.where(known, ids, 0)], 0))
+                days.append(np.array(day_col, dtype="datetime64[D]").astype(np.int64))
+        finally:
+            cursor.close()
+            conn.close()
+
+        def column(chunks, dtype):
+            return np.concatenate(chunks).astype(dtype) if chunks else np.zeros(0, dtype=dtype)
+
+        return Ledger(column(cents, np.int64), column(days, np.int32), column(categories, np.uint16),
+                      column(types, np.uint8), names)
+
+    # ---------- 切片 ----------
+
+    def period_mask(self, year=None, month=None):
+        """按年 / 年月过滤的布尔掩码（与 Statistics 一样只有 year 时才生效）"""
+        if year and month:
+            return self.months == (int(year) - 1970) * 12 + int(month) - 1
+        if year:
+            start = (int(year) - 1970) * 12
+            return (self.months >= start) & (self.months < start + 12)
+        return np.ones(len(self), dtype=bool)
+
+    def date_mask(self, start_date=None, end_date=None):
+        """按日期闭区间过滤的布尔掩码"""
+        mask = np.ones(len(self), dtype=bool)
+        if start_date:
+            mask &= self.days >= start_date.toordinal() - EPOCH_ORDINAL
+        if end_date:
+            mask &= self.days <= end_date.toordinal() - EPOCH_ORDINAL
+        return mask
+
+    def type_mask(self, record_type):
+        return (self.types & TYPE_CODES[record_type]) != 0
+
+    def subset(self, mask):
+        """按掩码取子账本，便于交互式逐层切片"""
+        ledger = Ledger.__new__(Ledger)
+        ledger.cents = self.cents[mask]
+        ledger.days = self.days[mask]
+        ledger.months = self.months[mask]
+        ledger.categories = self.categories[mask]
+        ledger.types = self.types[mask]
+        ledger.category_names = self.category_names
+        return ledger
+
+    # ---------- 分组统计 ----------
+
+    def sum_by_category(self, mask):
+        """各分类金额合计（分），下标为分类编码"""
+        totals = np.zeros(len(self.category_names), dtype=np.int64)
+        np.add.at(totals, self.categories[mask], self.cents[mask])
+        return totals
+
+    def sum_by_month(self, mask):
+        """返回 (月序号数组, 金额合计数组)，只包含有记录的月份"""
+        months = self.months[mask]
+        if not len(months):
+            return months, np.zeros(0, dtype=np.int64)
+        base = months.min()
+        totals = np.zeros(int(months.max() - base) + 1, dtype=np.int64)
+        np.add.at(totals, months - base, self.cents[mask])
+        present = np.bincount(months - base).nonzero()[0]
+        return present + base, totals[present]
+
+    # ---------- 公式派生列 ----------
+
+    # 公式可引用的列：名称 -> 由账本计算该列的函数
+    FORMULA_COLUMNS = {
+        "amount": lambda l: l.cents / 100,
+        "cents": lambda l: l.cents,
+        "year": lambda l: l.months // 12 + 1970,
+        "month": lambda l: l.months % 12 + 1,
+        "day": lambda l: (l.days - l.months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int32)) + 1,
+        "weekday": lambda l: (l.days + 3) % 7,    # 0 为周一（1970-01-01 是周四）
+        "is_income": lambda l: (l.types & TYPE_INCOME) != 0,
+        "is_expense": lambda l: (l.types & TYPE_EXPENSE) != 0,
+        "category": lambda l: l.categories,
+    }
+
+    def formula_columns(self, names=None):
+        """公式可用的列，names 指定时只计算需要的列"""
+        names = self.FORMULA_COLUMNS.keys() if names is None else names
+        unknown = set(names) - self.FORMULA_COLUMNS.keys()
+        if unknown:
+            raise KeyError(f"账本没有列: {', '.join(sorted(unknown))}")
+        return {name: self.FORMULA_COLUMNS[name](self) for name in names}
+
+    def evaluate(self, formula, mask=None):
+        """对每条记录计算公式（字符串或 compile_formula 的结果），返回数组"""
+        if isinstance(formula, str):
+            formula = compile_formula(formula)
+        unknown = formula.variables - self.FORMULA_COLUMNS.keys()
+        if unknown:
+            raise FormulaError(f"未知的列: {', '.join(sorted(unknown))}（可用: {', '.join(self.FORMULA_COLUMNS)}）")
+        ledger = self if mask is None else self.subset(mask)
+        return formula.evaluate_columns(ledger.formula_columns(formula.variables), len(ledger))
+
+    def sum_by_type(self, mask):
+        """按类型合计（分），返回 {type: cents}，只包含有记录的类型"""
+        result = {}
+        for record_type, bit in TYPE_CODES.items():
+            selected = mask & ((self.types & bit) != 0)
+            if selected.any():
+                result[record_type] = int(self.cents[selected].sum())
+        return result
+
+
+class AnalyticsStatistics:
+    """
+    基于 Ledger 的统计，接口与 Statistics 一致
+    账本按数据版本号缓存，本进程写入记录后下次调用会自动重新载入。
+    """
+
+    def __init__(self, ledger=None):
+        self.period = "month"
+        self._ledger = ledger
+        self._version = None if ledger is None else data_version()
+        self._pinned = ledger is not None
+
+    @property
+    def ledger(self):
+        if not self._pinned and (self._ledger is None or self._version != data_version()):
+            version = data_version()
+            self._ledger = Ledger.load()
+            self._version = version
+        return self._ledger
+
+    def get_expense_by_category(self, year=None, month=None):
+        """按分类统计支出：[{"category", "total"}]，按金额降序"""
+        ledger = self.ledger
+        totals = ledger.sum_by_category(ledger.type_mask("expense") & ledger.period_mask(year, month))
+        codes = np.flatnonzero(totals > 0)
+        codes = codes[np.argsort(-totals[codes], kind="stable")]
+        return [
+            {"category": ledger.category_names[code], "total": Money(int(totals[code]))}
+            for code in codes
+        ]
+
+    def get_expense_trend(self, year=None):
+        """月度支出趋势：[{"year", "month", "monthly_expense"}]，按时间升序"""
+        ledger = self.ledger
+        months, totals = ledger.sum_by_month(ledger.type_mask("expense") & ledger.period_mask(year))
+        return [
+            {"year": int(m) // 12 + 1970, "month": int(m) % 12 + 1, "monthly_expense": Money(int(t))}
+            for m, t in zip(months, totals)
+        ]
+
+    def get_income_vs_expense(self, year=None, month=None):
+        """收入支出对比：[{"type", "total"}]"""
+        ledger = self.ledger
+        totals = ledger.sum_by_type(ledger.period_mask(year, month))
+        return [{"type": t, "total": Money(int(c))} for t, c in totals.items()]
+
+    def get_formula_by_category(self, formula, year=None, month=None, record_type="expense"):
+        """
+        按分类汇总公式派生列（如 "amount * 0.06" 的税费），[{"category", "total"}]，按合计降序
+        合计为浮点数，公式结果不一定是金额
+        """
+        ledger = self.ledger
+        mask = ledger.period_mask(year, month)
+        if record_type:
+            mask &= ledger.type_mask(record_type)
+        values = ledger.evaluate(formula, mask)
+        totals = np.zeros(len(ledger.category_names), dtype=np.float64)
+        np.add.at(totals, ledger.categories[mask], values)
+        codes = np.unique(ledger.categories[mask])
+        codes = codes[np.argsort(-totals[codes], kind="stable")]
+        return [{"category": ledger.category_names[code], "total": float(totals[code])} for code in codes]
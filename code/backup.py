@@ -0,0 +1,362 @@
+"""
+备份模块：进程内的流式、压缩、增量备份与并行恢复
+
+- 所有表在同一个一致性快照事务内读取（MySQL consistent snapshot / SQLite WAL 读事务）
+- 按主键分块流式读取，每块写成一个 gzip / lzma 压缩的 JSON Lines 文件，内存占用与表大小无关
+- manifest.json 记录每块的行数、主键范围与 sha256，恢复前逐块校验
+- 增量备份：records 只写入 id 大于上次水位线的行（记录只追加，不原地修改）；
+  categories / budgets / monthly_rollups 体积小，每次全量复制
+- 恢复时沿 base 链找到全量备份，先校验链上所有块（存在、sha256、行数），全部通过才动数据库；
+  各块由多个线程并行解压解析，清空与导入在同一个事务内完成，中途失败时原数据保持不变
+
+    python -m code.backup create --dir backups [--incremental] [--compression lzma]
+    python -m code.backup restore --dir backups [--id 备份编号] [--workers 4]
+    python -m code.backup list --dir backups
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .cache import bump_data_version, clear_cache
+from .database import get_backend, get_connection
+from .migrations import get_schema_version
+from .utils import log
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 5000
+RESTORE_WORKERS = 4
+
+COMPRESSORS = {
+    "gzip": (".jsonl.gz", gzip.open),
+    "lzma": (".jsonl.xz", lzma.open),
+}
+
+# 表名 -> (列, 分块主键, 是否按主键水位线增量)；顺序即恢复顺序（外键依赖在前）
+TABLES = {
+    "categories": (("id", "name", "keywords"), "id", False),
+    "records": (("id", "type", "amount", "category_id", "description", "date"), "id", True),
+    "budgets": (("id", "period", "amount", "start_date", "end_date", "spent_cents", "category_id"), "id", False),
+    "monthly_rollups": (("year", "month", "type", "category_id", "total_cents", "count"), None, False),
+}
+
+
+class BackupError(Exception):
+    """备份损坏、不完整或与当前数据库结构不兼容"""
+
+
+class _HashingWriter:
+    """写入文件的同时计算 sha256，压缩流写完即得到校验和"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self._raw.write(data)
+
+    def flush(self):
+        self._raw.flush()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ==================== 备份 ====================
+
+def _read_chunks(cursor, table, columns, key, since, chunk_size):
+    """按主键分块读取（无单列主键的小表用 fetchmany 流式读取），生成行列表"""
+    column_list = ", ".join(columns)
+    if key is None:
+        cursor.execute(f"SELECT {column_list} FROM {table} ORDER BY {column_list}")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+    last = since
+    key_index = columns.index(key)
+    while True:
+        cursor.execute(
+            f"SELECT {column_list} FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s",
+            (last, chunk_size),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][key_index]
+
+
+def _write_chunk(directory, name, rows, compression):
+    suffix, opener = COMPRESSORS[compression]
+    path = os.path.join(directory, name + suffix)
+    with open(path, "wb") as raw:
+        writer = _HashingWriter(raw)
+        with opener(writer, "wt", encoding="utf-8") as f:
+            for row in rows:
+                # 日期与 Decimal 以字符串保存，两种后端都能直接作为参数写回
+                f.write(json.dumps(list(row), ensure_ascii=False, default=str))
+                f.write("\n")
+    return {"file": name + suffix, "rows": len(rows), "sha256": writer.sha256.hexdigest()}
+
+
+def list_backups(root):
+    """root 下已完成的备份，按时间升序返回 manifest 列表"""
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name, MANIFEST_NAME)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    return manifests
+
+
+def create_backup(root="backups", incremental=False, compression="gzip", chunk_size=CHUNK_SIZE):
+    """
+    在 root 下创建一个备份目录，返回其 manifest
+    incremental=True 时以 root 下最新的备份为基准，没有基准时退化为全量备份
+    """
+    if compression not in COMPRESSORS:
+        raise ValueError(f"不支持的压缩方式: {compression}（可选: {', '.join(COMPRESSORS)}）")
+    base = None
+    if incremental:
+        previous = list_backups(root)
+        base = previous[-1] if previous else None
+
+    backup_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    final_dir = os.path.join(root, backup_id)
+    work_dir = final_dir + ".partial"
+    os.makedirs(work_dir)
+
+    backend = get_backend()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        backend.begin_snapshot(conn)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "id": backup_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "backend": backend.name,
+            "schema_version": get_schema_version(conn, backend),
+            "compression": compression,
+            "base": base["id"] if base else None,
+            "watermarks": {},
+            "tables": {},
+        }
+        for table, (columns, key, is_incremental) in TABLES.items():
+            since = 0
+            if base and is_incremental:
+                since = base["watermarks"].get(table, 0)
+            chunks = []
+            watermark = since
+            for index, rows in enumerate(_read_chunks(cursor, table, columns, key, since, chunk_size), 1):
+                chunk = _write_chunk(work_dir, f"{table}-{index:06d}", rows, compression)
+                if key is not None:
+                    key_index = columns.index(key)
+                    chunk["first"], chunk["last"] = rows[0][key_index], rows[-1][key_index]
+                    watermark = max(watermark, rows[-1][key_index])
+                chunks.append(chunk)
+            if key is not None:
+                manifest["watermarks"][table] = watermark
+            manifest["tables"][table] = {
+                "columns": list(columns),
+                "mode": "incremental" if since else "full",
+                "since": since,
+                "rows": sum(c["rows"] for c in chunks),
+                "chunks": chunks,
+            }
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+    with open(os.path.join(work_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    # 写完 manifest 再改名，半成品目录不会被当作可用备份
+    os.rename(work_dir, final_dir)
+
+    total = sum(t["rows"] for t in manifest["tables"].values())
+    kind = "增量" if manifest["base"] else "全量"
+    log(f"{kind}备份完成: {final_dir}（{total} 行）", "SUCCESS")
+    return manifest
+
+
+# ==================== 恢复 ====================
+
+def _backup_chain(root, backup_id=None):
+    """返回从全量备份到目标备份的 manifest 链"""
+    manifests = {m["id"]: m for m in list_backups(root)}
+    if not manifests:
+        raise BackupError(f"{root} 下没有可用的备份")
+    target = backup_id or max(manifests)
+    chain = []
+    while target is not None:
+        manifest = manifests.get(target)
+        if manifest is None:
+            raise BackupError(f"备份 {target} 不存在或不完整")
+        chain.append(manifest)
+        target = manifest["base"]
+    chain.reverse()
+    return chain
+
+
+def _chunk_path(root, manifest, chunk):
+    """返回块文件路径；文件缺失或 sha256 不符时抛出 BackupError"""
+    path = os.path.join(root, manifest["id"], chunk["file"])
+    if not os.path.isfile(path):
+        raise BackupError(f"备份文件缺失: {path}")
+    if _file_sha256(path) != chunk["sha256"]:
+        raise BackupError(f"备份文件校验失败: {path}")
+    return path
+
+
+def _open_chunk(path, manifest):
+    _, opener = COMPRESSORS[manifest["compression"]]
+    return opener(path, "rt", encoding="utf-8")
+
+
+def _verify_chunk(root, manifest, chunk):
+    """恢复前的校验：存在、sha256、解压后的行数（只计数，不保留行）"""
+    path = _chunk_path(root, manifest, chunk)
+    try:
+        with _open_chunk(path, manifest) as f:
+            count = sum(1 for _ in f)
+    except (OSError, EOFError, lzma.LZMAError, UnicodeDecodeError) as e:
+        raise BackupError(f"备份文件无法解压: {path}: {e}") from None
+    if count != chunk["rows"]:
+        raise BackupError(f"备份文件行数不符: {path}")
+
+
+def _read_chunk(root, manifest, chunk):
+    path = _chunk_path(root, manifest, chunk)
+    with _open_chunk(path, manifest) as f:
+        rows = [tuple(json.loads(line)) for line in f]
+    if len(rows) != chunk["rows"]:
+        raise BackupError(f"备份文件行数不符: {path}")
+    return rows
+
+
+def _restore_jobs(chain):
+    """(表, manifest, 块) 列表，按恢复顺序（父表在前）排列"""
+    latest = chain[-1]
+    jobs = []
+    for table, (_, _, is_incremental) in TABLES.items():
+        # 增量表需要整条链上的块，其余表只取最新备份的全量副本
+        sources = chain if is_incremental else [latest]
+        jobs.extend((table, manifest, chunk) for manifest in sources for chunk in manifest["tables"][table]["chunks"])
+    return jobs
+
+
+def restore_backup(root="backups", backup_id=None, workers=RESTORE_WORKERS):
+    """
+    把数据库恢复到指定备份（默认最新）时的状态，返回各表恢复的行数
+    目标库须已按相同结构版本初始化；现有数据会被替换。
+    校验或导入失败时抛出 BackupError / 数据库异常，现有数据不受影响。
+    """
+    chain = _backup_chain(root, backup_id)
+    latest = chain[-1]
+    backend = get_backend()
+    jobs = _restore_jobs(chain)
+    workers = max(1, workers)
+    counts = dict.fromkeys(TABLES, 0)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        version = get_schema_version(conn, backend)
+        if version != latest["schema_version"]:
+            raise BackupError(f"结构版本不一致：备份为 {latest['schema_version']}，当前数据库为 {version}")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 第一遍：校验整条链，任何一块有问题都在清空数据之前中止
+            for job in [executor.submit(_verify_chunk, root, manifest, chunk) for _, manifest, chunk in jobs]:
+                job.result()
+
+            # 第二遍：在一个事务内清空并导入；解析由线程池预取，最多 workers 块驻留内存
+            for table in reversed(list(TABLES)):
+                cursor.execute(f"DELETE FROM {table}")
+            pending = deque()
+
+            def insert_next():
+                table, future = pending.popleft()
+                columns = TABLES[table][0]
+                rows = future.result()
+                cursor.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                    rows,
+                )
+                counts[table] += len(rows)
+
+            for table, manifest, chunk in jobs:
+                pending.append((table, executor.submit(_read_chunk, root, manifest, chunk)))
+                if len(pending) > workers:
+                    insert_next()
+            while pending:
+                insert_next()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    clear_cache()
+    bump_data_version()
+    log(f"已恢复到备份 {latest['id']}：" + "，".join(f"{t} {n} 行" for t, n in counts.items()), "SUCCESS")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账本数据备份与恢复")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create", help="创建备份")
+    create.add_argument("--dir", default="backups", help="备份根目录")
+    create.add_argument("--incremental", action="store_true", help="基于最新备份做增量备份")
+    create.add_argument("--compression", choices=sorted(COMPRESSORS), default="gzip")
+    create.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="每块行数")
+
+    restore = sub.add_parser("restore", help="从备份恢复")
+    restore.add_argument("--dir", default="backups", help="备份根目录")
+    restore.add_argument("--id", default=None, help="备份编号（默认最新）")
+    restore.add_argument("--workers", type=int, default=RESTORE_WORKERS, help="并行解析线程数")
+
+    listing = sub.add_parser("list", help="列出备份")
+    listing.add_argument("--dir", default="backups", help="备份根目录")
+
+    args = parser.parse_args(argv)
+    if args.command == "create":
+        create_backup(args.dir, args.incremental, args.compression, args.chunk_size)
+    elif args.command == "restore":
+        restore_backup(args.dir, args.id, args.workers)
+    else:
+        for manifest in list_backups(args.dir):
+            total = sum(t["rows"] for t in manifest["tables"].values())
+            kind = f"增量（基于 {manifest['base']}）" if manifest["base"] else "全量"
+            print(f"{manifest['id']}  {kind}  {total} 行  {manifest['compression']}")
+
+
+if __name__ == "__main__":
+    main()
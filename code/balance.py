@@ -0,0 +1,291 @@
+"""
+余额服务：内存余额 + 只追加的二进制日志，替代 flawed_functions.update_balance_with_race
+
+- 每次变动以定长记录 (序号, 金额分, crc32) 追加到日志文件，启动时重放日志得到余额
+- 组提交：并发调用方的变动由当前“领头”线程合并成一次 write + 一次 fsync，
+  fsync 期间到达的变动排入下一批，吞吐随并发度增长而不是被 fsync 次数限制
+- 写入前持有日志文件的排他 flock，并先追上其他进程追加的记录，多进程共享同一日志也不会丢失更新
+- 日志尾部的不完整记录（写入中途崩溃）在重放时截掉；compact() 把日志压缩为一条记录
+
+    service = BalanceService("data/balance.journal")
+    service.update(Money.parse("12.50"))   # 返回落盘后的余额
+"""
+
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 flock，只保证进程内的并发安全
+    fcntl = None
+
+from .money import Money
+
+MAGIC = b"ACCTBAL1"
+RECORD = struct.Struct("<Qq")          # 序号, 金额（分）
+ENTRY = struct.Struct("<QqI")          # 序号, 金额（分）, crc32(前 16 字节)
+DEFAULT_JOURNAL = "data/balance.journal"
+
+
+class JournalError(Exception):
+    """日志文件头无法识别"""
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _read_at(fd, length, offset):
+    """从 offset 读取 length 字节（到文件末尾为止）；Windows 没有 os.pread，用 lseek + read"""
+    os.lseek(fd, offset, os.SEEK_SET)
+    chunks = []
+    while length > 0:
+        chunk = os.read(fd, length)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b"".join(chunks)
+
+
+class BalanceService:
+    """
+    path:  日志文件路径，不存在时创建
+    fsync: 每批写入后是否 fsync（关闭后只保证写入操作系统缓存）
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._cond = threading.Condition()
+        self._pending = []        # [(ticket, cents)]
+        self._results = {}        # ticket -> 余额分 或 异常
+        self._next_ticket = 1
+        self._committed = 0       # 已处理（成功或失败）的最大 ticket
+        self._flushing = False
+        self._fd = None
+        self._inode = None
+        self._offset = 0
+        self._sequence = 0
+        self._cents = 0
+        self._stats = {"updates": 0, "batches": 0, "fsyncs": 0}
+        with self._cond:
+            self._open_fd()
+            self._replay()
+
+    # ---------- 日志文件 ----------
+
+    def _open_fd(self):
+        """打开（或重新打开）日志文件，重放位置归零"""
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+        self._offset = 0
+        self._sequence = 0
+        self._cents = 0
+
+    def _replay(self):
+        self._lock_current(exclusive=True)
+        try:
+            self._catch_up(truncate=True)
+        finally:
+            self._unlock_file()
+
+    def _lock_current(self, exclusive):
+        """
+        锁定当前路径上的日志文件
+        等锁期间文件可能被其他进程 compact() 替换，此时改为打开新文件并从头重放
+        """
+        while True:
+            self._lock_file(exclusive)
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == self._inode:
+                break
+            self._unlock_file()
+            self._open_fd()
+        if exclusive and os.fstat(self._fd).st_size == 0:
+            _write_all(self._fd, MAGIC)
+            os.fsync(self._fd)
+
+    def _lock_file(self, exclusive):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _catch_up(self, truncate=False):
+        """读取 _offset 之后（其他进程追加）的记录并累加；须持有文件锁"""
+        if self._offset == 0:
+            if os.fstat(self._fd).st_size == 0:
+                return
+            header = _read_at(self._fd, len(MAGIC), 0)
+            if header != MAGIC:
+                raise JournalError(f"{self.path} 不是余额日志文件")
+            self._offset = len(MAGIC)
+        size = os.fstat(self._fd).st_size
+        if size <= self._offset:
+            return
+        data = _read_at(self._fd, size - self._offset, self._offset)
+        good = 0
+        for start in range(0, len(data) - ENTRY.size + 1, ENTRY.size):
+            sequence, cents, crc = ENTRY.unpack_from(data, start)
+            if zlib.crc32(data[start:start + RECORD.size]) != crc:
+                break
+            self._sequence = sequence
+            self._cents += cents
+            good = start + ENTRY.size
+        self._offset += good
+        if good != len(data) and truncate:
+            # 崩溃留下的半条记录：截掉，后续追加从完整记录之后开始
+            os.ftruncate(self._fd, self._offset)
+
+    # ---------- 组提交 ----------
+
+    def _commit(self, batch):
+        """把一批变动写入日志并 fsync，返回每条变动之后的余额（分）"""
+        self._lock_current(exclusive=True)
+        try:
+            self._catch_up(truncate=True)
+            chunks = []
+            balances = []
+            sequence, cents = self._sequence, self._cents
+            for _, delta in batch:
+                sequence += 1
+                cents += delta
+                head = RECORD.pack(sequence, delta)
+                chunks.append(head + struct.pack("<I", zlib.crc32(head)))
+                balances.append(cents)
+            data = b"".join(chunks)
+            try:
+                _write_all(self._fd, data)
+                if self.fsync:
+                    os.fsync(self._fd)
+                    self._stats["fsyncs"] += 1
+            except OSError:
+                # 调用方会收到异常：截掉可能已部分写入的本批记录，避免之后重放时被计入余额
+                os.ftruncate(self._fd, self._offset)
+                raise
+            self._offset += len(data)
+            self._sequence, self._cents = sequence, cents
+        finally:
+            self._unlock_file()
+        self._stats["batches"] += 1
+        self._stats["updates"] += len(batch)
+        return balances
+
+    def update(self, amount):
+        """变动余额（正数增加、负数减少），返回写入日志后的余额"""
+        delta = Money.of(amount).cents
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._pending.append((ticket, delta))
+            while self._committed < ticket:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                # 成为领头线程：取走当前全部待提交变动，释放锁后写盘
+                self._flushing = True
+                batch, self._pending = self._pending, []
+                self._cond.release()
+                try:
+                    outcome = self._commit(batch)
+                except Exception as e:
+                    outcome = e
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                for index, (batch_ticket, _) in enumerate(batch):
+                    self._results[batch_ticket] = outcome if isinstance(outcome, Exception) else outcome[index]
+                self._committed = batch[-1][0]
+                self._cond.notify_all()
+            result = self._results.pop(ticket)
+        if isinstance(result, Exception):
+            raise result
+        return Money(result)
+
+    # ---------- 查询与维护 ----------
+
+    def balance(self):
+        """当前进程已知的余额（不读取文件）"""
+        with self._cond:
+            return Money(self._cents)
+
+    def refresh(self):
+        """读取其他进程追加的记录后返回最新余额"""
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._lock_current(exclusive=False)
+            try:
+                self._catch_up()
+            finally:
+                self._unlock_file()
+            return Money(self._cents)
+
+    def compact(self):
+        """把日志压缩为一条余额记录（原子替换文件），返回余额"""
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._lock_current(exclusive=True)
+            try:
+                self._catch_up(truncate=True)
+                head = RECORD.pack(self._sequence, self._cents)
+                temp_path = f"{self.path}.compact"
+                with open(temp_path, "wb") as f:
+                    f.write(MAGIC + head + struct.pack("<I", zlib.crc32(head)))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            finally:
+                self._unlock_file()
+            self._open_fd()
+            self._replay()
+            return Money(self._cents)
+
+    def stats(self):
+        """updates: 写入的变动数；batches: 组提交批次数；fsyncs: fsync 次数"""
+        with self._cond:
+            return dict(self._stats, sequence=self._sequence)
+
+    def close(self):
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_balance_service(path=DEFAULT_JOURNAL):
+    """按日志路径共享的进程内余额服务"""
+    key = os.path.abspath(path)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = BalanceService(path)
+        return service
+
+
+def update_balance(amount, path=DEFAULT_JOURNAL):
+    """原子地变动余额并返回新余额（update_balance_with_race 的安全替代）"""
+    return get_balance_service(path).update(amount)
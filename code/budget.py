@@ -2,17 +2,39 @@
 预算与提醒模块：负责预算设定和支出监控
 """
 
+from collections import defaultdict
 from datetime import datetime, timedelta
-from .database import get_connection
-from .utils import log, format_currency
+from .database import get_backend, get_connection
+from .migrations import budget_spent_sql
+from .money import Money
+from .utils import log, format_currency, to_cents
+
+# 记录写入时累加覆盖该日期的总预算与对应分类预算的支出计数器（命中 idx_budgets_range）
+ADD_SPENT_SQL = """
+    UPDATE budgets SET spent_cents = spent_cents + %s
+    WHERE start_date <= %s AND end_date >= %s AND category_id IN (0, %s)
+"""
+
+# 指定日期生效的全部预算（任意周期类型与分类），支出直接取计数器
+ACTIVE_BUDGETS_SQL = """
+    SELECT b.id, b.period, b.amount, b.start_date, b.end_date, b.spent_cents,
+           b.category_id, c.name AS category
+    FROM budgets b
+    LEFT JOIN categories c ON b.category_id = c.id
+    WHERE b.start_date <= %s AND b.end_date >= %s
+    ORDER BY b.period, b.category_id, b.start_date DESC
+"""
+
+PERIOD_NAMES = {'month': '月度', 'year': '年度'}
 
 
 class Budget:
     """预算管理类"""
     
-    def __init__(self, period='month', amount=0, start_date=None, end_date=None):
+    def __init__(self, period='month', amount=0, start_date=None, end_date=None, category_id=0):
         self.period = period  # 'month' 或 'year'
-        self.amount = amount
+        self.amount = Money.of(amount)
+        self.category_id = category_id or 0  # 0 表示总预算，否则只约束该分类的支出
         self.start_date = start_date or datetime.now().date()
         self.end_date = end_date or self._calculate_end_date()
     
@@ -29,52 +51,65 @@ class Budget:
         """保存预算设置"""
         conn = get_connection()
         cursor = conn.cursor()
-        
-        # 先检查是否已有同期的预算
-        cursor.execute("""
-            SELECT id FROM budgets 
-            WHERE period = %s AND start_date = %s
-        """, (self.period, self.start_date))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # 更新现有预算
-            cursor.execute("""
-                UPDATE budgets 
-                SET amount = %s, end_date = %s
-                WHERE id = %s
-            """, (self.amount, self.end_date, existing[0]))
-        else:
-            # 插入新预算
+        try:
+
+            # 先检查是否已有同期（同分类）的预算
             cursor.execute("""
-                INSERT INTO budgets (period, amount, start_date, end_date)
-                VALUES (%s, %s, %s, %s)
-            """, (self.period, self.amount, self.start_date, self.end_date))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+                SELECT id FROM budgets 
+                WHERE period = %s AND start_date = %s AND category_id = %s
+            """, (self.period, self.start_date, self.category_id))
+
+            existing = cursor.fetchone()
+
+            if existing:
+                # 更新现有预算
+                cursor.execute("""
+                    UPDATE budgets 
+                    SET amount = %s, end_date = %s
+                    WHERE id = %s
+                """, (self.amount.to_decimal(), self.end_date, existing[0]))
+            else:
+                # 插入新预算
+                cursor.execute("""
+                    INSERT INTO budgets (period, amount, start_date, end_date, category_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (self.period, self.amount.to_decimal(), self.start_date, self.end_date, self.category_id))
+
+            # 周期可能变化，按新的起止日期重算支出计数器
+            cursor.execute(
+                budget_spent_sql(get_backend()) + " WHERE period = %s AND start_date = %s AND category_id = %s",
+                (self.period, self.start_date, self.category_id)
+            )
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
         return True
     
     @staticmethod
     def get_current_budget(period='month'):
-        """获取当前周期的预算"""
+        """获取当前周期的总预算"""
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        
-        today = datetime.now().date()
-        
-        cursor.execute("""
-            SELECT * FROM budgets 
-            WHERE period = %s AND start_date <= %s AND end_date >= %s
-            ORDER BY start_date DESC 
-            LIMIT 1
-        """, (period, today, today))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        try:
+
+            today = datetime.now().date()
+
+            cursor.execute("""
+                SELECT * FROM budgets 
+                WHERE period = %s AND start_date <= %s AND end_date >= %s AND category_id = 0
+                ORDER BY start_date DESC 
+                LIMIT 1
+            """, (period, today, today))
+
+            result = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
         
         return result
     
@@ -83,52 +118,83 @@ class Budget:
         """获取所有预算设置"""
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT * FROM budgets 
-            ORDER BY start_date DESC
-        """)
-        
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        try:
+
+            cursor.execute("""
+                SELECT * FROM budgets 
+                ORDER BY start_date DESC
+            """)
+
+            result = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
         
         return result
     
     @staticmethod
-    def calculate_current_expense(period='month'):
-        """计算当前周期的支出"""
+    def add_expenses(cursor, rows):
+        """
+        在调用方的事务内把新写入的支出累加到覆盖其日期的预算上，由调用方负责提交
+        rows 为 INSERT_RECORD_SQL 的参数元组 (type, amount, category_id, description, date)
+        """
+        spent = defaultdict(int)
+        for record_type, amount, category_id, _, date_value in rows:
+            if record_type == 'expense':
+                spent[(date_value, category_id or 0)] += to_cents(amount)
+        if spent:
+            cursor.executemany(
+                ADD_SPENT_SQL,
+                [(cents, day, day, category_id) for (day, category_id), cents in spent.items() if cents]
+            )
+
+    @staticmethod
+    def refresh_spent():
+        """按记录重算所有预算的支出计数器（如直接改库之后）"""
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        today = datetime.now().date()
-        budget = Budget.get_current_budget(period)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(budget_spent_sql(get_backend()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
+    @staticmethod
+    def calculate_current_expense(period='month', budget=None):
+        """
+        计算当前周期的支出
+        已查到的预算可通过 budget 传入，省去重复查询；
+        预算行带有 spent_cents 计数器时直接读取，否则按预算起止日期汇总记录。
+        """
+        if budget is None:
+            budget = Budget.get_current_budget(period)
         
         if not budget:
-            return 0
+            return Money(0)
+
+        if budget.get('spent_cents') is not None:
+            return Money(int(budget['spent_cents']))
         
-        if period == 'month':
-            # 计算当月支出
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
             cursor.execute("""
                 SELECT COALESCE(SUM(amount), 0) as total
                 FROM records 
                 WHERE type = 'expense' 
                 AND date >= %s AND date <= %s
             """, (budget['start_date'], budget['end_date']))
-        else:  # year
-            # 计算当年支出
-            cursor.execute("""
-                SELECT COALESCE(SUM(amount), 0) as total
-                FROM records 
-                WHERE type = 'expense' 
-                AND YEAR(date) = YEAR(%s)
-            """, (today,))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+
+            result = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
         
-        return float(result['total']) if result else 0
+        return Money.of(result['total']) if result else Money(0)
     
     @staticmethod
     def check_budget_alert(threshold=0.8):
@@ -137,8 +203,68 @@ class Budget:
         if not budget:
             return None
         
-        current_expense = Budget.calculate_current_expense('month')
-        budget_amount = float(budget['amount'])
+        current_expense = Budget.calculate_current_expense('month', budget)
+        return Budget.build_alert(budget, current_expense, threshold)
+
+    @staticmethod
+    def evaluate(budget, threshold=0.8):
+        """
+        评估单个预算行（需带 spent_cents），不访问数据库
+        返回状态 ok / warning / exceeded、使用比例、剩余金额与提醒
+        """
+        amount_cents = to_cents(budget['amount'])
+        spent_cents = int(budget['spent_cents'] or 0)
+        ratio = spent_cents / amount_cents if amount_cents > 0 else None
+        if ratio is None or ratio < threshold:
+            status = 'ok'
+        elif ratio >= 1.0:
+            status = 'exceeded'
+        else:
+            status = 'warning'
+        category_id = budget.get('category_id') or 0
+        category = (budget.get('category') or f"分类#{category_id}") if category_id else None
+        alert = Budget.build_alert(budget, Money(spent_cents), threshold)
+        if alert and category:
+            alert['message'] = f"[{category}] {alert['message']}"
+        return {
+            'id': budget.get('id'),
+            'period': budget['period'],
+            'category_id': category_id,
+            'category': category,
+            'start_date': budget['start_date'],
+            'end_date': budget['end_date'],
+            'amount': Money(amount_cents),
+            'spent': Money(spent_cents),
+            'remaining': Money(amount_cents - spent_cents),
+            'ratio': ratio,
+            'status': status,
+            'alert': alert,
+        }
+
+    @staticmethod
+    def get_active(as_of=None):
+        """指定日期（默认今天）生效的全部预算行"""
+        as_of = as_of or datetime.now().date()
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(ACTIVE_BUDGETS_SQL, (as_of, as_of))
+            budgets = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return budgets
+
+    @staticmethod
+    def evaluate_all(as_of=None, threshold=0.8):
+        """一次查询评估指定日期（默认今天）生效的全部预算"""
+        return [Budget.evaluate(budget, threshold) for budget in Budget.get_active(as_of)]
+
+    @staticmethod
+    def build_alert(budget, current_expense, threshold=0.8):
+        """根据预算与当前支出生成提醒，未达阈值返回 None"""
+        budget_amount = Money.of(budget['amount'])
+        current_expense = Money.of(current_expense)
         
         if budget_amount <= 0:
             return None
@@ -180,7 +306,7 @@ class BudgetManager:
         # 输入预算金额
         while True:
             try:
-                amount = float(input(f"请输入{period_name}预算金额：").strip())
+                amount = Money.parse(input(f"请输入{period_name}预算金额：").strip())
                 if amount <= 0:
                     log("预算金额必须大于0", "ERROR")
                     continue
@@ -214,12 +340,12 @@ class BudgetManager:
         """显示预算状态"""
         print("\n=== 预算状态 ===")
         
-        # 月度预算状态
+        # 月度预算状态：一次查询取得预算与支出计数器
         monthly_budget = Budget.get_current_budget('month')
-        monthly_expense = Budget.calculate_current_expense('month')
         
         if monthly_budget:
-            budget_amount = float(monthly_budget['amount'])
+            monthly_expense = Budget.calculate_current_expense('month', monthly_budget)
+            budget_amount = Money.of(monthly_budget['amount'])
             ratio = monthly_expense / budget_amount if budget_amount > 0 else 0
             
             print(f"📊 月度预算状态:")
@@ -233,12 +359,34 @@ class BudgetManager:
                 print("   ⚠️ 状态: 接近预算")
             else:
                 print("   ✅ 状态: 正常")
+            
+            # 检查并显示提醒
+            alert = Budget.build_alert(monthly_budget, monthly_expense)
+            if alert:
+                print(f"\n🔔 {alert['message']}")
         else:
             print("📊 月度预算: 未设置")
         
-        # 检查并显示提醒
-        alert = Budget.check_budget_alert()
-        if alert:
-            print(f"\n🔔 {alert['message']}")
-        
-        return monthly_budget is not None
\ No newline at end of file
+        return monthly_budget is not None
+
+    @staticmethod
+    def show_all_budget_status():
+        """显示当前生效的全部预算（月度、年度等）"""
+        print("\n=== 全部预算状态 ===")
+        results = Budget.evaluate_all()
+        if not results:
+            print("📊 当前没有生效的预算")
+            return []
+
+        status_text = {'ok': '✅ 正常', 'warning': '⚠️ 接近预算', 'exceeded': '⚠️ 已超支'}
+        for result in results:
+            period_name = PERIOD_NAMES.get(result['period'], result['period'])
+            scope = f"「{result['category']}」" if result['category'] else ""
+            print(f"📊 {period_name}{scope}预算 ({result['start_date']} 至 {result['end_date']}):")
+            print(f"   预算金额: {format_currency(result['amount'])}")
+            print(f"   当前支出: {format_currency(result['spent'])}")
+            print(f"   剩余金额: {format_currency(result['remaining'])}")
+            if result['ratio'] is not None:
+                print(f"   使用进度: {result['ratio']:.1%}")
+            print(f"   状态: {status_text[result['status']]}")
+        return results
\ No newline at end of file
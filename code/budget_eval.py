@@ -0,0 +1,105 @@
+"""
+预算批量评估模块：用 日期 × 分类 的支出矩阵一次算出任意一组预算的实际支出
+
+一条 GROUP BY 查询取出覆盖所有预算的逐日分类支出，构造矩阵后沿日期做累加和，
+每个预算的支出 = 累加和[结束日, 分类] - 累加和[开始日前一天, 分类]，
+所有预算通过一次花式索引得到，代替逐个预算的 SUM 查询。
+不依赖 spent_cents 计数器，可用于尚未保存的预算（预览）或核对计数器。
+"""
+
+import numpy as np
+
+from .analytics import EPOCH_ORDINAL
+from .budget import Budget
+from .database import get_backend, get_connection
+from .migrations import rollup_cents
+
+
+def _spend_by_day_sql(backend):
+    return f"""
+        SELECT date, COALESCE(category_id, 0) AS category_id, {rollup_cents(backend)} AS cents
+        FROM records
+        WHERE type = 'expense' AND date >= %s AND date <= %s
+        GROUP BY date, COALESCE(category_id, 0)
+    """
+
+
+def _as_row(budget):
+    """Budget 对象或预算行统一为字典"""
+    if isinstance(budget, Budget):
+        return {
+            'id': None, 'period': budget.period, 'amount': budget.amount,
+            'start_date': budget.start_date, 'end_date': budget.end_date,
+            'category_id': budget.category_id,
+        }
+    return budget
+
+
+def load_spend(start_date, end_date):
+    """读取区间内逐日分类支出，返回 (天数数组, 分类 id 数组, 金额分数组)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_spend_by_day_sql(get_backend()), (start_date, end_date))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty.astype(np.int32), empty, empty
+    days, categories, cents = zip(*rows)
+    return (
+        np.fromiter((d.toordinal() - EPOCH_ORDINAL for d in days), dtype=np.int32, count=len(rows)),
+        np.asarray(categories, dtype=np.int64),
+        np.asarray(cents, dtype=np.int64),
+    )
+
+
+def compute_spent(budgets, spend=None):
+    """
+    计算每个预算的实际支出（分），返回与 budgets 等长的 int64 数组
+    spend 可传入 load_spend() 的结果，省略时按预算覆盖的日期范围查询
+    """
+    rows = [_as_row(b) for b in budgets]
+    if not rows:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.fromiter((r['start_date'].toordinal() - EPOCH_ORDINAL for r in rows), dtype=np.int32, count=len(rows))
+    ends = np.fromiter((r['end_date'].toordinal() - EPOCH_ORDINAL for r in rows), dtype=np.int32, count=len(rows))
+    budget_categories = np.fromiter((r.get('category_id') or 0 for r in rows), dtype=np.int64, count=len(rows))
+
+    base = int(starts.min())
+    if spend is None:
+        spend = load_spend(rows[int(starts.argmin())]['start_date'], rows[int(ends.argmax())]['end_date'])
+    days, categories, cents = spend
+
+    # 列：出现过的各分类 + 最后一列“全部分类”（总预算）
+    columns, category_columns = np.unique(np.concatenate([categories, budget_categories]), return_inverse=True)
+    total_column = len(columns)
+    n_days = int(ends.max()) - base + 1
+
+    # 第 0 行留空，使 cumulative[i] 表示前 i 天（不含第 i 天）的累计
+    matrix = np.zeros((n_days + 1, total_column + 1), dtype=np.int64)
+    in_range = (days >= base) & (days < base + n_days)
+    np.add.at(matrix, (days[in_range] - base + 1, category_columns[:len(categories)][in_range]), cents[in_range])
+    matrix[:, total_column] = matrix[:, :total_column].sum(axis=1)
+    cumulative = np.cumsum(matrix, axis=0)
+
+    budget_columns = np.where(budget_categories == 0, total_column, category_columns[len(categories):])
+    return cumulative[ends - base + 1, budget_columns] - cumulative[starts - base, budget_columns]
+
+
+def evaluate_budgets(budgets, threshold=0.8):
+    """
+    按实际支出批量评估预算（Budget 对象或预算行），阈值语义与 check_budget_alert 相同
+    返回与 Budget.evaluate 相同结构的列表
+    """
+    rows = [_as_row(b) for b in budgets]
+    spent = compute_spent(rows)
+    return [Budget.evaluate({**row, 'spent_cents': int(s)}, threshold) for row, s in zip(rows, spent)]
+
+
+def evaluate_period(as_of=None, threshold=0.8):
+    """评估指定日期生效的全部预算，返回全部提醒（未达阈值的不包含）"""
+    results = evaluate_budgets(Budget.get_active(as_of), threshold)
+    return [r for r in results if r['alert']]
@@ -0,0 +1,182 @@
+"""
+查询缓存模块：缓存 SearchEngine / Statistics 的查询结果
+
+缓存键 = (数据版本号, 命名空间, 规范化后的参数)。
+记录或分类写入后调用 bump_data_version()，旧版本的缓存项不会再被命中，
+随后按 LRU 顺序被淘汰；TTL 兜底其他进程写入造成的数据变化。
+"""
+
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+from .config import get_config
+
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL = 60.0  # 秒；None 表示不过期
+
+_data_version = 0
+_version_lock = threading.Lock()
+
+
+def data_version():
+    """当前数据版本号"""
+    return _data_version
+
+
+def bump_data_version():
+    """数据已变更：令此前缓存的查询结果全部失效"""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        return _data_version
+
+
+class QueryCache:
+    """线程安全的 LRU + TTL 缓存"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        if max_entries < 1:
+            raise ValueError("缓存容量必须大于0")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (过期时间, 值)，右端为最近使用
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return True, value
+                del self._entries[key]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return False, None
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """命中率等计数器快照"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["size"] = len(self._entries)
+            snapshot["max_entries"] = self.max_entries
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+
+def _configured_cache():
+    """按配置的 cache 节创建共享缓存，配置修改后同步容量与 TTL"""
+    config = get_config()
+    # max_entries 为 null 时使用默认容量；ttl 为 null 表示不过期
+    cache = QueryCache(config.get("cache.max_entries") or CACHE_MAX_ENTRIES, config.get("cache.ttl"))
+
+    def apply(changed):
+        if "cache.max_entries" in changed:
+            cache.max_entries = changed["cache.max_entries"] or CACHE_MAX_ENTRIES
+        cache.ttl = changed.get("cache.ttl", cache.ttl)
+
+    config.subscribe(apply, prefix="cache.")
+    return cache
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """进程内共享的查询缓存（首次使用时按配置创建，导入模块时不读取配置）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _configured_cache()
+    return _cache
+
+
+def get_cache_stats():
+    return get_cache().stats()
+
+
+def clear_cache():
+    get_cache().clear()
+
+
+def _normalize(value):
+    """把参数转换为可哈希的规范形式；无法规范化时抛出 TypeError"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    hash(value)
+    return value
+
+
+def _copy_result(value):
+    """
+    返回给调用方的副本
+    查询结果是“字典行”的列表，行内的值（Money / date / str）都不可变，
+    只需复制外层列表和每行字典；其他形状的结果仍做深拷贝
+    """
+    if isinstance(value, list) and all(type(row) is dict for row in value):
+        return [dict(row) for row in value]
+    return copy.deepcopy(value)
+
+
+def cached(namespace=None):
+    """
+    缓存函数结果的装饰器
+    参数按函数签名绑定并补全默认值，f(2024) 与 f(year=2024, month=None) 命中同一缓存项；
+    实例方法的 self 不参与缓存键。返回结果的副本，调用方增删改行不会污染缓存。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        skip_self = next(iter(signature.parameters), None) == "self"
+        name = namespace or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                items = list(bound.arguments.items())
+                if skip_self:
+                    items = items[1:]
+                key = (data_version(), name, _normalize(items))
+            except TypeError:
+                # 参数无法作为缓存键，直接查询
+                return func(*args, **kwargs)
+
+            cache = get_cache()
+            hit, value = cache.get(key)
+            if not hit:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return _copy_result(value)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -2,7 +2,16 @@
 分类模块：支持用户自定义分类与关键字匹配
 """
 
-from .database import get_connection
+import threading
+
+from .cache import bump_data_version
+from .database import get_backend, get_connection
+from .matcher import KeywordMatcher
+
+# 进程内分类缓存：(分类版本号, 存储后端, 匹配函数)
+_version = 0
+_cache = None
+_cache_lock = threading.Lock()
 
 
 class Category:
@@ -15,37 +24,82 @@ class Category:
     def save(self):
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO categories (name, keywords) VALUES (%s, %s)",
-            (self.name, self.keywords)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        try:
+            cursor.execute(
+                "INSERT INTO categories (name, keywords) VALUES (%s, %s)",
+                (self.name, self.keywords)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        Category.invalidate_cache()
+        bump_data_version()
 
     @staticmethod
     def get_all():
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM categories")
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        try:
+            cursor.execute("SELECT * FROM categories")
+            result = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
         return result
 
     @staticmethod
     def find_by_keyword(word: str):
-        """根据关键字匹配分类"""
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM categories")
-        categories = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        for cat in categories:
-            if cat["keywords"]:
-                keywords = [k.strip() for k in cat["keywords"].split(",")]
-                if any(word.lower() in kw.lower() for kw in keywords):
-                    return cat
-        return None
+        """根据关键字匹配分类：描述中出现某分类的关键字即命中，使用进程内缓存的自动机"""
+        return Category.get_matcher()(word)
+
+    @staticmethod
+    def match(categories, word: str):
+        """在已加载的分类列表中按关键字匹配，不访问数据库"""
+        return Category.build_matcher(categories)(word)
+
+    @staticmethod
+    def build_matcher(categories):
+        """
+        把所有分类的关键字编译成一个 Aho-Corasick 自动机，返回 描述 -> 分类 的匹配函数
+        多个分类同时命中时取列表中靠前的分类
+        """
+        categories = list(categories)
+        automaton = KeywordMatcher(
+            (keyword, rank)
+            for rank, cat in enumerate(categories) if cat["keywords"]
+            for keyword in cat["keywords"].split(",")
+        )
+
+        def matcher(word: str):
+            rank = automaton.search(word or "")
+            return categories[rank] if rank is not None else None
+
+        return matcher
+
+    @staticmethod
+    def get_matcher():
+        """返回当前分类版本对应的匹配函数；分类未变化时不访问数据库"""
+        global _cache
+        backend = get_backend()
+        cache = _cache
+        if cache is not None and cache[0] == _version and cache[1] is backend:
+            return cache[2]
+        with _cache_lock:
+            cache = _cache
+            if cache is not None and cache[0] == _version and cache[1] is backend:
+                return cache[2]
+            version = _version
+            matcher = Category.build_matcher(Category.get_all())
+            _cache = (version, backend, matcher)
+            return matcher
+
+    @staticmethod
+    def invalidate_cache():
+        """分类发生变化：递增版本号，下次匹配时重新加载"""
+        global _version
+        with _cache_lock:
+            _version += 1
@@ -0,0 +1,245 @@
+"""
+配置模块：集中管理各模块的设置，替代散落的硬编码常量与 read_config_file_leak
+
+来源按优先级从低到高合并为一个扁平字典（键形如 "pool.max_size"）：
+
+1. DEFAULTS 中的默认值（即原先各模块里的常量）
+2. JSON 配置文件（路径取环境变量 ACCOUNTING_CONFIG，默认 config.json，不存在时跳过），
+   按节组织：{"pool": {"max_size": 20}, "mysql": {"password": "..."}}
+3. 环境变量 ACCOUNTING_<节>_<键>，如 ACCOUNTING_POOL_MAX_SIZE=20、ACCOUNTING_DB_BACKEND=sqlite
+
+合并结果缓存在内存中，get() 只是一次字典查找；
+文件的 mtime 变化后才重新解析（stat 检查按 check_interval 节流），变化的键通知订阅者：
+
+    config = get_config()
+    config.get("pool.max_size")
+    config.subscribe(lambda changed: ..., prefix="pool.")
+"""
+
+import json
+import os
+import threading
+import time
+
+from .utils import log
+
+CONFIG_ENV = "ACCOUNTING_CONFIG"
+DEFAULT_CONFIG_PATH = "config.json"
+ENV_PREFIX = "ACCOUNTING_"
+CHECK_INTERVAL = 1.0  # 秒；两次检查配置文件 mtime 的最小间隔
+
+# 默认值决定键的集合与类型（环境变量按默认值的类型转换）；None 表示未设置、类型为字符串
+DEFAULTS = {
+    "db.backend": "mysql",
+    "sqlite.path": "data/accounting.db",
+    "mysql.host": "localhost",
+    "mysql.port": 3306,
+    "mysql.user": "root",
+    "mysql.password": None,   # 无默认值：未设置时连接 MySQL 会报 ConfigError
+    "mysql.database": "accounting_system",
+    "pool.min_size": 1,
+    "pool.max_size": 10,
+    "pool.idle_timeout": 300.0,     # 空闲超过该秒数的连接会被淘汰（保留 min_size 个）
+    "pool.checkout_timeout": 10.0,  # 连接池满时的最长等待秒数
+    "pool.ping_interval": 30.0,     # 空闲超过该秒数的连接在借出前先 ping
+    "cache.max_entries": 256,
+    "cache.ttl": 60.0,              # 秒；null 表示不过期（见 NULLABLE_KEYS）
+    "api.endpoint": "https://api.example.com/v1",
+    "api.key": None,
+    "api.secret": None,
+}
+
+
+# 默认值不为 None、但允许显式设为 null 的键；其余这类键设为 null 视为配置错误
+NULLABLE_KEYS = frozenset({"cache.ttl"})
+
+
+class ConfigError(ValueError):
+    """配置文件无法解析或配置值类型错误"""
+
+
+def _coerce(key, value):
+    """按默认值的类型转换配置值（环境变量都是字符串）"""
+    default = DEFAULTS.get(key)
+    if value is None:
+        if default is None or key in NULLABLE_KEYS:
+            return None
+        raise ConfigError(f"配置项 {key} 不能为 null")
+    if default is None:
+        return value
+    kind = type(default)
+    if isinstance(value, bool) or isinstance(value, (dict, list)):
+        raise ConfigError(f"配置项 {key} 的值无效: {value!r}")
+    if isinstance(value, kind):
+        return value
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"配置项 {key} 的值无效: {value!r}") from None
+
+
+def _flatten(data, prefix=""):
+    values = {}
+    for name, value in data.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{key}."))
+        else:
+            values[key] = value
+    return values
+
+
+def _env_name(key):
+    return ENV_PREFIX + key.replace(".", "_").upper()
+
+
+class Config:
+    """
+    path:           JSON 配置文件路径（None 时取环境变量 ACCOUNTING_CONFIG 或 config.json）
+    environ:        环境变量字典（测试时可传入）
+    check_interval: 检查文件 mtime 的最小间隔秒数，0 表示每次 get 都检查
+    """
+
+    def __init__(self, path=None, environ=None, check_interval=CHECK_INTERVAL):
+        self._environ = os.environ if environ is None else environ
+        self.path = path or self._environ.get(CONFIG_ENV, DEFAULT_CONFIG_PATH)
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._subscribers = []   # [(prefix, callback)]
+        self._mtime = None
+        self._stats = {"loads": 0, "checks": 0}
+        self._values = self._load()
+        self._next_check = time.monotonic() + check_interval
+
+    # ---------- 加载 ----------
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        mtime = self._file_mtime()
+        values = dict(DEFAULTS)
+        if mtime is not None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                raise ConfigError(f"无法读取配置文件 {self.path}: {e}") from None
+            if not isinstance(data, dict):
+                raise ConfigError(f"配置文件 {self.path} 顶层必须是对象")
+            values.update((key, _coerce(key, value)) for key, value in _flatten(data).items())
+        # 环境变量覆盖文件；只识别已知的键
+        for key in DEFAULTS:
+            value = self._environ.get(_env_name(key))
+            if value is not None:
+                values[key] = _coerce(key, value)
+        self._mtime = mtime
+        self._stats["loads"] += 1
+        return values
+
+    def reload(self, force=False):
+        """文件 mtime 变化（或 force）时重新加载，返回变化的键及新值"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            self._stats["checks"] += 1
+            if not force and self._file_mtime() == self._mtime:
+                return {}
+            values = self._load()
+            changed = {key: value for key, value in values.items()
+                       if key not in self._values or self._values[key] != value}
+            self._values = values
+            subscribers = list(self._subscribers)
+        for prefix, callback in subscribers:
+            relevant = {key: value for key, value in changed.items() if key.startswith(prefix)}
+            if relevant:
+                callback(relevant)
+        return changed
+
+    def _maybe_reload(self):
+        if time.monotonic() >= self._next_check:
+            try:
+                self.reload()
+            except ConfigError as e:
+                # 运行中改坏了配置文件：保留当前配置，文件再次修改后重试
+                with self._lock:
+                    self._mtime = self._file_mtime()
+                log(f"{e}，继续使用原配置", "ERROR")
+
+    # ---------- 读取 ----------
+
+    def get(self, key, default=None):
+        self._maybe_reload()
+        return self._values.get(key, default)
+
+    def __getitem__(self, key):
+        self._maybe_reload()
+        return self._values[key]
+
+    def section(self, name, skip_unset=True):
+        """某一节的全部设置：section("mysql") -> {"host": ..., ...}"""
+        self._maybe_reload()
+        prefix = f"{name}."
+        return {
+            key[len(prefix):]: value for key, value in self._values.items()
+            if key.startswith(prefix) and not (skip_unset and value is None)
+        }
+
+    # ---------- 订阅 ----------
+
+    def subscribe(self, callback, prefix=""):
+        """配置重新加载后，以 {键: 新值} 调用 callback（只包含以 prefix 开头且发生变化的键）"""
+        with self._lock:
+            self._subscribers.append((prefix, callback))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(p, cb) for p, cb in self._subscribers if cb is not callback]
+
+    def stats(self):
+        """loads: 解析次数；checks: mtime 检查次数"""
+        with self._lock:
+            return dict(self._stats)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    """进程内共享的配置（首次调用时加载）"""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config()
+    return _config
+
+
+def set_config(config):
+    """替换进程内共享的配置（测试或命令行指定配置文件时使用），返回原配置"""
+    global _config
+    with _config_lock:
+        previous, _config = _config, config
+    return previous
+
+
+def get_setting(key, default=None):
+    return get_config().get(key, default)
+
+
+def get_api_settings():
+    """外部 API 的 endpoint / key / secret（get_api_config 的替代，密钥只来自配置文件或环境变量）"""
+    settings = get_config().section("api", skip_unset=False)
+    missing = [name for name in ("key", "secret") if settings.get(name) is None]
+    if missing:
+        raise ConfigError(f"未配置 API 密钥: {', '.join('api.' + name for name in missing)}")
+    return settings
+
+
+def read_config_file(filename):
+    """读取配置文件文本（read_config_file_leak 的替代，文件会被关闭）"""
+    with open(filename, encoding="utf-8") as f:
+        return f.read()
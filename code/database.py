@@ -1,27 +1,129 @@
 """
-数据库连接模块：负责 MySQL 连接与表结构初始化
+数据库连接模块：负责存储后端选择、连接池与表结构初始化
 包含植入的代码缺陷
 """
 
-import mysql.connector
-from mysql.connector import Error
+import threading
+
+try:
+    import mysql.connector
+    from mysql.connector import Error
+except ImportError:
+    # 只使用 SQLite 后端时可以不安装 MySQL 驱动
+    mysql = None
+    Error = OSError
+
+from .cache import bump_data_version, clear_cache
+from .config import ConfigError, get_config
+from .migrations import migrate
+from .pool import ConnectionPool, PoolExhaustedError
+from .storage import create_backend
+from .utils import log
+
+# 连接池参数取自配置的 pool 节（min_size / max_size / idle_timeout / checkout_timeout / ping_interval），
+# 配置文件修改后由 _apply_pool_config 应用到现有连接池
+POOL_RESIZE_KEYS = ("min_size", "max_size")
+
+_backend = None
+_pool = None
+_pool_config = None  # 已订阅 pool 节变化的配置对象
+_pool_lock = threading.Lock()
+
+
+def _default_backend():
+    """
+    根据配置选择后端：db.backend = mysql（默认）或 sqlite，
+    即环境变量 ACCOUNTING_DB_BACKEND / ACCOUNTING_SQLITE_PATH / ACCOUNTING_MYSQL_* 或配置文件
+    """
+    config = get_config()
+    name = config.get("db.backend").lower()
+    if name == "sqlite":
+        return create_backend("sqlite", path=config.get("sqlite.path"))
+    return create_backend("mysql", **config.section("mysql"))
+
+
+def get_backend():
+    """返回当前使用的存储后端"""
+    global _backend
+    if _backend is None:
+        with _pool_lock:
+            if _backend is None:
+                _backend = _default_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """切换存储后端，旧连接池与查询缓存随之失效"""
+    global _backend
+    close_pool()
+    with _pool_lock:
+        _backend = backend
+    clear_cache()
+    bump_data_version()
+
+
+def get_pool():
+    """返回进程内共享的连接池（首次调用时创建）"""
+    global _pool, _pool_config
+    if _pool is None:
+        backend = get_backend()
+        config = get_config()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    backend.connect,
+                    ping=backend.ping,
+                    reset=backend.reset,
+                    **config.section("pool"),
+                )
+                if _pool_config is not config:
+                    if _pool_config is not None:
+                        _pool_config.unsubscribe(_apply_pool_config)
+                    config.subscribe(_apply_pool_config, prefix="pool.")
+                    _pool_config = config
+    return _pool
+
+
+def _apply_pool_config(changed):
+    """配置重新加载后调整现有连接池：大小变化时 resize，超时类参数直接替换"""
+    pool = _pool
+    if pool is None:
+        return
+    settings = {key.split(".", 1)[1]: value for key, value in changed.items()}
+    if any(key in settings for key in POOL_RESIZE_KEYS):
+        try:
+            pool.resize(settings.get("min_size"), settings.get("max_size"))
+        except ValueError as e:
+            log(f"连接池配置未生效: {e}", "ERROR")
+    for key, value in settings.items():
+        if key not in POOL_RESIZE_KEYS and hasattr(pool, key):
+            setattr(pool, key, value)
+
+
+def close_pool():
+    """关闭并丢弃当前连接池，下次 get_connection() 时重建"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
 
 
 def get_connection():
-    """创建并返回数据库连接"""
+    """从连接池借出数据库连接，调用 close() 即归还；也可用 with 语句"""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Thedead26innju",
-            database="accounting_system"
-        )
-        return connection
-    except Error as e:
+        return get_pool().acquire()
+    except (PoolExhaustedError, ConfigError) + get_backend().errors as e:
+        # 配置缺失（如未设置 MySQL 密码）与连接失败一样记录后返回 None，调用方按 if not conn 处理
         print(f"数据库连接失败: {e}")
         return None
 
 
+def get_pool_stats():
+    """连接池计数器：借出次数、等待时间、耗尽次数等"""
+    return get_pool().stats()
+
+
 # [IMPLANTED FLAW 1: 数据库连接泄漏]
 def get_records_with_leak():
     """
@@ -56,44 +158,17 @@ def get_connection_insecure():
 
 
 def init_database():
-    """初始化数据库表结构"""
+    """初始化数据库表结构：执行尚未应用的迁移，已是最新版本时只查询一次版本号"""
     conn = get_connection()
     if not conn:
         return
 
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            keywords TEXT
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS records (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            type ENUM('income', 'expense') NOT NULL,
-            amount DECIMAL(10,2) NOT NULL,
-            category_id INT,
-            description VARCHAR(255),
-            date DATE,
-            FOREIGN KEY (category_id) REFERENCES categories(id)
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS budgets (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            period ENUM('month','year') NOT NULL,
-            amount DECIMAL(10,2),
-            start_date DATE,
-            end_date DATE
-        )
-    """)
+    try:
+        applied = migrate(conn, get_backend())
+    finally:
+        conn.close()
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("✅ 数据库初始化完成！")
\ No newline at end of file
+    if applied:
+        print(f"✅ 数据库初始化完成！（已升级到结构版本 {applied[-1]}）")
+    else:
+        print("✅ 数据库初始化完成！")
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+事件总线模块：进程内的发布 / 订阅
+
+写入路径在事务提交后发布事件，订阅者（如预算提醒）在发布线程中同步执行，
+因此订阅者应只做轻量工作（如放入队列），耗时处理交给自己的后台线程。
+"""
+
+import threading
+
+from .utils import log
+
+# 记录已提交：负载为 INSERT_RECORD_SQL 参数元组列表 (type, amount, category_id, description, date)
+RECORDS_WRITTEN = "records.written"
+
+
+class EventBus:
+    """线程安全的事件总线"""
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event, handler):
+        """订阅事件，返回取消订阅的函数"""
+        with self._lock:
+            # 写时复制，发布时无需加锁遍历
+            self._handlers[event] = self._handlers.get(event, ()) + (handler,)
+        return lambda: self.unsubscribe(event, handler)
+
+    def unsubscribe(self, event, handler):
+        with self._lock:
+            handlers = self._handlers.get(event, ())
+            if handler in handlers:
+                remaining = list(handlers)
+                remaining.remove(handler)
+                self._handlers[event] = tuple(remaining)
+
+    def has_subscribers(self, event):
+        return bool(self._handlers.get(event))
+
+    def emit(self, event, payload=None):
+        """发布事件；订阅者抛出的异常只记录日志，不影响写入方"""
+        for handler in self._handlers.get(event, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                log(f"事件 {event} 处理失败: {e}", "ERROR")
+
+
+_bus = EventBus()
+
+
+def get_event_bus():
+    return _bus
+
+
+def subscribe(event, handler):
+    return _bus.subscribe(event, handler)
+
+
+def unsubscribe(event, handler):
+    _bus.unsubscribe(event, handler)
+
+
+def emit(event, payload=None):
+    _bus.emit(event, payload)
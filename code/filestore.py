@@ -0,0 +1,262 @@
+"""
+用户文件存储：按用户隔离的文件读取 + 内容缓存，替代 flawed_functions.read_user_file_unsafe
+
+- 路径规范化后（含符号链接解析）必须位于 <root>/<用户名>/ 之内，否则抛出 FileStoreError
+- 文件内容按 LRU 缓存，缓存项以 (路径, mtime, 大小, inode) 标识；
+  命中时只做一次 stat 确认文件未变，不再 open/read
+- 大文件（>= mmap_threshold）以只读 mmap 提供，按需切片，不整体读入内存；
+  映射数单独限制为 max_mapped 个（每个映射占一个文件描述符），超出时淘汰最久未用的映射
+- write_bytes 先写临时文件再原子替换，已通过 open_view 取得的旧内容视图在替换后仍然有效
+
+    store = UserFileStore("user_files")
+    store.read_text("alice", "notes/2024.txt")
+    store.read_bytes("alice", "export.csv", offset=0, length=4096)
+"""
+
+import codecs
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_ROOT = "user_files"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_ENTRIES = 1024
+MMAP_THRESHOLD = 1024 * 1024
+MMAP_MAX_ENTRIES = 64
+
+
+class FileStoreError(ValueError):
+    """用户名或文件名不合法（越出用户目录等）"""
+
+
+class _Entry:
+    __slots__ = ("key", "data", "mapped", "text")
+
+    def __init__(self, key, data, mapped):
+        self.key = key
+        self.data = data        # bytes 或 mmap
+        self.mapped = mapped
+        self.text = None        # 解码后的文本（按编码缓存）
+
+    @property
+    def weight(self):
+        # mmap 的页面由操作系统管理，不计入缓存字节数
+        return 0 if self.mapped else len(self.data)
+
+
+def _file_key(path, st):
+    return path, st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class UserFileStore:
+    """
+    root:           用户目录的根目录
+    max_bytes:      缓存的小文件内容总字节数上限
+    max_entries:    缓存项数上限（含 mmap）
+    max_mapped:     缓存中 mmap 项数上限；淘汰的映射立即关闭，
+                    仍被 open_view 视图引用的映射在视图释放后关闭
+    mmap_threshold: 不小于该字节数的文件以 mmap 提供
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=CACHE_MAX_BYTES, max_entries=CACHE_MAX_ENTRIES,
+                 mmap_threshold=MMAP_THRESHOLD, max_mapped=MMAP_MAX_ENTRIES):
+        self.root = os.path.realpath(root)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_mapped = max_mapped
+        self.mmap_threshold = mmap_threshold
+        self._entries = OrderedDict()  # 真实路径 -> _Entry，右端为最近使用
+        self._bytes = 0
+        self._mapped = 0               # 缓存中的 mmap 项数
+        self._retired = []             # 已淘汰、仍有导出视图而暂未关闭的 mmap
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "mapped": 0}
+
+    # ---------- 路径 ----------
+
+    def user_dir(self, username):
+        if (not isinstance(username, str) or username in ("", ".", "..") or "\0" in username
+                or os.sep in username or (os.altsep and os.altsep in username)):
+            raise FileStoreError(f"用户名不合法: {username!r}")
+        return os.path.join(self.root, username)
+
+    def resolve(self, username, filename):
+        """返回文件的真实路径；越出用户目录（.. / 绝对路径 / 符号链接）时抛出 FileStoreError"""
+        base = self.user_dir(username)
+        if not isinstance(filename, str) or not filename or "\0" in filename or os.path.isabs(filename):
+            raise FileStoreError(f"文件名不合法: {filename!r}")
+        # 先做纯字符串检查，再解析符号链接后复查（用户目录本身也不能链接到根目录之外）
+        path = os.path.normpath(os.path.join(base, filename))
+        real_base = os.path.realpath(base)
+        real = os.path.realpath(path)
+        for candidate, parent in ((path, base), (real, real_base), (real_base, self.root)):
+            if os.path.commonpath([candidate, parent]) != parent or candidate == parent:
+                raise FileStoreError(f"文件不在用户目录内: {filename!r}")
+        return real
+
+    # ---------- 缓存 ----------
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            # 以实际打开的文件为准取标识（stat 之后文件可能已被替换）
+            st = os.fstat(f.fileno())
+            if st.st_size and st.st_size >= self.mmap_threshold:
+                with self._lock:
+                    self._stats["mapped"] += 1
+                return _Entry(_file_key(path, st), mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), True)
+            return _Entry(_file_key(path, st), f.read(), False)
+
+    def _get(self, username, filename):
+        """
+        返回 (缓存项, 视图)；mmap 项同时返回在锁内创建的 memoryview，
+        调用方用完后 release()，期间该映射即使被淘汰也不会被关闭
+        """
+        path = self.resolve(username, filename)
+        st = os.stat(path)
+        key = _file_key(path, st)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.key == key:
+                self._entries.move_to_end(path)
+                self._stats["hits"] += 1
+                return entry, memoryview(entry.data) if entry.mapped else None
+            self._stats["misses"] += 1
+        entry = self._load(path)
+        view = memoryview(entry.data) if entry.mapped else None
+        with self._lock:
+            self._discard(path)
+            if entry.weight <= self.max_bytes:
+                self._entries[path] = entry
+                self._bytes += entry.weight
+                self._mapped += entry.mapped
+                while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                    self._discard(next(iter(self._entries)))
+                    self._stats["evictions"] += 1
+                if self._mapped > self.max_mapped:
+                    # 按 LRU 顺序淘汰映射项，小文件内容不受影响
+                    for victim in [p for p, e in self._entries.items() if e.mapped][:self._mapped - self.max_mapped]:
+                        self._discard(victim)
+                        self._stats["evictions"] += 1
+        return entry, view
+
+    def _discard(self, path):
+        """移出缓存项；mmap 随即关闭，仍有导出视图的映射留到视图释放后再关闭；须持有 _lock"""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry.weight
+            self._mapped -= entry.mapped
+            if entry.mapped:
+                self._retired.append(entry.data)
+        self._close_retired()
+
+    def _close_retired(self):
+        still_exported = []
+        for mapping in self._retired:
+            try:
+                mapping.close()
+            except BufferError:
+                still_exported.append(mapping)
+        self._retired = still_exported
+
+    def invalidate(self, username=None, filename=None):
+        """丢弃缓存：不带参数时清空全部"""
+        with self._lock:
+            if username is None:
+                for path in list(self._entries):
+                    self._discard(path)
+            else:
+                self._discard(self.resolve(username, filename))
+
+    def stats(self):
+        """
+        hits: stat 确认后命中；misses: 需要重新读取；mapped: 以 mmap 打开的次数；
+        maps: 缓存中的 mmap 项数；retired: 已淘汰但仍被 open_view 视图引用、尚未关闭的映射数
+        """
+        with self._lock:
+            self._close_retired()
+            return dict(self._stats, size=len(self._entries), bytes=self._bytes, maps=self._mapped,
+                        retired=len(self._retired))
+
+    # ---------- 读写 ----------
+
+    def open_view(self, username, filename):
+        """
+        整个文件内容的只读 memoryview（不复制）
+        大文件的视图引用其 mmap：视图释放前该映射（及其文件描述符）不会被关闭，
+        因此 max_mapped 只限制缓存中的映射，调用方应在用完后 release() 视图
+        """
+        entry, view = self._get(username, filename)
+        if view is None:
+            view = memoryview(entry.data)
+        return view.toreadonly() if not view.readonly else view
+
+    def read_bytes(self, username, filename, offset=0, length=None):
+        """读取 [offset, offset + length) 的字节；大文件只复制所取的片段"""
+        entry, view = self._get(username, filename)
+        if view is None:
+            data = entry.data
+            end = len(data) if length is None else min(len(data), offset + length)
+            if offset == 0 and end == len(data):
+                return data
+            return data[offset:end]
+        with view:
+            end = len(view) if length is None else min(len(view), offset + length)
+            return bytes(view[offset:end])
+
+    def read_text(self, username, filename, encoding="utf-8"):
+        """
+        读取文本文件（read_user_file_unsafe 的替代），小文件的解码结果一并缓存
+        与 open(..., "r") 一样把 \r\n、\r 换行统一为 \n
+        大文件直接从 mmap 解码，不先复制出一份完整的字节串
+        """
+        entry, view = self._get(username, filename)
+        if view is not None:
+            with view:
+                text = codecs.decode(view, encoding)
+        elif entry.text is not None and entry.text[0] == encoding:
+            return entry.text[1]
+        else:
+            text = entry.data.decode(encoding)
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if not entry.mapped:
+            entry.text = (encoding, text)
+        return text
+
+    def write_bytes(self, username, filename, data):
+        """写入文件：临时文件 + 原子替换，正在读取（或已映射）的旧内容不受影响"""
+        path = self.resolve(username, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with self._lock:
+            self._discard(path)
+
+    def write_text(self, username, filename, text, encoding="utf-8"):
+        self.write_bytes(username, filename, text.encode(encoding))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_file_store(root=DEFAULT_ROOT):
+    """按根目录共享的进程内文件存储"""
+    key = os.path.realpath(root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = UserFileStore(root)
+        return store
+
+
+def read_user_file(username, filename, root=DEFAULT_ROOT):
+    """安全地读取用户文件（read_user_file_unsafe 的替代）"""
+    return get_file_store(root).read_text(username, filename)
@@ -0,0 +1,289 @@
+"""
+公式模块：白名单 AST 编译的用户公式（分账、税费、报表派生列等），替代 calculate_expression_unsafe
+
+- 只允许数字 / 布尔常量、变量、四则与乘方、比较、and / or / not、条件表达式和少量数学函数，
+  不允许属性访问、下标、关键字参数、字符串等，校验通过后才编译为字节码
+- 编译结果按公式原文缓存，同一公式反复求值不再解析
+- 同一公式编译为两份字节码：标量求值保留 Python 原有的短路语义
+  （"a / b if b else 0" 在 b 为 0 时不会求值除法，"x or 5" 返回 x 本身）；
+  列求值把条件表达式与布尔运算改写为 where / logical_and 等函数调用，一百万条记录只是一次数组运算
+
+    compile_formula("amount / people").evaluate(amount=120, people=3)          # 40.0
+    compile_formula("amount * 0.06 if is_expense else 0").evaluate_columns(ledger.formula_columns())
+"""
+
+import ast
+import copy
+import math
+from decimal import Decimal
+from functools import lru_cache
+
+import numpy as np
+
+from .money import Money
+
+MAX_FORMULA_LENGTH = 500
+MAX_EXPONENT = 64
+FORMULA_CACHE_SIZE = 256
+
+
+class FormulaError(ValueError):
+    """公式不合法或求值失败"""
+
+
+def _check_exponent(exponent):
+    if np.max(np.abs(exponent)) > MAX_EXPONENT:
+        raise FormulaError(f"乘方指数不能超过 {MAX_EXPONENT}")
+
+
+def _scalar_pow(base, exponent):
+    _check_exponent(exponent)
+    # 转为浮点数，结果过大时抛出 OverflowError 而不是构造超大整数
+    return float(base) ** exponent
+
+
+def _vector_pow(base, exponent):
+    _check_exponent(exponent)
+    return np.power(np.asarray(base, dtype=np.float64), exponent)
+
+
+def _scalar_min(*values):
+    return min(values)
+
+
+def _scalar_max(*values):
+    return max(values)
+
+
+def _vector_min(*values):
+    return np.minimum.reduce(np.broadcast_arrays(*values))
+
+
+def _vector_max(*values):
+    return np.maximum.reduce(np.broadcast_arrays(*values))
+
+
+# 公式可调用的函数：名称 -> (标量实现, 向量实现)
+FUNCTIONS = {
+    "abs": (abs, np.abs),
+    "round": (round, np.round),
+    "floor": (math.floor, np.floor),
+    "ceil": (math.ceil, np.ceil),
+    "sqrt": (math.sqrt, np.sqrt),
+    "min": (_scalar_min, _vector_min),
+    "max": (_scalar_max, _vector_max),
+}
+
+# AST 改写后引入的内部函数（以下划线开头，公式本身不能引用）
+_SCALAR_HELPERS = {
+    "_pow": _scalar_pow,
+}
+_VECTOR_HELPERS = {
+    "_pow": _vector_pow,
+    "_where": np.where,
+    "_and": np.logical_and,
+    "_or": np.logical_or,
+    "_not": np.logical_not,
+}
+
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub, ast.Not)
+_COMPARE_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+class _Validator(ast.NodeVisitor):
+    """白名单校验，同时收集变量名"""
+
+    def __init__(self):
+        self.variables = set()
+
+    def generic_visit(self, node):
+        raise FormulaError(f"公式中不允许使用 {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if type(node.value) not in (int, float, bool):
+            raise FormulaError(f"公式中只能使用数字常量: {node.value!r}")
+
+    def visit_Name(self, node):
+        if node.id.startswith("_"):
+            raise FormulaError(f"变量名不能以下划线开头: {node.id}")
+        if node.id in FUNCTIONS:
+            raise FormulaError(f"{node.id} 是函数，需要调用")
+        self.variables.add(node.id)
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BIN_OPS):
+            raise FormulaError(f"不支持的运算符: {type(node.op).__name__}")
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPS):
+            raise FormulaError(f"不支持的运算符: {type(node.op).__name__}")
+        self.visit(node.operand)
+
+    def visit_BoolOp(self, node):
+        for value in node.values:
+            self.visit(value)
+
+    def visit_Compare(self, node):
+        for op in node.ops:
+            if not isinstance(op, _COMPARE_OPS):
+                raise FormulaError(f"不支持的比较运算: {type(op).__name__}")
+        self.visit(node.left)
+        for comparator in node.comparators:
+            self.visit(comparator)
+
+    def visit_IfExp(self, node):
+        self.visit(node.test)
+        self.visit(node.body)
+        self.visit(node.orelse)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise FormulaError(f"不支持的函数: {ast.unparse(node.func)}")
+        if node.keywords or not node.args:
+            raise FormulaError(f"函数 {node.func.id} 只接受位置参数")
+        for arg in node.args:
+            if isinstance(arg, ast.Starred):
+                raise FormulaError("公式中不允许使用 * 展开参数")
+            self.visit(arg)
+
+
+def _helper(name, *args):
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=list(args), keywords=[])
+
+
+class _PowRewriter(ast.NodeTransformer):
+    """乘方改写为 _pow 调用以限制指数（标量与列求值都需要）"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return _helper("_pow", node.left, node.right)
+        return node
+
+
+class _Rewriter(_PowRewriter):
+    """把标量语义的语法改写为函数调用，使字节码能作用于数组（只用于列求值）"""
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _helper("_not", node.operand)
+        return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        name = "_and" if isinstance(node.op, ast.And) else "_or"
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = _helper(name, result, value)
+        return result
+
+    def visit_Compare(self, node):
+        # a < b < c 拆成 (a < b) and (b < c)
+        self.generic_visit(node)
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = _helper("_and", result, part)
+        return result
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _helper("_where", node.test, node.body, node.orelse)
+
+
+def _scalar(value):
+    """金额类型统一为浮点数（元）参与计算"""
+    if isinstance(value, (Money, Decimal)):
+        return float(value)
+    return value
+
+
+class Formula:
+    """编译后的公式（不可变，可在线程间共享）"""
+
+    def __init__(self, source, scalar_code, vector_code, variables):
+        self.source = source
+        self.variables = frozenset(variables)
+        self._scalar_code = scalar_code
+        self._vector_code = vector_code
+
+    def __repr__(self):
+        return f"Formula({self.source!r})"
+
+    def _namespace(self, values, helpers, index):
+        missing = self.variables - values.keys()
+        if missing:
+            raise FormulaError(f"缺少变量: {', '.join(sorted(missing))}")
+        namespace = {"__builtins__": {}}
+        namespace.update((name, impl[index]) for name, impl in FUNCTIONS.items())
+        namespace.update(helpers)
+        namespace.update((name, values[name]) for name in self.variables)
+        return namespace
+
+    def evaluate(self, **values):
+        """标量求值"""
+        values = {name: _scalar(value) for name, value in values.items()}
+        try:
+            return eval(self._scalar_code, self._namespace(values, _SCALAR_HELPERS, 0))
+        except FormulaError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise FormulaError(f"公式求值失败: {e}") from None
+
+    def evaluate_columns(self, columns, length=None):
+        """
+        对 NumPy 列整体求值，返回数组
+        除零得到 inf / nan 而不是抛出异常；结果为常量时按 length（或列长度）展开
+        """
+        namespace = self._namespace(columns, _VECTOR_HELPERS, 1)
+        if length is None:
+            lengths = {len(columns[name]) for name in self.variables if np.ndim(columns[name])}
+            length = lengths.pop() if len(lengths) == 1 else None
+        try:
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                result = np.asarray(eval(self._vector_code, namespace))
+        except FormulaError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise FormulaError(f"公式求值失败: {e}") from None
+        if length is not None and result.ndim == 0:
+            result = np.full(length, result)
+        return result
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def compile_formula(source):
+    """校验并编译公式，结果按原文缓存"""
+    if not isinstance(source, str):
+        raise FormulaError("公式必须是字符串")
+    if len(source) > MAX_FORMULA_LENGTH:
+        raise FormulaError(f"公式长度不能超过 {MAX_FORMULA_LENGTH} 个字符")
+    validator = _Validator()
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+        validator.visit(tree)
+        # 改写会原地修改节点，列求值用副本
+        vector_tree = ast.fix_missing_locations(_Rewriter().visit(copy.deepcopy(tree)))
+        scalar_tree = ast.fix_missing_locations(_PowRewriter().visit(tree))
+        scalar_code = compile(scalar_tree, "<formula>", "eval")
+        vector_code = compile(vector_tree, "<formula>", "eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        # 嵌套过深（如数百个连续的负号）时解析、校验或编译都可能递归溢出
+        raise FormulaError(f"公式语法错误或嵌套过深: {e}") from None
+    return Formula(source, scalar_code, vector_code, validator.variables)
+
+
+def calculate_expression(expression, **variables):
+    """安全地计算表达式（calculate_expression_unsafe 的替代）"""
+    return compile_formula(expression).evaluate(**variables)
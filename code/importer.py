@@ -0,0 +1,402 @@
+"""
+账单导入模块：流式读取 CSV / 银行与支付平台账单并批量入库
+流水线：解析 → 规范化金额与日期 → 自动分类 → 批量写入，全程生成器串联，内存占用与文件大小无关。
+"""
+
+import csv
+import os
+import time
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from .category import Category
+from .money import Money
+from .record import Record
+from .utils import DATE_CACHE_SIZE, log
+
+PARSERS = {}
+
+
+def register_parser(cls):
+    """注册账单解析器（类装饰器），按 cls.name 索引"""
+    PARSERS[cls.name] = cls
+    return cls
+
+
+def get_parser(name, **options):
+    """按名称创建解析器实例"""
+    try:
+        return PARSERS[name](**options)
+    except KeyError:
+        raise ValueError(f"未知的账单格式: {name}（可选: {', '.join(sorted(PARSERS))}）") from None
+
+
+class RowError(ValueError):
+    """该行数据无效，写入错误文件"""
+
+
+class SkipRow(Exception):
+    """该行不是收支记录（如说明行、不计收支），直接跳过"""
+
+
+_AMOUNT_JUNK = str.maketrans("", "", "¥￥,， \t元")
+MAX_AMOUNT = Decimal("100000000")  # records.amount 为 DECIMAL(10,2)
+
+
+def normalize_amount(text):
+    """'¥1,234.50' / '-12.3' → Money('1234.50') / Money('-12.30')"""
+    cleaned = (text or "").translate(_AMOUNT_JUNK)
+    if not cleaned:
+        raise RowError("金额为空")
+    try:
+        value = Money.parse(cleaned)
+    except ValueError:
+        raise RowError(f"金额格式错误: {text}") from None
+    if abs(value) >= MAX_AMOUNT:
+        raise RowError(f"金额超出范围: {text}")
+    return value
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def normalize_date(text):
+    """支持 2024-01-05 / 2024/1/5 / 2024.01.05 / 20240105，可带时间部分（按原文缓存结果）"""
+    parts = (text or "").strip().split()
+    if not parts:
+        raise RowError("日期为空")
+    value = parts[0].replace("/", "-").replace(".", "-")
+    if len(value) == 8 and value.isdigit():
+        value = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    try:
+        year, month, day = (int(p) for p in value.split("-"))
+        return date(year, month, day)
+    except ValueError:
+        raise RowError(f"日期格式错误: {text}") from None
+
+
+def _has_undecodable(row):
+    """文件以 surrogateescape 打开，无法解码的字节以代理字符出现，无法再编码为 UTF-8"""
+    try:
+        "".join(row).encode("utf-8")
+        return False
+    except UnicodeEncodeError:
+        return True
+
+
+class StatementParser:
+    """
+    账单解析器基类
+    子类声明表头所需列名，并实现 extract() 把一行映射为 (日期, 金额, 类型, 描述)。
+    """
+
+    name = None
+    label = None
+    encoding = None          # None 表示自动识别 UTF-8 / GB18030
+    header_marker = None     # 表头行必须包含的列名，之前的说明行会被跳过
+    required_columns = ()
+
+    def __init__(self, delimiter=","):
+        self.delimiter = delimiter
+
+    def parse(self, lines):
+        """
+        lines 为文本行迭代器，产出 (行号, 原始行, {列名: 值})
+        无法解析的行（CSV 格式错误、含无法解码的字节）产出 (行号, 原始行, RowError)，由调用方写入错误文件
+        """
+        reader = csv.reader(lines, delimiter=self.delimiter)
+        header = None
+        line_no = 0
+        while True:
+            line_no += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                if header is None:
+                    raise ValueError(f"账单表头之前的内容格式错误: {e}") from None
+                yield line_no, [], RowError(f"CSV 格式错误: {e}")
+                continue
+            if header is not None and _has_undecodable(row):
+                yield line_no, row, RowError("包含无法解码的字节")
+                continue
+            if header is None:
+                cells = [c.strip().lstrip("\ufeff") for c in row]
+                if self._is_header(cells):
+                    header = cells
+                    missing = [c for c in self.required_columns if c not in header]
+                    if missing:
+                        raise ValueError(f"账单缺少必要列: {', '.join(missing)}")
+                continue
+            if not any(c.strip() for c in row):
+                continue
+            yield line_no, row, dict(zip(header, (c.strip() for c in row)))
+        if header is None:
+            raise ValueError(f"未找到账单表头（{self.label or self.name}）")
+
+    def _is_header(self, cells):
+        marker = self.header_marker or (self.required_columns[0] if self.required_columns else None)
+        return marker is None or marker in cells
+
+    def extract(self, fields):
+        """返回 (日期文本, 金额文本, 类型 'income'/'expense'/None, 描述)"""
+        raise NotImplementedError
+
+    def normalize(self, fields):
+        """把一行转换为 save_many 可用的字典"""
+        date_text, amount_text, record_type, description = self.extract(fields)
+        amount = normalize_amount(amount_text)
+        if record_type is None:
+            record_type = "expense" if amount < 0 else "income"
+        elif record_type not in ("income", "expense"):
+            raise RowError(f"无法识别的收支类型: {record_type}")
+        amount = abs(amount)
+        if amount == 0:
+            raise RowError("金额为0")
+        return {
+            "type": record_type,
+            "amount": amount,
+            "description": (description or "")[:255],
+            "date": normalize_date(date_text),
+        }
+
+
+@register_parser
+class GenericCSVParser(StatementParser):
+    """通用 CSV：日期、金额、可选类型、描述；无类型列时负数为支出"""
+
+    name = "csv"
+    label = "通用CSV"
+    encoding = None
+
+    ALIASES = {
+        "date": ("date", "日期", "交易日期"),
+        "amount": ("amount", "金额"),
+        "type": ("type", "类型", "收/支"),
+        "description": ("description", "描述", "备注", "摘要"),
+    }
+    TYPE_VALUES = {"income": "income", "expense": "expense", "收入": "income", "支出": "expense"}
+
+    def __init__(self, delimiter=",", columns=None):
+        super().__init__(delimiter)
+        self.columns = columns or {}
+        self._resolved = None
+
+    def _is_header(self, cells):
+        resolved = {}
+        for key, aliases in self.ALIASES.items():
+            candidates = (self.columns[key],) if key in self.columns else aliases
+            resolved[key] = next((c for c in candidates if c in cells), None)
+        if resolved["date"] and resolved["amount"]:
+            self._resolved = resolved
+            return True
+        return False
+
+    def extract(self, fields):
+        cols = self._resolved
+        type_text = fields.get(cols["type"], "") if cols["type"] else ""
+        record_type = self.TYPE_VALUES.get(type_text.strip().lower(), type_text or None) if type_text else None
+        description = fields.get(cols["description"], "") if cols["description"] else ""
+        return fields.get(cols["date"]), fields.get(cols["amount"]), record_type, description
+
+
+@register_parser
+class AlipayParser(StatementParser):
+    """支付宝交易明细（导出的 CSV 前有若干说明行）"""
+
+    name = "alipay"
+    label = "支付宝账单"
+    header_marker = "交易时间"
+    required_columns = ("交易时间", "收/支", "金额")
+
+    def extract(self, fields):
+        direction = fields.get("收/支", "")
+        if direction == "收入":
+            record_type = "income"
+        elif direction == "支出":
+            record_type = "expense"
+        else:
+            raise SkipRow()  # 不计收支（转账、理财等）
+        if fields.get("交易状态", "") in ("交易关闭", "退款成功"):
+            raise SkipRow()
+        description = fields.get("商品说明") or fields.get("交易对方", "")
+        return fields["交易时间"], fields["金额"], record_type, description
+
+
+@register_parser
+class WeChatPayParser(StatementParser):
+    """微信支付账单明细"""
+
+    name = "wechat"
+    label = "微信支付账单"
+    header_marker = "交易时间"
+    required_columns = ("交易时间", "收/支", "金额(元)")
+
+    def extract(self, fields):
+        direction = fields.get("收/支", "")
+        if direction == "收入":
+            record_type = "income"
+        elif direction == "支出":
+            record_type = "expense"
+        else:
+            raise SkipRow()
+        parts = [fields.get("交易对方", ""), fields.get("商品", "")]
+        description = " ".join(p for p in parts if p and p != "/")
+        return fields["交易时间"], fields["金额(元)"], record_type, description
+
+
+@register_parser
+class CMBDebitParser(StatementParser):
+    """招商银行借记卡交易流水（收入、支出分两列）"""
+
+    name = "cmb"
+    label = "招商银行流水"
+    header_marker = "交易日期"
+    required_columns = ("交易日期", "收入", "支出")
+
+    def extract(self, fields):
+        income, expense = fields.get("收入", ""), fields.get("支出", "")
+        if income and normalize_amount(income) != 0:
+            record_type, amount = "income", income
+        elif expense:
+            record_type, amount = "expense", expense
+        else:
+            raise RowError("收入与支出均为空")
+        description = fields.get("交易备注") or fields.get("交易类型", "")
+        return fields["交易日期"], amount, record_type, description
+
+
+def detect_encoding(path, sample_size=65536):
+    """根据文件开头判断编码：UTF-8（含 BOM）或 GB18030"""
+    with open(path, "rb") as f:
+        sample = f.read(sample_size)
+    if sample.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 样本末尾可能截断了多字节字符
+        if e.start >= len(sample) - 3:
+            return "utf-8"
+        return "gb18030"
+
+
+class RejectWriter:
+    """把无效行写入错误 CSV（首次出错时才创建文件）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line_no, row, reason):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "w", encoding="utf-8-sig", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["line", "reason", "row"])
+        # 原始行可能含无法解码的字节（surrogateescape 代理字符），以 \xNN 形式写出
+        cells = [c.encode("utf-8", "surrogateescape").decode("utf-8", "backslashreplace") for c in row]
+        self._writer.writerow([line_no, reason, *cells])
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StatementImporter:
+    """账单导入流水线"""
+
+    def __init__(self, parser, batch_size=5000, error_path=None, progress=None, progress_every=10000):
+        self.parser = parser
+        self.batch_size = batch_size
+        self.error_path = error_path
+        self.progress = progress
+        self.progress_every = progress_every
+        self.counters = {}
+        self._started = None
+
+    def run(self, path, encoding=None):
+        """执行导入，返回统计信息字典"""
+        encoding = encoding or self.parser.encoding or detect_encoding(path)
+        rejects = RejectWriter(self.error_path or f"{path}.errors.csv")
+        self.counters = {"read": 0, "processed": 0, "inserted": 0, "rejected": 0, "skipped": 0}
+        self._started = time.perf_counter()
+
+        try:
+            # 编码只按文件开头判断；后面个别无法解码的字节不中断导入，该行写入错误文件
+            with open(path, "r", encoding=encoding, errors="surrogateescape", newline="") as f:
+                parsed = self.parser.parse(f)
+                normalized = self._normalize(parsed, rejects)
+                categorized = self._categorize(normalized)
+                counted = self._count_processed(categorized)
+                result = Record.save_many(counted, batch_size=self.batch_size, return_ids=False)
+            self.counters["inserted"] = result["inserted"]
+        finally:
+            rejects.close()
+
+        report = self._snapshot()
+        report["error_file"] = rejects.path if rejects.count else None
+        return report
+
+    def _normalize(self, parsed, rejects):
+        for line_no, row, fields in parsed:
+            self.counters["read"] += 1
+            if isinstance(fields, RowError):
+                self.counters["rejected"] += 1
+                rejects.write(line_no, row, str(fields))
+                continue
+            try:
+                yield self.parser.normalize(fields)
+            except SkipRow:
+                self.counters["skipped"] += 1
+            except (RowError, KeyError) as e:
+                self.counters["rejected"] += 1
+                rejects.write(line_no, row, str(e) or "缺少字段")
+
+    @staticmethod
+    def _categorize(items):
+        matcher = Category.get_matcher()
+        for item in items:
+            match = matcher(item["description"])
+            item["category_id"] = match["id"] if match else None
+            yield item
+
+    def _count_processed(self, items):
+        every = self.progress_every
+        for item in items:
+            yield item
+            self.counters["processed"] += 1
+            if self.progress and self.counters["processed"] % every == 0:
+                self.progress(self._snapshot())
+
+    def _snapshot(self):
+        elapsed = time.perf_counter() - self._started
+        snapshot = dict(self.counters)
+        snapshot["seconds"] = elapsed
+        snapshot["rows_per_second"] = snapshot["processed"] / elapsed if elapsed > 0 else 0.0
+        return snapshot
+
+
+def log_progress(snapshot):
+    """默认进度输出"""
+    log(f"已处理 {snapshot['processed']} 条，{snapshot['rows_per_second']:.0f} 条/秒", "INFO")
+
+
+def import_statement(path, parser="csv", batch_size=5000, error_path=None,
+                     progress=log_progress, progress_every=10000, encoding=None, **parser_options):
+    """导入账单文件的便捷入口"""
+    importer = StatementImporter(
+        get_parser(parser, **parser_options),
+        batch_size=batch_size,
+        error_path=error_path,
+        progress=progress,
+        progress_every=progress_every,
+    )
+    return importer.run(path, encoding=encoding)
@@ -0,0 +1,185 @@
+"""
+日志模块：带后台写线程的结构化日志
+
+- 级别过滤在格式化之前完成，被过滤的消息几乎零开销
+- 时间戳按秒缓存，同一秒内的日志不重复调用 strftime
+- start() 之后控制台与文件输出由后台线程批量写出，有界队列满时写入方阻塞（不丢日志）；
+  未启动时同步写出（测试与脚本场景）
+- WARNING 及以上级别在返回前等待队列写完，保证错误提示不会出现在后续的输入提示之后
+- 可选 JSON Lines 文件输出
+"""
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+
+LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+DEFAULT_LEVEL = "INFO"
+QUEUE_SIZE = 10000
+BATCH_SIZE = 512
+
+_STOP = object()
+
+
+class Logger:
+    """
+    level:     最低输出级别（未知级别按 INFO 处理）
+    json_path: 同时以 JSON Lines 追加写入的文件路径
+    console:   是否输出到 sys.stdout
+    """
+
+    def __init__(self, level=DEFAULT_LEVEL, json_path=None, console=True, queue_size=QUEUE_SIZE):
+        self.set_level(level)
+        self.console = console
+        self.json_path = json_path
+        self._json_file = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._write_lock = threading.Lock()
+        self._ts_second = None
+        self._ts_text = ""
+
+    def set_level(self, level):
+        self._threshold = LEVELS.get(level.upper(), LEVELS[DEFAULT_LEVEL])
+
+    def set_json_path(self, json_path):
+        """切换 JSON Lines 输出文件（None 关闭）"""
+        self.flush()
+        with self._write_lock:
+            if self._json_file is not None:
+                self._json_file.close()
+                self._json_file = None
+            self.json_path = json_path
+
+    def is_enabled(self, level):
+        return LEVELS.get(level.upper(), LEVELS["INFO"]) >= self._threshold
+
+    # ---------- 写入 ----------
+
+    def _timestamp(self):
+        """当前秒的格式化时间，按秒缓存"""
+        now = int(time.time())
+        if now != self._ts_second:
+            self._ts_text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+            self._ts_second = now
+        return self._ts_text
+
+    def log(self, message, level="INFO"):
+        upper = level.upper()
+        severity = LEVELS.get(upper, LEVELS["INFO"])
+        if severity < self._threshold:
+            return
+        entry = (self._timestamp(), upper, message)
+        if self._thread is None:
+            self._write([entry])
+            return
+        self._queue.put(entry)
+        if severity >= LEVELS["WARNING"]:
+            self.flush()
+
+    def _write(self, entries):
+        with self._write_lock:
+            if self.console:
+                out = sys.stdout
+                out.write("".join(f"[{ts}] [{level}] {message}\n" for ts, level, message in entries))
+                out.flush()
+            if self.json_path:
+                if self._json_file is None:
+                    self._json_file = open(self.json_path, "a", encoding="utf-8")
+                self._json_file.write("".join(
+                    json.dumps({"time": ts, "level": level, "message": str(message)}, ensure_ascii=False) + "\n"
+                    for ts, level, message in entries
+                ))
+                self._json_file.flush()
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        """启动后台写线程（可重复调用）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            # 进程退出前写完队列
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """写完队列中的日志后停止后台线程，之后恢复同步写出"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+        self._thread = None
+
+    def flush(self):
+        """等待已提交的日志全部写出"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        self.stop()
+        with self._write_lock:
+            if self._json_file is not None:
+                self._json_file.close()
+                self._json_file = None
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [item for item in batch if item is not _STOP]
+            try:
+                if entries:
+                    self._write(entries)
+            except Exception as e:
+                sys.__stderr__.write(f"日志写入失败: {e}\n")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(entries) != len(batch):
+                return
+
+
+_logger = Logger()
+
+
+def get_logger():
+    return _logger
+
+
+def configure(level=None, json_path=None, console=None):
+    """调整默认日志器的级别与输出目标"""
+    if level is not None:
+        _logger.set_level(level)
+    if json_path is not None:
+        _logger.set_json_path(json_path)
+    if console is not None:
+        _logger.console = console
+    return _logger
+
+
+def start_logging():
+    return _logger.start()
+
+
+def flush_log():
+    _logger.flush()
+
+
+def stop_logging():
+    _logger.stop()
@@ -18,6 +18,8 @@ from code import (
     format_currency,
     parse_date
 )
+from code.alerts import CallbackSink, LogFileSink, start_alert_worker
+from code.logger import flush_log, start_logging
 
 def show_statistics_menu():
     """显示统计菜单"""
@@ -88,7 +90,8 @@ def show_budget_menu():
     print("\n=== 预算管理 ===")
     print("1. 设置预算")
     print("2. 查看预算状态")
-    print("3. 返回主菜单")
+    print("3. 查看全部预算状态")
+    print("4. 返回主菜单")
     
     choice = input("请选择操作：").strip()
     
@@ -97,6 +100,8 @@ def show_budget_menu():
     elif choice == "2":
         BudgetManager.show_budget_status()
     elif choice == "3":
+        BudgetManager.show_all_budget_status()
+    elif choice == "4":
         return
     else:
         log("无效选项", "WARNING")
@@ -168,7 +173,43 @@ def show_search_menu():
     else:
         log("无效选项", "WARNING")
 
+def show_import_menu():
+    """显示账单导入菜单"""
+    from .importer import PARSERS, import_statement
+
+    print("\n=== 导入账单 ===")
+    names = list(PARSERS)
+    for i, name in enumerate(names, 1):
+        print(f"{i}. {PARSERS[name].label}")
+
+    choice = input("请选择账单格式：").strip()
+    try:
+        parser_name = names[int(choice) - 1]
+    except (ValueError, IndexError):
+        log("无效选项", "WARNING")
+        return
+
+    path = input("账单文件路径：").strip()
+    if not path:
+        log("请输入文件路径", "WARNING")
+        return
+
+    try:
+        report = import_statement(path, parser=parser_name)
+    except (OSError, ValueError) as e:
+        log(f"导入失败: {e}", "ERROR")
+        return
+
+    log(f"导入完成：读取 {report['read']} 行，写入 {report['inserted']} 条，"
+        f"跳过 {report['skipped']} 条，拒绝 {report['rejected']} 条，"
+        f"耗时 {report['seconds']:.1f} 秒", "SUCCESS")
+    if report["error_file"]:
+        log(f"被拒绝的行已写入 {report['error_file']}", "WARNING")
+
+
 def main():
+    # 日志改由后台线程批量写出，大量逐行输出（记录列表、搜索结果）不再阻塞
+    start_logging()
     log("=== 个人记账系统启动 ===")
     init_database()
 
@@ -180,14 +221,22 @@ def main():
         Category("购物", "淘宝,京东,超市").save()
         Category("娱乐", "电影,游戏,KTV").save()
 
+    # 记录写入后在后台检测预算阈值，提醒写入日志文件并在控制台显示
+    start_alert_worker([
+        LogFileSink("logs/alerts.log"),
+        CallbackSink(lambda alert: log(f"🔔 {alert['alert']['message']}", "WARNING")),
+    ])
+
     while True:
+        flush_log()
         print("\n=== 主菜单 ===")
         print("1. 添加收支记录")
         print("2. 查看所有记录") 
         print("3. 统计与图表")
         print("4. 记录查询")
         print("5. 预算管理")
-        print("6. 退出")
+        print("6. 导入账单")
+        print("7. 退出")
         choice = input("请选择操作：").strip()
 
         if choice == "1":
@@ -205,9 +254,8 @@ def main():
             log("记录保存成功！", "SUCCESS")
 
         elif choice == "2":
-            records = Record.get_all()
             print("\n=== 收支记录 ===")
-            for r in records:
+            for r in Record.iter_all():
                 log(
                     f"[{r['type']}] {r['description']} - "
                     f"{format_currency(r['amount'])} ({r['category']}) {r['date']}"
@@ -223,6 +271,9 @@ def main():
             show_budget_menu()
             
         elif choice == "6":
+            show_import_menu()
+
+        elif choice == "7":
             confirm_exit()
 
         else:
@@ -0,0 +1,81 @@
+"""
+关键字匹配模块：Aho-Corasick 多模式匹配自动机
+所有关键字预编译成一个自动机，对一段描述只需线性扫描一遍即可找出命中的关键字，
+耗时与关键字数量无关。
+"""
+
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 自动机
+
+    keywords 为 (关键字, 优先级) 序列，优先级越小越优先；
+    search() 返回描述中出现的关键字里优先级最小的那个优先级，没有命中返回 None。
+    匹配不区分大小写。
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]       # 状态转移
+        self._fail = [0]        # 失败指针
+        self._best = [None]     # 到达该状态时已命中的最小优先级（含失败链上的后缀）
+        for keyword, rank in keywords:
+            keyword = keyword.strip().lower()
+            if keyword:
+                self._add(keyword, rank)
+        self._build()
+        self._global_best = min((b for b in self._best if b is not None), default=None)
+
+    def _add(self, keyword, rank):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            state = nxt
+        current = self._best[state]
+        if current is None or rank < current:
+            self._best[state] = rank
+
+    def _build(self):
+        """广度优先计算失败指针，并沿失败链合并命中结果"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._best[self._fail[nxt]]
+                if inherited is not None and (self._best[nxt] is None or inherited < self._best[nxt]):
+                    self._best[nxt] = inherited
+
+    def search(self, text):
+        """扫描一遍 text，返回命中关键字的最小优先级"""
+        if self._global_best is None or not text:
+            return None
+        goto, fail, best_at = self._goto, self._fail, self._best
+        global_best = self._global_best
+        state = 0
+        best = None
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = best_at[state]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == global_best:
+                    break
+        return best
+
+    def __len__(self):
+        return len(self._goto) - 1
@@ -0,0 +1,228 @@
+"""
+数据库迁移模块：按版本号顺序升级表结构，已应用的版本记录在 schema_version 表中
+"""
+
+from datetime import datetime
+
+# 月度汇总表：按 (年, 月, 类型, 分类) 预聚合的金额（分）与笔数，category_id=0 表示未分类
+ROLLUP_DDL = {
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS monthly_rollups (
+            year SMALLINT NOT NULL,
+            month TINYINT NOT NULL,
+            type ENUM('income','expense') NOT NULL,
+            category_id INT NOT NULL DEFAULT 0,
+            total_cents BIGINT NOT NULL DEFAULT 0,
+            count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (year, month, type, category_id)
+        )
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS monthly_rollups (
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            type VARCHAR(10) NOT NULL,
+            category_id INTEGER NOT NULL DEFAULT 0,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (year, month, type, category_id)
+        ) WITHOUT ROWID
+    """,
+}
+
+ROLLUP_INSERT = "INSERT INTO monthly_rollups (year, month, type, category_id, total_cents, count)"
+
+
+def rollup_cents(backend):
+    """逐行四舍五入到分再求和，与 utils.to_cents 的结果一致"""
+    return f"SUM({backend.cast_integer('ROUND(amount * 100)')})"
+
+
+def _rollup_statements(backend):
+    return [
+        ROLLUP_DDL[backend.name],
+        # 回填已有记录；没有日期的记录不属于任何月份，不计入汇总
+        f"""
+        {ROLLUP_INSERT}
+        SELECT YEAR(date), MONTH(date), type, COALESCE(category_id, 0), {rollup_cents(backend)}, COUNT(*)
+        FROM records
+        WHERE date IS NOT NULL
+        GROUP BY YEAR(date), MONTH(date), type, COALESCE(category_id, 0)
+        """,
+    ]
+
+
+def budget_spent_sql(backend, by_category=True):
+    """
+    按预算自身的 [start_date, end_date] 重算 spent_cents 的 UPDATE 语句（不含 WHERE）
+    by_category: 分类预算（category_id 非 0）只统计该分类的支出
+    """
+    category_filter = (
+        "AND (budgets.category_id = 0 OR records.category_id = budgets.category_id)"
+        if by_category else ""
+    )
+    return f"""
+        UPDATE budgets SET spent_cents = (
+            SELECT COALESCE({rollup_cents(backend)}, 0)
+            FROM records
+            WHERE type = 'expense' AND date >= budgets.start_date AND date <= budgets.end_date
+            {category_filter}
+        )
+    """
+
+
+def _budget_counter_statements(backend):
+    return [
+        "ALTER TABLE budgets ADD COLUMN spent_cents BIGINT NOT NULL DEFAULT 0",
+        # 记录写入时按日期定位覆盖该日期的预算
+        "CREATE INDEX idx_budgets_range ON budgets (start_date, end_date)",
+        budget_spent_sql(backend, by_category=False),
+    ]
+
+
+def _budget_category_statements(backend):
+    drop_unique = {
+        "mysql": "ALTER TABLE budgets DROP INDEX uq_budgets_period_start",
+        "sqlite": "DROP INDEX uq_budgets_period_start",
+    }
+    return [
+        "ALTER TABLE budgets ADD COLUMN category_id INT NOT NULL DEFAULT 0",
+        drop_unique[backend.name],
+        "CREATE UNIQUE INDEX uq_budgets_period_start ON budgets (period, start_date, category_id)",
+    ]
+
+
+class MigrationError(Exception):
+    """现有数据不满足迁移的前提，需要人工处理后重新运行"""
+
+
+def _check_duplicate_budgets(cursor, backend):
+    """唯一索引建立前检查重复预算；有重复时列出全部重复行并中止，不替用户删除数据"""
+    cursor.execute("""
+        SELECT b.id, b.period, b.start_date, b.amount
+        FROM budgets b
+        JOIN (
+            SELECT period, start_date FROM budgets GROUP BY period, start_date HAVING COUNT(*) > 1
+        ) dup ON b.period = dup.period AND b.start_date = dup.start_date
+        ORDER BY b.period, b.start_date, b.id
+    """)
+    rows = cursor.fetchall()
+    if rows:
+        details = "; ".join(
+            f"id={budget_id} {period} {start_date} 金额={amount}" for budget_id, period, start_date, amount in rows
+        )
+        raise MigrationError(
+            f"budgets 中存在同一周期的重复预算，请删除多余的行后重新初始化数据库: {details}"
+        )
+
+
+class Migration:
+    """
+    一次结构变更
+
+    statements 可以是：
+    - SQL 列表（两种后端通用）
+    - {后端名: SQL 列表} 字典
+    - 接收 backend 并返回 SQL 列表的函数
+
+    check 为可选的 check(cursor, backend)，在执行语句前检查现有数据，不满足时抛出 MigrationError
+    """
+
+    def __init__(self, version, description, statements, check=None):
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.check = check
+
+    def statements_for(self, backend):
+        if callable(self.statements):
+            return list(self.statements(backend))
+        if isinstance(self.statements, dict):
+            return list(self.statements.get(backend.name, []))
+        return list(self.statements)
+
+
+MIGRATIONS = [
+    Migration(1, "基础表结构：categories / records / budgets",
+              lambda backend: backend.schema_statements()),
+    Migration(2, "records 热点查询索引", [
+        # SearchEngine / Statistics 按类型 + 日期过滤
+        "CREATE INDEX idx_records_type_date ON records (type, date)",
+        # 按分类查询与分类统计
+        "CREATE INDEX idx_records_category_date ON records (category_id, date)",
+        # 时间范围查询与 ORDER BY date
+        "CREATE INDEX idx_records_date ON records (date)",
+        # 金额范围搜索与按金额排序
+        "CREATE INDEX idx_records_amount ON records (amount)",
+    ]),
+    Migration(3, "budgets 按 (period, start_date) 唯一", [
+        "CREATE UNIQUE INDEX uq_budgets_period_start ON budgets (period, start_date)",
+    ], check=_check_duplicate_budgets),
+    Migration(4, "records.description 全文索引（MySQL ngram / SQLite FTS5）",
+              lambda backend: backend.fulltext_statements()),
+    Migration(5, "monthly_rollups 月度汇总表", _rollup_statements),
+    Migration(6, "budgets.spent_cents 预算周期支出计数器", _budget_counter_statements),
+    Migration(7, "budgets.category_id 分类预算（0 表示总预算）", _budget_category_statements),
+]
+
+CURRENT_VERSION = MIGRATIONS[-1].version
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+
+def get_schema_version(conn, backend):
+    """读取当前结构版本；schema_version 表不存在时返回 None"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        row = cursor.fetchone()
+    except backend.errors:
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+    return row[0] or 0
+
+
+def migrate(conn, backend, target=None, migrations=None):
+    """
+    把数据库升级到 target 版本（默认最新），返回本次应用的版本号列表
+    已是最新版本时只执行一次 SELECT
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    target = migrations[-1].version if target is None else target
+
+    current = get_schema_version(conn, backend)
+    if current is not None and current >= target:
+        return []
+
+    cursor = conn.cursor()
+    if current is None:
+        cursor.execute(SCHEMA_VERSION_DDL)
+        current = 0
+
+    applied = []
+    try:
+        for migration in migrations:
+            if migration.version <= current or migration.version > target:
+                continue
+            if migration.check is not None:
+                migration.check(cursor, backend)
+            for statement in migration.statements_for(backend):
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)",
+                (migration.version, migration.description, datetime.now().replace(microsecond=0))
+            )
+            # MySQL 的 DDL 会隐式提交，这里逐个版本提交以保证版本记录与结构一致
+            conn.commit()
+            applied.append(migration.version)
+    finally:
+        cursor.close()
+    return applied
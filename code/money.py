@@ -0,0 +1,283 @@
+"""
+金额模块：以整数分表示的不可变金额类型
+
+- 内部只保存一个 int（分），__slots__ 无实例字典，合计、比较均为整数运算，不产生浮点累加误差
+- 与 int / Decimal / Fraction / float 按数值精确比较（同 Fraction 语义），哈希与相等的数值一致
+- Money.parse 对常见的 "1234.5" / "¥1,234.50" 走纯字符串快速路径，其余交给 Decimal
+- to_cents_array / from_cents_array 在 NumPy int64 数组与金额之间批量转换
+- 写入数据库时使用 to_decimal()，与 DECIMAL(10,2) 列精确对应
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+from numbers import Rational
+
+import numpy as np
+
+_AMOUNT_JUNK = str.maketrans("", "", "¥￥, \t")
+
+
+def _decimal_to_cents(value):
+    if not value.is_finite():
+        raise ValueError(f"金额不是有限数: {value}")
+    return int(value.scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def _parse_cents(text):
+    """字符串 → 分；只含 ASCII 数字与至多两位小数时不经过 Decimal"""
+    cleaned = text.translate(_AMOUNT_JUNK)
+    body = cleaned[1:] if cleaned[:1] in "+-" else cleaned
+    whole, dot, frac = body.partition(".")
+    if (body.isascii() and len(frac) <= 2 and (whole or frac)
+            and (not whole or whole.isdigit()) and (not frac or frac.isdigit())):
+        cents = int(whole or 0) * 100 + (int(frac.ljust(2, "0")) if frac else 0)
+        return -cents if cleaned[:1] == "-" else cents
+    try:
+        return _decimal_to_cents(Decimal(cleaned))
+    except ArithmeticError:
+        # InvalidOperation / Overflow 等
+        raise ValueError(f"金额格式错误: {text}") from None
+
+
+class Money:
+    """不可变金额，cents 为整数分"""
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents=0):
+        if not isinstance(cents, int):
+            # numpy 整数等
+            if isinstance(cents, np.integer):
+                cents = int(cents)
+            else:
+                raise TypeError(f"Money 需要整数分，收到 {type(cents).__name__}；其他类型请用 Money.of()")
+        object.__setattr__(self, "cents", cents)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Money 是不可变对象")
+
+    def __delattr__(self, name):
+        raise AttributeError("Money 是不可变对象")
+
+    # ---------- 构造 ----------
+
+    @staticmethod
+    def from_cents(cents):
+        return Money(cents)
+
+    @staticmethod
+    def parse(text):
+        """'¥1,234.5' / '-12.30' / '8' → Money，格式错误抛出 ValueError"""
+        return Money(_parse_cents(text))
+
+    @staticmethod
+    def of(value):
+        """
+        任意金额表示转换为 Money（四舍五入到分）
+        int 视为元；float 按其十进制表示（repr）换算，0.1 即 1 角
+        """
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, int):
+            return Money(value * 100)
+        if isinstance(value, Decimal):
+            return Money(_decimal_to_cents(value))
+        if isinstance(value, float):
+            return Money(_decimal_to_cents(Decimal(repr(value))))
+        if isinstance(value, str):
+            return Money.parse(value)
+        if isinstance(value, np.integer):
+            return Money(int(value) * 100)
+        if isinstance(value, np.floating):
+            return Money.of(float(value))
+        if isinstance(value, Rational):
+            return Money.of(Decimal(value.numerator) / Decimal(value.denominator))
+        raise TypeError(f"无法转换为金额: {type(value).__name__}")
+
+    # ---------- 批量转换 ----------
+
+    @staticmethod
+    def to_cents_array(values):
+        """金额序列（Money / Decimal / float / int / 字符串）→ int64 分数组"""
+        if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+            # 先在 1e-6 分的精度上消除二进制误差（0.285 * 100 = 28.4999...），再四舍五入（远离零），
+            # 与 Money.of 对常见金额的结果一致
+            scaled = np.round(np.abs(values) * 100, 6)
+            return (np.sign(values) * np.floor(scaled + 0.5)).astype(np.int64)
+        values = list(values)
+        return np.fromiter(
+            (v.cents if type(v) is Money else Money.of(v).cents for v in values),
+            dtype=np.int64, count=len(values),
+        )
+
+    @staticmethod
+    def from_cents_array(cents):
+        """int64 分数组 → Money 列表"""
+        return [Money(c) for c in np.asarray(cents, dtype=np.int64).tolist()]
+
+    @staticmethod
+    def total(values):
+        """金额序列的精确合计"""
+        return Money(sum(v.cents if type(v) is Money else Money.of(v).cents for v in values))
+
+    # ---------- 转换与输出 ----------
+
+    def to_decimal(self):
+        """两位小数的 Decimal，用作数据库参数"""
+        return Decimal(self.cents).scaleb(-2)
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __int__(self):
+        # 向零取整到元，与 int(Decimal) 一致
+        yuan = abs(self.cents) // 100
+        return -yuan if self.cents < 0 else yuan
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __str__(self):
+        sign = "-" if self.cents < 0 else ""
+        yuan, fen = divmod(abs(self.cents), 100)
+        return f"{sign}{yuan}.{fen:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec):
+        if not spec:
+            return str(self)
+        return format(self.to_decimal(), spec)
+
+    def format(self):
+        """¥1,234.56"""
+        sign = "-" if self.cents < 0 else ""
+        yuan, fen = divmod(abs(self.cents), 100)
+        return f"{sign}¥{yuan:,}.{fen:02d}"
+
+    def __reduce__(self):
+        return (Money, (self.cents,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # ---------- 比较 ----------
+
+    def _other_cents(self, other):
+        """other 换算为分（可能是 Fraction）；不支持的类型返回 None"""
+        if type(other) is Money:
+            return other.cents
+        if isinstance(other, int):
+            return other * 100
+        if isinstance(other, Decimal):
+            return Fraction(other) * 100 if other.is_finite() else None
+        if isinstance(other, float):
+            return Fraction(other) * 100 if other == other and abs(other) != float("inf") else None
+        if isinstance(other, Rational):
+            return Fraction(other) * 100
+        return None
+
+    def __eq__(self, other):
+        cents = self._other_cents(other)
+        if cents is None:
+            return NotImplemented
+        return self.cents == cents
+
+    def __hash__(self):
+        # 与数值相等的 int / Decimal / Fraction / float 哈希一致
+        if self.cents % 100 == 0:
+            return hash(self.cents // 100)
+        return hash(Fraction(self.cents, 100))
+
+    def __lt__(self, other):
+        cents = self._other_cents(other)
+        return NotImplemented if cents is None else self.cents < cents
+
+    def __le__(self, other):
+        cents = self._other_cents(other)
+        return NotImplemented if cents is None else self.cents <= cents
+
+    def __gt__(self, other):
+        cents = self._other_cents(other)
+        return NotImplemented if cents is None else self.cents > cents
+
+    def __ge__(self, other):
+        cents = self._other_cents(other)
+        return NotImplemented if cents is None else self.cents >= cents
+
+    # ---------- 运算 ----------
+
+    def __add__(self, other):
+        if type(other) is Money:
+            return Money(self.cents + other.cents)
+        try:
+            return Money(self.cents + Money.of(other).cents)
+        except TypeError:
+            return NotImplemented
+
+    def __radd__(self, other):
+        # sum() 从 0 开始
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        if type(other) is Money:
+            return Money(self.cents - other.cents)
+        try:
+            return Money(self.cents - Money.of(other).cents)
+        except TypeError:
+            return NotImplemented
+
+    def __rsub__(self, other):
+        try:
+            return Money(Money.of(other).cents - self.cents)
+        except TypeError:
+            return NotImplemented
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Money(abs(self.cents))
+
+    def __mul__(self, factor):
+        """乘以数量或比例，结果四舍五入到分"""
+        if isinstance(factor, int):
+            return Money(self.cents * factor)
+        if isinstance(factor, float):
+            factor = Decimal(repr(factor))
+        if isinstance(factor, Decimal):
+            return Money(_decimal_to_cents(Decimal(self.cents) * factor / 100))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        """Money / Money → 比例（float）；Money / 数 → Money（四舍五入到分）"""
+        if type(other) is Money:
+            return self.cents / other.cents
+        if isinstance(other, (int, float, Decimal)):
+            if isinstance(other, float):
+                other = Decimal(repr(other))
+            return Money(_decimal_to_cents(Decimal(self.cents) / other / 100))
+        return NotImplemented
+
+
+ZERO = Money(0)
+
+
+def money_fields(rows, *fields):
+    """把查询结果字典中的金额字段原地转换为 Money，返回 rows"""
+    fields = fields or ("amount",)
+    for row in rows:
+        for field in fields:
+            value = row.get(field)
+            if value is not None:
+                row[field] = Money.of(value)
+    return rows
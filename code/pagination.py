@@ -0,0 +1,143 @@
+"""
+分页模块：基于 (排序键, id) 的键集分页（seek pagination）
+续页令牌记录上一页最后一行的排序键和 id，下一页用 WHERE 条件直接定位，
+无论翻到第几页都只读取 page_size 行，不需要 OFFSET 扫描。
+"""
+
+import base64
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+
+from .money import Money
+
+
+class InvalidPageToken(ValueError):
+    """续页令牌无法解析或与当前查询条件不匹配"""
+
+
+def filters_fingerprint(filters):
+    """查询条件的摘要，防止把一个查询的令牌用到另一个查询上"""
+    payload = json.dumps(filters, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _dump_value(value):
+    if value is None:
+        return ["n", None]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, (Decimal, Money)):
+        return ["m", str(value)]
+    if isinstance(value, (int, float)):
+        return ["f", value]
+    return ["s", str(value)]
+
+
+def _load_value(kind, raw):
+    if kind == "n":
+        return None
+    if kind == "d":
+        return date.fromisoformat(raw)
+    if kind == "m":
+        return Decimal(raw)
+    if kind in ("f", "s"):
+        return raw
+    raise InvalidPageToken("无效的分页令牌")
+
+
+def encode_token(sort_by, sort_order, last_value, last_id, fingerprint):
+    """生成不透明的续页令牌"""
+    payload = [sort_by, sort_order, _dump_value(last_value), last_id, fingerprint]
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_token(token, sort_by, sort_order, fingerprint):
+    """解析续页令牌，返回 (last_value, last_id)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        token_sort, token_order, (kind, raw), last_id, token_fp = payload
+        value = _load_value(kind, raw)
+    except InvalidPageToken:
+        raise
+    except Exception:
+        raise InvalidPageToken("无效的分页令牌") from None
+    if (token_sort, token_order, token_fp) != (sort_by, sort_order, fingerprint) or not isinstance(last_id, int):
+        raise InvalidPageToken("分页令牌与当前查询条件不匹配")
+    return value, last_id
+
+
+def seek_condition(sort_field, sort_order, id_field="r.id"):
+    """
+    生成“位于上一页最后一行之后”的条件，参数顺序为 (value, value, id)
+    展开写法 (f < v OR (f = v AND id < i)) 在 MySQL 与 SQLite 上都能走 (f, id) 索引
+    """
+    op = "<" if sort_order == "DESC" else ">"
+    return f"({sort_field} {op} %s OR ({sort_field} = %s AND {id_field} {op} %s))"
+
+
+def _segment_query(segment, sort_field, sort_order, nullable, seek):
+    """
+    一个分段的附加条件、参数与排序：
+    "value" 段按 (排序列, id) 定位；"null" 段只含排序列为 NULL 的行，按 id 定位
+    排序列保持裸列（不包 COALESCE 等表达式），两段都能走索引
+    """
+    op = "<" if sort_order == "DESC" else ">"
+    if segment == "null":
+        conditions, params = [f"{sort_field} IS NULL"], []
+        if seek is not None:
+            conditions.append(f"r.id {op} %s")
+            params.append(seek[1])
+        return conditions, params, f"r.id {sort_order}"
+    conditions, params = [], []
+    if seek is not None:
+        conditions.append(seek_condition(sort_field, sort_order))
+        params.extend([seek[0], seek[0], seek[1]])
+    elif nullable:
+        conditions.append(f"{sort_field} IS NOT NULL")
+    return conditions, params, f"{sort_field} {sort_order}, r.id {sort_order}"
+
+
+def paginate(cursor, base_sql, where_conditions, params, sort_field, sort_by, sort_order,
+             page_size, page_token, fingerprint, sort_column, nullable=False):
+    """
+    执行一页键集分页查询
+    base_sql 含 {where} 与 {order} 两个占位；sort_column 是结果字典中排序键对应的列名
+    nullable 为真时排序列可为 NULL：NULL 行单独成段（与 SQL 的默认顺序一致，
+    ASC 时在最前、DESC 时在最后），令牌中的排序键为 None 表示停在 NULL 段内
+    返回 {"records": [...], "next_token": 令牌或 None}
+    """
+    if page_size < 1:
+        raise ValueError("每页条数必须大于0")
+    segments = ["value"]
+    if nullable:
+        segments = ["value", "null"] if sort_order == "DESC" else ["null", "value"]
+    seek = None
+    if page_token:
+        seek = decode_token(page_token, sort_by, sort_order, fingerprint)
+        current = "null" if seek[0] is None else "value"
+        if current not in segments:
+            raise InvalidPageToken("无效的分页令牌")
+        segments = segments[segments.index(current):]
+
+    rows = []
+    for segment in segments:
+        extra, extra_params, order_clause = _segment_query(segment, sort_field, sort_order, nullable, seek)
+        seek = None  # 只有令牌所在的分段需要定位，后续分段从头读取
+        conditions = list(where_conditions) + extra
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        query = base_sql.format(where=where_clause, order=order_clause) + " LIMIT %s"
+        cursor.execute(query, list(params) + extra_params + [page_size + 1 - len(rows)])
+        rows.extend(cursor.fetchall())
+        if len(rows) > page_size:
+            break
+
+    next_token = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_token = encode_token(sort_by, sort_order, last[sort_column], last["id"], fingerprint)
+    return {"records": rows, "next_token": next_token}
@@ -0,0 +1,306 @@
+"""
+连接池模块：复用数据库连接，避免每次调用都重新建立连接握手
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class PoolExhaustedError(Exception):
+    """连接池已达上限且在超时时间内没有可用连接"""
+
+
+class PooledConnection:
+    """借出的连接代理：close() 把连接归还连接池，而不是真正断开"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"连接已归还连接池，无法访问 {name}")
+        return getattr(raw, name)
+
+    @property
+    def raw(self):
+        """底层驱动连接"""
+        return self._raw
+
+    def close(self):
+        """归还连接（可重复调用）"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw)
+
+    def discard(self):
+        """关闭底层连接而不归还（如非缓冲结果集未读完时），释放连接池名额"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._discard(raw)
+
+    def __del__(self):
+        # 借出后未 close() 就被回收（调用方异常路径遗漏）：连接状态未知，关闭而不放回空闲队列，
+        # 否则这个名额永远不会释放，连接池最终被耗尽
+        raw = self.__dict__.get("_raw")
+        if raw is not None:
+            self._raw = None
+            try:
+                self._pool._discard(raw)
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                # 回滚失败说明连接已损坏，直接丢弃
+                raw, self._raw = self._raw, None
+                self._pool._discard(raw)
+                return False
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    线程安全的连接池
+
+    connect: 创建底层连接的函数
+    ping:    检查连接是否存活，返回 True/False
+    reset:   归还前清理连接状态（如回滚未提交的事务）
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300.0,
+                 checkout_timeout=10.0, ping=None, ping_interval=30.0, reset=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("连接池大小配置无效：需要 0 <= min_size <= max_size 且 max_size >= 1")
+        self._connect = connect
+        self._ping = ping
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        self._idle = deque()  # (raw, 归还时间)，右端为最近归还
+        self._size = 0        # 已创建且未关闭的连接数（空闲 + 借出）
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "closed": 0,
+            "evicted": 0,
+            "ping_failures": 0,
+            "waits": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    # ---------- 借出与归还 ----------
+
+    def acquire(self, timeout=None):
+        """借出一个连接，返回 PooledConnection"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+
+        with self._cond:
+            if self._closed:
+                raise PoolExhaustedError("连接池已关闭")
+            self._evict_idle_locked(start)
+            while True:
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # 预留名额，在锁外创建连接
+                    self._size += 1
+                    raw, last_used = None, None
+                    break
+                if not waited:
+                    waited = True
+                    self._stats["exhausted"] += 1
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolExhaustedError(
+                        f"连接池已满（max_size={self.max_size}），等待 {timeout:.1f}s 后仍无可用连接"
+                    )
+                self._cond.wait(remaining)
+
+        if raw is not None and not self._is_alive(raw, last_used):
+            # 失效连接直接关闭，沿用它占的名额重新建立
+            _close_quietly(raw)
+            with self._cond:
+                self._stats["closed"] += 1
+            raw = None
+        if raw is None:
+            raw = self._create()
+
+        wait_time = time.monotonic() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_time_total"] += wait_time
+            if wait_time > self._stats["wait_time_max"]:
+                self._stats["wait_time_max"] = wait_time
+        return PooledConnection(self, raw)
+
+    def connection(self, timeout=None):
+        """上下文管理器用法：with pool.connection() as conn: ..."""
+        return self.acquire(timeout)
+
+    def _create(self):
+        """创建新连接；失败时释放预留名额"""
+        try:
+            raw = self._connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    def _is_alive(self, raw, last_used):
+        """借出前的存活检查：最近用过的连接跳过 ping"""
+        if self._ping is None:
+            return True
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            alive = self._ping(raw)
+        except Exception:
+            alive = False
+        if not alive:
+            with self._cond:
+                self._stats["ping_failures"] += 1
+        return alive
+
+    def _release(self, raw):
+        """归还连接，清理失败则丢弃"""
+        if self._reset is not None:
+            try:
+                self._reset(raw)
+            except Exception:
+                self._discard(raw)
+                return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                self._stats["closed"] += 1
+                close_now = True
+            else:
+                self._idle.append((raw, time.monotonic()))
+                close_now = False
+            self._cond.notify()
+        if close_now:
+            _close_quietly(raw)
+
+    def _discard(self, raw):
+        """关闭并移除一个连接"""
+        _close_quietly(raw)
+        with self._cond:
+            self._size -= 1
+            self._stats["closed"] += 1
+            self._cond.notify()
+
+    # ---------- 维护 ----------
+
+    def _evict_idle_locked(self, now):
+        """淘汰空闲过久的连接（保留 min_size 个），调用方需持有锁"""
+        if self.idle_timeout is None:
+            return
+        expired = []
+        # 左端是最久未用的连接
+        while self._idle and self._size > self.min_size:
+            raw, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._stats["evicted"] += 1
+            self._stats["closed"] += 1
+            expired.append(raw)
+        for raw in expired:
+            _close_quietly(raw)
+
+    def prefill(self):
+        """预先建立 min_size 个连接"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            raw = self._create()
+            self._release(raw)
+
+    def evict_idle(self):
+        """手动触发空闲淘汰"""
+        with self._cond:
+            self._evict_idle_locked(time.monotonic())
+
+    def resize(self, min_size=None, max_size=None):
+        """调整连接池大小，多余的空闲连接会被立即关闭"""
+        with self._cond:
+            new_min = self.min_size if min_size is None else min_size
+            new_max = self.max_size if max_size is None else max_size
+            if new_min < 0 or new_max < 1 or new_min > new_max:
+                raise ValueError("连接池大小配置无效：需要 0 <= min_size <= max_size 且 max_size >= 1")
+            self.min_size, self.max_size = new_min, new_max
+            surplus = []
+            while self._idle and self._size > self.max_size:
+                raw, _ = self._idle.popleft()
+                self._size -= 1
+                self._stats["closed"] += 1
+                surplus.append(raw)
+            self._cond.notify_all()
+        for raw in surplus:
+            _close_quietly(raw)
+
+    def close(self):
+        """关闭连接池：空闲连接立即关闭，借出的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._stats["closed"] += len(idle)
+            self._cond.notify_all()
+        for raw in idle:
+            _close_quietly(raw)
+
+    def stats(self):
+        """返回连接池计数器快照"""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["size"] = self._size
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._size - len(self._idle)
+            snapshot["min_size"] = self.min_size
+            snapshot["max_size"] = self.max_size
+        checkouts = snapshot["checkouts"]
+        snapshot["wait_time_avg"] = snapshot["wait_time_total"] / checkouts if checkouts else 0.0
+        return snapshot
+
+
+def _close_quietly(raw):
+    """关闭底层连接，忽略异常"""
+    try:
+        raw.close()
+    except Exception:
+        pass
@@ -3,8 +3,58 @@
 """
 
 from datetime import date
+from .cache import bump_data_version
 from .database import get_connection
+from .events import RECORDS_WRITTEN, emit
+from .budget import Budget
 from .category import Category
+from .money import Money, money_fields
+from .pagination import filters_fingerprint, paginate
+from .rollups import apply_rows
+from .utils import as_date, batched, log, to_cents
+
+LIST_RECORDS_SQL = """
+    SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
+    FROM records r
+    LEFT JOIN categories c ON r.category_id = c.id
+    ORDER BY r.date DESC
+"""
+
+PAGE_RECORDS_SQL = """
+    SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
+    FROM records r
+    LEFT JOIN categories c ON r.category_id = c.id
+    WHERE {where}
+    ORDER BY {order}
+"""
+
+# 按 id 区间读回刚插入的行，核对 lastrowid 推算的 id 是否属于本批
+VERIFY_IDS_SQL = """
+    SELECT type, amount, category_id, description, date
+    FROM records
+    WHERE id BETWEEN %s AND %s
+    ORDER BY id
+"""
+
+# 记录列表支持的键集分页排序：sort_by -> (SQL 字段, 是否可为 NULL)
+PAGE_SORT_FIELDS = {"date": ("r.date", True), "amount": ("r.amount", False)}
+
+INSERT_RECORD_SQL = """
+    INSERT INTO records (type, amount, category_id, description, date)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def _publish_written(rows):
+    """
+    提交后令查询缓存失效并发布写入事件
+    记录已经提交，这里的失败只记录日志：再抛给调用方会让其重试，重复写入同一批记录
+    """
+    try:
+        bump_data_version()
+        emit(RECORDS_WRITTEN, rows)
+    except Exception as e:
+        log(f"记录已写入，但写入通知失败: {e}", "ERROR")
 
 
 class Record:
@@ -12,7 +62,7 @@ class Record:
 
     def __init__(self, record_type, amount, description, date_value=None):
         self.type = record_type  # 'income' or 'expense'
-        self.amount = amount
+        self.amount = Money.of(amount)
         self.description = description
         self.date = date_value or date.today()
 
@@ -24,32 +74,168 @@ class Record:
     def save(self):
         conn = get_connection()
         cursor = conn.cursor()
-        category_id = self._find_category()
-        cursor.execute(
-            """
-            INSERT INTO records (type, amount, category_id, description, date)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (self.type, self.amount, category_id, self.description, self.date)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        try:
+            category_id = self._find_category()
+            row = (self.type, self.amount.to_decimal(), category_id, self.description, self.date)
+            cursor.execute(INSERT_RECORD_SQL, row)
+            # 月度汇总与预算计数器与记录在同一事务内提交
+            apply_rows(cursor, [row])
+            Budget.add_expenses(cursor, [row])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        _publish_written([row])
+
+    @staticmethod
+    def save_many(records, batch_size=1000, return_ids=True):
+        """
+        批量保存记录
+        records 中的元素可以是 Record 对象，也可以是包含 type / amount / description / date
+        （可选 category_id）的字典。分类在内存中完成，每批一次 executemany、一次提交，
+        月度汇总与预算支出计数器随同一批次提交。
+        返回 {"inserted": 行数, "ids": 新记录 id 列表, "batches": 批次数}
+        超大导入可传 return_ids=False，不保留 id 列表以保持内存恒定。
+
+        id 由 lastrowid（本批第一行）推算为连续区间。MySQL 在 innodb_autoinc_lock_mode=2
+        下不保证多行 INSERT 的自增 id 连续，因此提交前按区间读回核对；
+        不一致时撤销本批，改为逐行插入并取每行的 lastrowid。
+        """
+        matcher = Category.get_matcher()
+        conn = get_connection()
+        cursor = conn.cursor()
+        ids = []
+        inserted = 0
+        batches = 0
+        try:
+            for batch in batched(records, batch_size):
+                rows = [Record._to_row(item, matcher) for item in batch]
+                cursor.executemany(INSERT_RECORD_SQL, rows)
+                batch_ids = None
+                if return_ids:
+                    batch_ids = Record._consecutive_ids(cursor, cursor.lastrowid, rows)
+                    if batch_ids is None:
+                        log("批量插入的自增 id 不连续，本批改为逐行插入", "WARNING")
+                        conn.rollback()
+                        batch_ids = []
+                        for row in rows:
+                            cursor.execute(INSERT_RECORD_SQL, row)
+                            batch_ids.append(cursor.lastrowid)
+                apply_rows(cursor, rows)
+                Budget.add_expenses(cursor, rows)
+                conn.commit()
+                _publish_written(rows)
+                if batch_ids:
+                    ids.extend(batch_ids)
+                inserted += len(rows)
+                batches += 1
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        return {"inserted": inserted, "ids": ids, "batches": batches}
+
+    @staticmethod
+    def _consecutive_ids(cursor, first_id, rows):
+        """
+        读回 [first_id, first_id + len(rows)) 区间内的记录，与本批逐行一致时返回该区间的 id，
+        否则（id 不连续、区间内混入其他事务的记录）返回 None
+        """
+        if not first_id:
+            return None
+        last_id = first_id + len(rows) - 1
+        cursor.execute(VERIFY_IDS_SQL, (first_id, last_id))
+        stored = cursor.fetchall()
+        if len(stored) != len(rows):
+            return None
+        for (record_type, amount, category_id, description, date_value), row in zip(stored, rows):
+            if (record_type, to_cents(amount), category_id, description or "", as_date(date_value)) != \
+                    (row[0], to_cents(row[1]), row[2], row[3] or "", as_date(row[4])):
+                return None
+        return list(range(first_id, last_id + 1))
+
+    @staticmethod
+    def _to_row(item, matcher):
+        """把 Record 或字典转换成 INSERT 参数元组"""
+        if isinstance(item, Record):
+            record_type, amount, description, date_value = item.type, item.amount, item.description, item.date
+            category_id = None
+            categorized = False
+        else:
+            record_type, amount, description = item["type"], item["amount"], item.get("description", "")
+            date_value = item.get("date") or date.today()
+            category_id = item.get("category_id")
+            categorized = "category_id" in item
+        if not categorized:
+            match = matcher(description or "")
+            category_id = match["id"] if match else None
+        return (record_type, Money.of(amount).to_decimal(), category_id, description, date_value)
 
     @staticmethod
     def get_all():
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
-            FROM records r
-            LEFT JOIN categories c ON r.category_id = c.id
-            ORDER BY r.date DESC
-        """)
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return result
+        try:
+            cursor.execute(LIST_RECORDS_SQL)
+            result = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return money_fields(result)
+
+    @staticmethod
+    def get_page(page_size=50, page_token=None, sort_by="date", sort_order="DESC"):
+        """
+        键集分页读取记录，按 (date, id) 或 (amount, id) 排序
+        返回 {"records": [...], "next_token": 下一页令牌或 None}
+        """
+        if sort_by not in PAGE_SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort_by}")
+        sort_field, nullable = PAGE_SORT_FIELDS[sort_by]
+        sort_direction = "DESC" if sort_order.upper() == "DESC" else "ASC"
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            page = paginate(
+                cursor, PAGE_RECORDS_SQL, [], [], sort_field, sort_by, sort_direction,
+                page_size, page_token, filters_fingerprint({}), sort_by, nullable,
+            )
+        finally:
+            cursor.close()
+            conn.close()
+        money_fields(page["records"])
+        return page
+
+    @staticmethod
+    def iter_all(chunk_size=500):
+        """
+        逐批读取全部记录的生成器
+        使用非缓冲游标 + fetchmany，结果集由服务端流式返回，内存占用与记录总数无关，
+        第一批数据到达即可开始处理。
+        """
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        finished = False
+        try:
+            cursor.execute(LIST_RECORDS_SQL)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from money_fields(rows)
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+                conn.close()
+            else:
+                # 提前退出时结果集未读完，直接丢弃连接比读完剩余数据更便宜
+                conn.discard()
     
     # 在 record.py 的 Record 类中添加以下方法
 
@@ -58,64 +244,72 @@ def get_by_date_range(start_date, end_date):
     """按时间范围查询记录"""
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
-        FROM records r
-        LEFT JOIN categories c ON r.category_id = c.id
-        WHERE r.date BETWEEN %s AND %s
-        ORDER BY r.date DESC
-    """, (start_date, end_date))
-    result = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return result
+    try:
+        cursor.execute("""
+            SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
+            FROM records r
+            LEFT JOIN categories c ON r.category_id = c.id
+            WHERE r.date BETWEEN %s AND %s
+            ORDER BY r.date DESC
+        """, (start_date, end_date))
+        result = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return money_fields(result)
 
 @staticmethod
 def get_by_category(category_name):
     """按分类查询记录"""
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
-        FROM records r
-        LEFT JOIN categories c ON r.category_id = c.id
-        WHERE c.name = %s
-        ORDER BY r.date DESC
-    """, (category_name,))
-    result = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return result
+    try:
+        cursor.execute("""
+            SELECT r.id, r.type, r.amount, c.name AS category, r.description, r.date
+            FROM records r
+            LEFT JOIN categories c ON r.category_id = c.id
+            WHERE c.name = %s
+            ORDER BY r.date DESC
+        """, (category_name,))
+        result = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return money_fields(result)
 
 @staticmethod
 def get_expenses_summary(period='month'):
-    """获取支出汇总（用于统计）"""
+    """获取支出汇总（用于统计），读取 monthly_rollups 月度汇总表"""
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
-    
-    if period == 'month':
-        query = """
-            SELECT 
-                DATE_FORMAT(date, '%Y-%m') as period,
-                SUM(amount) as total_expense
-            FROM records 
-            WHERE type = 'expense'
-            GROUP BY DATE_FORMAT(date, '%Y-%m')
-            ORDER BY period
-        """
-    elif period == 'year':
-        query = """
-            SELECT 
-                YEAR(date) as period,
-                SUM(amount) as total_expense
-            FROM records 
-            WHERE type = 'expense'
-            GROUP BY YEAR(date)
-            ORDER BY period
-        """
-    
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return result
+    try:
+
+        if period == 'month':
+            query = """
+                SELECT year, month, SUM(total_cents) as total_cents
+                FROM monthly_rollups
+                WHERE type = 'expense'
+                GROUP BY year, month
+                ORDER BY year, month
+            """
+        elif period == 'year':
+            query = """
+                SELECT year, SUM(total_cents) as total_cents
+                FROM monthly_rollups
+                WHERE type = 'expense'
+                GROUP BY year
+                ORDER BY year
+            """
+
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return [
+        {
+            "period": f"{r['year']}-{r['month']:02d}" if period == 'month' else r['year'],
+            "total_expense": Money(int(r['total_cents'])),
+        }
+        for r in rows
+    ]
@@ -0,0 +1,118 @@
+"""
+月度汇总模块：维护 monthly_rollups 预聚合表
+
+记录写入时在同一事务内累加对应 (年, 月, 类型, 分类) 的金额与笔数，
+统计查询只需读取汇总表，不再扫描全部历史记录。
+汇总表与记录不一致时（如直接改库）可运行重建：
+
+    python -m code.rollups --workers 4
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from .cache import bump_data_version
+from .database import get_backend, get_connection, get_pool
+from .migrations import ROLLUP_INSERT, rollup_cents
+from .utils import as_date, log, to_cents
+
+ROLLUP_KEYS = ("year", "month", "type", "category_id")
+ROLLUP_COLUMNS = ("total_cents", "count")
+
+REBUILD_WORKERS = 4
+
+
+def rollup_deltas(rows):
+    """
+    把待插入的记录行（INSERT_RECORD_SQL 的参数元组）合并为汇总增量
+    返回 {(year, month, type, category_id): [total_cents, count]}
+    没有日期的记录不属于任何月份，跳过
+    """
+    deltas = {}
+    for record_type, amount, category_id, _, date_value in rows:
+        if date_value is None:
+            continue
+        day = as_date(date_value)
+        key = (day.year, day.month, record_type, category_id or 0)
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = [0, 0]
+        delta[0] += to_cents(amount)
+        delta[1] += 1
+    return deltas
+
+
+def apply_rows(cursor, rows):
+    """在调用方的事务内累加汇总表，由调用方负责提交"""
+    deltas = rollup_deltas(rows)
+    if not deltas:
+        return
+    sql = get_backend().upsert_increment_sql("monthly_rollups", ROLLUP_KEYS, ROLLUP_COLUMNS)
+    cursor.executemany(sql, [key + tuple(delta) for key, delta in deltas.items()])
+
+
+def _month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def rebuild_month(year, month):
+    """在一个事务内重算单个月份"""
+    start, end = _month_range(year, month)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM monthly_rollups WHERE year = %s AND month = %s", (year, month))
+        cursor.execute(f"""
+            {ROLLUP_INSERT}
+            SELECT %s, %s, type, COALESCE(category_id, 0), {rollup_cents(get_backend())}, COUNT(*)
+            FROM records
+            WHERE date >= %s AND date < %s
+            GROUP BY type, COALESCE(category_id, 0)
+        """, (year, month, start, end))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return year, month
+
+
+def rebuild(workers=REBUILD_WORKERS):
+    """
+    按月并行重建汇总表，每个月份一个事务、一条连接
+    汇总表中已没有对应记录的月份会被清空。返回重算的月份数
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT YEAR(date), MONTH(date) FROM records WHERE date IS NOT NULL")
+        months = {(int(y), int(m)) for y, m in cursor.fetchall()}
+        cursor.execute("SELECT DISTINCT year, month FROM monthly_rollups")
+        months.update((int(y), int(m)) for y, m in cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+    # 线程数不超过连接池上限，避免互相等待连接
+    workers = max(1, min(workers, get_pool().max_size))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda ym: rebuild_month(*ym), sorted(months)))
+    bump_data_version()
+    return len(months)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重建 monthly_rollups 月度汇总表")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS, help="并行线程数")
+    args = parser.parse_args(argv)
+    count = rebuild(args.workers)
+    log(f"月度汇总重建完成，共 {count} 个月份", "INFO")
+
+
+if __name__ == "__main__":
+    main()
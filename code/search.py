@@ -3,30 +3,80 @@
 包含植入的代码缺陷
 """
 
-from .database import get_connection
+from .cache import cached
+from .database import get_backend, get_connection
+from .logger import flush_log
+from .money import Money, money_fields
+from .pagination import filters_fingerprint, paginate
 from .utils import log, format_currency, parse_date
 
 
 class SearchEngine:
     """搜索引擎类"""
     
+    # 排序字段映射：sort_by -> (SQL 表达式, 结果列名, 是否可为 NULL)
+    SORT_MAPPING = {
+        'date': ('r.date', 'date', True),
+        'amount': ('r.amount', 'amount', False),
+        'type': ('r.type', 'type', False),
+        'category': ("COALESCE(c.name, '未分类')", 'category', False),
+    }
+
+    SELECT_SQL = """
+        SELECT 
+            r.id, r.type, r.amount, 
+            COALESCE(c.name, '未分类') as category,
+            r.description, r.date
+        FROM records r
+        LEFT JOIN categories c ON r.category_id = c.id
+        {joins}
+        WHERE {where}
+        ORDER BY {order}
+    """
+
+    # 关键字匹配方式：auto 按检索词长度自动选择，fulltext 优先全文索引，like 强制模糊匹配
+    MATCH_MODES = ('auto', 'fulltext', 'like')
+
     @staticmethod
-    def search_records(keyword=None, category=None, record_type=None, 
-                      min_amount=None, max_amount=None, 
-                      start_date=None, end_date=None, 
-                      sort_by='date', sort_order='DESC'):
-        """多条件搜索记录"""
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # 构建查询条件
+    def _fulltext(keyword, match_mode):
+        """
+        返回全文检索的 (JOIN, 条件, 参数, 相关度排序, 排序参数)；应使用 LIKE 时返回 None
+        检索词短于后端分词粒度（ngram 2 字 / trigram 3 字）时索引无法命中，自动回退到 LIKE
+        """
+        if match_mode not in SearchEngine.MATCH_MODES:
+            raise ValueError(f"不支持的匹配方式: {match_mode}")
+        if match_mode == 'like':
+            return None
+        backend = get_backend()
+        min_length = backend.fulltext_min_length
+        if min_length is None or len(keyword) < min_length:
+            return None
+        return backend.fulltext_match(keyword)
+
+    @staticmethod
+    def _build_conditions(keyword=None, category=None, record_type=None,
+                          min_amount=None, max_amount=None,
+                          start_date=None, end_date=None, match_mode='auto'):
+        """
+        构建查询条件，返回 (条件列表, 参数列表, 额外 JOIN, 相关度排序)
+        相关度排序为 (ORDER BY 表达式, 参数)，未使用全文检索时为 None
+        """
         where_conditions = []
         params = []
+        joins = ""
+        relevance = None
         
-        # 关键字搜索（描述模糊匹配）
+        # 关键字搜索：优先走全文索引，短词回退到描述模糊匹配
         if keyword:
-            where_conditions.append("r.description LIKE %s")
-            params.append(f"%{keyword}%")
+            fulltext = SearchEngine._fulltext(keyword, match_mode)
+            if fulltext:
+                joins, condition, match_params, rank_sql, rank_params = fulltext
+                where_conditions.append(condition)
+                params.extend(match_params)
+                relevance = (rank_sql, rank_params)
+            else:
+                where_conditions.append("r.description LIKE %s")
+                params.append(f"%{keyword}%")
         
         # 分类搜索
         if category:
@@ -41,11 +91,11 @@ class SearchEngine:
         # 金额范围搜索
         if min_amount is not None:
             where_conditions.append("r.amount >= %s")
-            params.append(min_amount)
+            params.append(Money.of(min_amount).to_decimal())
         
         if max_amount is not None:
             where_conditions.append("r.amount <= %s")
-            params.append(max_amount)
+            params.append(Money.of(max_amount).to_decimal())
         
         # 时间范围搜索
         if start_date:
@@ -56,37 +106,88 @@ class SearchEngine:
             where_conditions.append("r.date <= %s")
             params.append(end_date)
         
-        # 构建WHERE子句
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-        
-        # 排序
-        sort_mapping = {
-            'date': 'r.date',
-            'amount': 'r.amount', 
-            'type': 'r.type',
-            'category': 'c.name'
-        }
-        sort_field = sort_mapping.get(sort_by, 'r.date')
-        sort_direction = 'DESC' if sort_order.upper() == 'DESC' else 'ASC'
-        
-        # 执行查询
-        query = f"""
-            SELECT 
-                r.id, r.type, r.amount, 
-                COALESCE(c.name, '未分类') as category,
-                r.description, r.date
-            FROM records r
-            LEFT JOIN categories c ON r.category_id = c.id
-            WHERE {where_clause}
-            ORDER BY {sort_field} {sort_direction}
+        return where_conditions, params, joins, relevance
+
+    @staticmethod
+    @cached("search_records")
+    def search_records(keyword=None, category=None, record_type=None, 
+                      min_amount=None, max_amount=None, 
+                      start_date=None, end_date=None, 
+                      sort_by='date', sort_order='DESC', match_mode='auto'):
         """
+        多条件搜索记录
+        sort_by='relevance' 时按全文检索相关度排序（未使用全文检索时按日期倒序）
+        """
+        # 构建查询条件
+        where_conditions, params, joins, relevance = SearchEngine._build_conditions(
+            keyword, category, record_type, min_amount, max_amount, start_date, end_date,
+            match_mode
+        )
+
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+
+            # 构建WHERE子句
+            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+
+            # 排序
+            sort_field = SearchEngine.SORT_MAPPING.get(sort_by, SearchEngine.SORT_MAPPING['date'])[0]
+            sort_direction = 'DESC' if sort_order.upper() == 'DESC' else 'ASC'
+            order_clause = f"{sort_field} {sort_direction}"
+            if sort_by == 'relevance' and relevance:
+                rank_sql, rank_params = relevance
+                order_clause = f"{rank_sql}, r.date DESC"
+                params = params + rank_params
+
+            # 执行查询
+            query = SearchEngine.SELECT_SQL.format(
+                joins=joins, where=where_clause, order=order_clause
+            )
+
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
         
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return result
+        return money_fields(result)
+
+    @staticmethod
+    def search_page(page_size=20, page_token=None, keyword=None, category=None,
+                    record_type=None, min_amount=None, max_amount=None,
+                    start_date=None, end_date=None, sort_by='date', sort_order='DESC',
+                    match_mode='auto'):
+        """
+        键集分页搜索：按 (排序字段, id) 定位，每页代价与页码无关
+        关键字同样走全文索引，但相关度无法作为键集排序键，排序仍按 sort_by
+        返回 {"records": [...], "next_token": 下一页令牌或 None}
+        """
+        if sort_by not in SearchEngine.SORT_MAPPING:
+            sort_by = 'date'
+        sort_field, sort_column, nullable = SearchEngine.SORT_MAPPING[sort_by]
+        sort_direction = 'DESC' if sort_order.upper() == 'DESC' else 'ASC'
+        filters = dict(keyword=keyword, category=category, record_type=record_type,
+                       min_amount=min_amount, max_amount=max_amount,
+                       start_date=start_date, end_date=end_date)
+        where_conditions, params, joins, _ = SearchEngine._build_conditions(
+            match_mode=match_mode, **filters
+        )
+        base_sql = SearchEngine.SELECT_SQL.format(joins=joins, where="{where}", order="{order}")
+
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            page = paginate(
+                cursor, base_sql, where_conditions, params,
+                sort_field, sort_by, sort_direction, page_size, page_token,
+                filters_fingerprint(filters), sort_column, nullable,
+            )
+        finally:
+            cursor.close()
+            conn.close()
+        money_fields(page["records"])
+        return page
     
     # [IMPLANTED FLAW 3: SQL注入漏洞]
     @staticmethod
@@ -150,8 +251,8 @@ class SearchEngine:
         
         # 转换数据类型
         try:
-            min_amount = float(min_amount) if min_amount else None
-            max_amount = float(max_amount) if max_amount else None
+            min_amount = Money.parse(min_amount) if min_amount else None
+            max_amount = Money.parse(max_amount) if max_amount else None
         except ValueError:
             log("金额格式错误", "ERROR")
             return []
@@ -182,8 +283,8 @@ class SearchEngine:
     
     @staticmethod
     def quick_search(keyword):
-        """快速搜索（按关键字）"""
-        return SearchEngine.search_records(keyword=keyword)
+        """快速搜索（按关键字，结果按相关度排序）"""
+        return SearchEngine.search_records(keyword=keyword, sort_by='relevance')
     
     @staticmethod
     def search_by_date_range(start_date, end_date):
@@ -214,6 +315,7 @@ class SearchManager:
         print(f"\n=== {title} ===")
         print(f"找到 {len(results)} 条记录")
         
+        # 按分累加，合计不受浮点误差影响
         total_income = 0
         total_expense = 0
         
@@ -221,13 +323,16 @@ class SearchManager:
             log(f"[{r['type']}] {r['description']} - {format_currency(r['amount'])} ({r['category']}) {r['date']}")
             
             if r['type'] == 'income':
-                total_income += float(r['amount'])
+                total_income += Money.of(r['amount']).cents
             else:
-                total_expense += float(r['amount'])
+                total_expense += Money.of(r['amount']).cents
+        
+        # 逐行日志由后台线程写出，先写完再输出统计
+        flush_log()
         
         # 显示统计信息
         if total_income > 0 or total_expense > 0:
             print(f"\n📊 统计信息:")
-            print(f"   总收入: {format_currency(total_income)}")
-            print(f"   总支出: {format_currency(total_expense)}")
-            print(f"   净收入: {format_currency(total_income - total_expense)}")
\ No newline at end of file
+            print(f"   总收入: {format_currency(Money(total_income))}")
+            print(f"   总支出: {format_currency(Money(total_expense))}")
+            print(f"   净收入: {format_currency(Money(total_income - total_expense))}")
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""
+快照模块：带版本与结构描述的二进制列式快照，替代基于 pickle 的 load_user_data_unsafe
+
+文件布局（版本 1，小端）：
+
+    magic "ACCTSNAP" | version u16 | 保留 u16 | 头部长度 u32 | JSON 头部 | 对齐填充 | 数据区
+
+- JSON 头部描述行数、元数据（用户信息等，只允许 JSON 类型）以及每列的名称、dtype、偏移与长度
+- 数值 / 布尔 / 日期列按定宽原样存放，每段 8 字节对齐，读取时 numpy.frombuffer 直接引用缓冲区，不复制
+- 字符串列做字典编码：每行一个 u4 编号 + 去重后的字符串表（u4 偏移数组 + UTF-8 字节），
+  字符串表在载入时校验并解码，每行按编号取值
+- 头部记录数据区的 crc32；只接受数值类 dtype，不会反序列化出任意对象
+- 读取按版本号分派，格式升级后旧快照仍由对应的读取函数载入
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"ACCTSNAP"
+FORMAT_VERSION = 1
+PREFIX = struct.Struct("<8sHHI")   # magic, version, 保留, 头部长度
+ALIGNMENT = 8
+
+# 允许的 dtype 种类：有符号 / 无符号整数、浮点、布尔、datetime64
+ALLOWED_KINDS = "iufbM"
+
+
+class SnapshotError(ValueError):
+    """快照格式错误、版本不支持或校验失败"""
+
+
+def _pad(size):
+    return -size % ALIGNMENT
+
+
+class StringColumn:
+    """字典编码的字符串列：codes 为每行的编号"""
+
+    def __init__(self, codes, offsets, blob):
+        self.codes = codes
+        self._offsets = offsets
+        self._blob = blob
+        self._values = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def values(self):
+        """去重后的字符串表"""
+        if self._values is None:
+            blob, offsets = self._blob, self._offsets.tolist()
+            self._values = [bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(len(offsets) - 1)]
+        return self._values
+
+    def __getitem__(self, index):
+        return self.values()[self.codes[index]]
+
+    def tolist(self):
+        values = self.values()
+        return [values[code] for code in self.codes.tolist()]
+
+
+class Snapshot:
+    """载入后的快照：columns 中的数组是底层缓冲区的只读视图"""
+
+    def __init__(self, version, rows, meta, columns, buffer=None):
+        self.version = version
+        self.rows = rows
+        self.meta = meta
+        self.columns = columns
+        # 持有 mmap 等底层缓冲区，保证视图有效
+        self._buffer = buffer
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def iter_rows(self):
+        """逐行字典（慢路径，便于调试与导出）"""
+        names = list(self.columns)
+        lists = [self.columns[name].tolist() for name in names]
+        for values in zip(*lists):
+            yield dict(zip(names, values))
+
+
+# ==================== 写入 ====================
+
+def _encode_strings(values):
+    """字符串列 → (codes u4 数组, offsets u4 数组, utf-8 字节)"""
+    table = {}
+    codes = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype="<u4", count=len(values))
+    encoded = [v.encode("utf-8") for v in table]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return codes, offsets, b"".join(encoded)
+
+
+def dumps(columns, meta=None):
+    """
+    把 {列名: 数组 或 字符串列表} 编码为快照字节串
+    所有列长度必须相同；meta 为可 JSON 序列化的字典
+    """
+    sections = []
+    descriptors = []
+    offset = 0
+    rows = None
+
+    def add_section(data):
+        nonlocal offset
+        data = bytes(data)
+        start = offset
+        sections.append(data)
+        sections.append(b"\0" * _pad(len(data)))
+        offset += len(data) + _pad(len(data))
+        return {"offset": start, "nbytes": len(data)}
+
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype.kind != "O":
+            array = values
+        elif all(isinstance(v, str) for v in values):
+            array = None
+        else:
+            array = np.asarray(values)
+        if rows is None:
+            rows = len(values)
+        elif len(values) != rows:
+            raise SnapshotError(f"列 {name} 的长度 {len(values)} 与其他列 {rows} 不一致")
+
+        if array is None or array.dtype.kind == "U":
+            codes, offsets, blob = _encode_strings([str(v) for v in values])
+            descriptors.append({
+                "name": name, "dtype": "str",
+                "codes": add_section(codes.tobytes()),
+                "offsets": add_section(offsets.tobytes()),
+                "blob": add_section(blob),
+            })
+            continue
+        if array.dtype.kind not in ALLOWED_KINDS or array.ndim != 1:
+            raise SnapshotError(f"列 {name} 的类型 {array.dtype} 不能写入快照")
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        descriptors.append({"name": name, "dtype": array.dtype.str, **add_section(array.tobytes())})
+
+    data = b"".join(sections)
+    header = json.dumps({
+        "rows": rows or 0,
+        "meta": meta or {},
+        "columns": descriptors,
+        "crc32": zlib.crc32(data),
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header += b" " * _pad(PREFIX.size + len(header))
+    return PREFIX.pack(MAGIC, FORMAT_VERSION, 0, len(header)) + header + data
+
+
+def save(path, columns, meta=None):
+    with open(path, "wb") as f:
+        f.write(dumps(columns, meta))
+
+
+# ==================== 读取 ====================
+
+def _decode_strings(offsets, blob):
+    """载入时校验并解码字符串表：偏移单调、不越界，每个字符串都是合法 UTF-8"""
+    bounds = offsets.tolist()
+    if not bounds or bounds[0] != 0 or bounds[-1] > len(blob) or any(a > b for a, b in zip(bounds, bounds[1:])):
+        raise SnapshotError("字符串表偏移损坏")
+    raw = bytes(blob)
+    try:
+        return [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+    except UnicodeDecodeError:
+        raise SnapshotError("字符串表不是合法的 UTF-8") from None
+
+
+def _read_v1(view, header_end, verify):
+    header_size = PREFIX.unpack_from(view)[3]
+    try:
+        header = json.loads(bytes(view[PREFIX.size:PREFIX.size + header_size]).decode("utf-8"))
+        rows = int(header["rows"])
+        descriptors = list(header["columns"])
+        meta = header.get("meta") or {}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise SnapshotError("快照头部损坏") from None
+    if rows < 0 or not isinstance(meta, dict):
+        raise SnapshotError("快照头部损坏")
+    data = view[header_end:]
+    if verify and zlib.crc32(data) != header.get("crc32"):
+        raise SnapshotError("快照数据校验失败")
+
+    def section(spec, dtype):
+        start, nbytes = int(spec["offset"]), int(spec["nbytes"])
+        if start < 0 or nbytes < 0 or start + nbytes > len(data) or nbytes % dtype.itemsize:
+            raise SnapshotError("快照数据区越界")
+        return np.frombuffer(data, dtype=dtype, count=nbytes // dtype.itemsize, offset=start)
+
+    columns = {}
+    # 头部来自不可信输入：描述项缺字段、类型不对、dtype 无法识别等都转换为 SnapshotError
+    try:
+        for spec in descriptors:
+            name = str(spec["name"])
+            if spec["dtype"] == "str":
+                codes = section(spec["codes"], np.dtype("<u4"))
+                offsets = section(spec["offsets"], np.dtype("<u4"))
+                blob = section(spec["blob"], np.dtype("u1"))
+                column = StringColumn(codes, offsets, blob)
+                column._values = _decode_strings(offsets, blob)
+                if len(codes) and codes.max() >= len(column._values):
+                    raise SnapshotError(f"列 {name} 的字符串编号越界")
+            else:
+                if not isinstance(spec["dtype"], str):
+                    raise SnapshotError(f"列 {name} 的类型无法识别")
+                dtype = np.dtype(spec["dtype"])
+                if dtype.kind not in ALLOWED_KINDS or dtype.fields is not None or dtype.subdtype is not None:
+                    raise SnapshotError(f"列 {name} 的类型不允许: {dtype}")
+                column = section(spec, dtype)
+            if len(column) != rows:
+                raise SnapshotError(f"列 {name} 的行数与头部不一致")
+            columns[name] = column
+    except SnapshotError:
+        raise
+    except (KeyError, TypeError, ValueError, AttributeError, OverflowError) as e:
+        raise SnapshotError(f"快照列描述损坏: {e!r}") from None
+    return rows, meta, columns
+
+
+# 版本号 -> 读取函数；格式升级时新增条目，旧版本的读取函数保留
+_READERS = {1: _read_v1}
+
+
+def loads(buffer, verify=True):
+    """
+    从 bytes / bytearray / memoryview / mmap 载入快照，数组直接引用 buffer（不复制）
+    verify=False 跳过 crc32 校验（可信来源的大快照）
+    """
+    view = memoryview(buffer).cast("B")
+    if len(view) < PREFIX.size:
+        raise SnapshotError("不是快照数据")
+    magic, version, _, header_size = PREFIX.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError("不是快照数据")
+    reader = _READERS.get(version)
+    if reader is None:
+        raise SnapshotError(f"不支持的快照版本: {version}（当前版本 {FORMAT_VERSION}）")
+    header_end = PREFIX.size + header_size
+    if header_end > len(view):
+        raise SnapshotError("快照头部不完整")
+    rows, meta, columns = reader(view, header_end, verify)
+    return Snapshot(version, rows, meta, columns, buffer)
+
+
+def load(path, verify=True):
+    """以只读 mmap 载入快照文件，列数据按需从页缓存读取"""
+    with open(path, "rb") as f:
+        # 空文件无法映射；过短的文件也不可能是快照
+        if os.fstat(f.fileno()).st_size < PREFIX.size:
+            raise SnapshotError(f"{path} 不是快照文件")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(mapped, verify)
+
+
+# ==================== 用户数据与账本 ====================
+
+def dump_user_data(user, records=()):
+    """
+    用户信息（JSON 字典）+ 记录列表编码为快照
+    记录为 Record.get_all() 结构的字典：type / amount / category / description / date
+    """
+    from .analytics import EPOCH_ORDINAL
+    from .money import Money
+
+    records = list(records)
+    columns = {
+        "type": [r["type"] for r in records],
+        "amount_cents": Money.to_cents_array([r["amount"] for r in records]),
+        "category": [r.get("category") or "" for r in records],
+        "description": [r.get("description") or "" for r in records],
+        "days": np.fromiter((r["date"].toordinal() - EPOCH_ORDINAL for r in records), dtype=np.int32, count=len(records)),
+    }
+    return dumps(columns, {"user": user})
+
+
+def load_user_data(data, verify=True):
+    """安全地载入用户数据快照（load_user_data_unsafe 的替代），返回 Snapshot，用户信息在 meta["user"]"""
+    return loads(data, verify)
+
+
+def dump_ledger(ledger):
+    """分析账本（或其切片）编码为快照"""
+    return dumps(
+        {"cents": ledger.cents, "days": ledger.days, "categories": ledger.categories, "types": ledger.types},
+        {"category_names": ledger.category_names},
+    )
+
+
+def load_ledger(data, verify=True):
+    """从快照构建 Ledger，金额等列直接引用快照缓冲区"""
+    from .analytics import Ledger
+
+    snapshot = data if isinstance(data, Snapshot) else loads(data, verify)
+    try:
+        return Ledger(snapshot["cents"], snapshot["days"], snapshot["categories"], snapshot["types"],
+                      snapshot.meta["category_names"])
+    except KeyError as e:
+        raise SnapshotError(f"不是账本快照，缺少 {e}") from None
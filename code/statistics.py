@@ -4,8 +4,11 @@
 
 import matplotlib.pyplot as plt
 import matplotlib
-from datetime import datetime
-from .database import get_connection
+from datetime import date, datetime
+from .cache import cached
+from .database import get_backend, get_connection
+from .migrations import rollup_cents
+from .money import Money
 from .utils import log, format_currency
 
 # 修复中文显示问题
@@ -28,103 +31,151 @@ except:
 
 
 class Statistics:
-    """统计计算类"""
+    """
+    统计计算类
+    按年 / 月的统计读取 monthly_rollups 月度汇总表；
+    传入 start_date / end_date 等临时过滤条件时回退到扫描 records 原始记录。
+    """
     
     def __init__(self):
         self.period = "month"
-    
-    def get_expense_by_category(self, year=None, month=None):
-        """按分类统计支出（用于饼图）"""
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # 构建时间条件
-        where_conditions = ["r.type = 'expense'"]
+
+    @staticmethod
+    def _rollup_conditions(year, month, record_type=None):
+        """汇总表的过滤条件，返回 (条件列表, 参数列表)"""
+        where_conditions = []
+        params = []
+        if record_type:
+            where_conditions.append("mr.type = %s")
+            params.append(record_type)
+        if year:
+            where_conditions.append("mr.year = %s")
+            params.append(int(year))
+            if month:
+                where_conditions.append("mr.month = %s")
+                params.append(int(month))
+        return where_conditions, params
+
+    @staticmethod
+    def _record_conditions(year, month, start_date, end_date):
+        """原始记录的过滤条件：年月换算成日期区间以便走 date 索引"""
+        where_conditions = []
         params = []
-        
         if year and month:
-            where_conditions.append("YEAR(r.date) = %s AND MONTH(r.date) = %s")
-            params.extend([year, month])
+            start = date(int(year), int(month), 1)
+            end = date(int(year) + 1, 1, 1) if int(month) == 12 else date(int(year), int(month) + 1, 1)
+            where_conditions.append("r.date >= %s AND r.date < %s")
+            params.extend([start, end])
         elif year:
-            where_conditions.append("YEAR(r.date) = %s")
-            params.append(year)
-        
-        where_clause = " AND ".join(where_conditions)
-        
-        query = f"""
+            where_conditions.append("r.date >= %s AND r.date < %s")
+            params.extend([date(int(year), 1, 1), date(int(year) + 1, 1, 1)])
+        if start_date:
+            where_conditions.append("r.date >= %s")
+            params.append(start_date)
+        if end_date:
+            where_conditions.append("r.date <= %s")
+            params.append(end_date)
+        return where_conditions, params
+
+    @staticmethod
+    def _query(query, params):
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return result
+    
+    @cached("statistics.get_expense_by_category")
+    def get_expense_by_category(self, year=None, month=None, start_date=None, end_date=None):
+        """按分类统计支出（用于饼图）"""
+        if start_date or end_date:
+            where_conditions, params = Statistics._record_conditions(year, month, start_date, end_date)
+            where_clause = " AND ".join(["r.type = 'expense'"] + where_conditions)
+            rows = Statistics._query(f"""
+                SELECT 
+                    COALESCE(c.name, '未分类') as category, 
+                    {rollup_cents(get_backend())} as total_cents
+                FROM records r
+                LEFT JOIN categories c ON r.category_id = c.id
+                WHERE {where_clause}
+                GROUP BY c.name
+                HAVING total_cents > 0
+                ORDER BY total_cents DESC
+            """, params)
+            return [{"category": r["category"], "total": Money(int(r["total_cents"]))} for r in rows]
+
+        where_conditions, params = Statistics._rollup_conditions(year, month, 'expense')
+        rows = Statistics._query(f"""
             SELECT 
                 COALESCE(c.name, '未分类') as category, 
-                SUM(r.amount) as total
-            FROM records r
-            LEFT JOIN categories c ON r.category_id = c.id
-            WHERE {where_clause}
+                SUM(mr.total_cents) as total_cents
+            FROM monthly_rollups mr
+            LEFT JOIN categories c ON mr.category_id = c.id
+            WHERE {" AND ".join(where_conditions)}
             GROUP BY c.name
-            HAVING total > 0
-            ORDER BY total DESC
-        """
-        
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return result
+            HAVING total_cents > 0
+            ORDER BY total_cents DESC
+        """, params)
+        return [{"category": r["category"], "total": Money(int(r["total_cents"]))} for r in rows]
     
-    def get_expense_trend(self, year=None):
+    @cached("statistics.get_expense_trend")
+    def get_expense_trend(self, year=None, start_date=None, end_date=None):
         """获取支出趋势（用于折线图）"""
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                YEAR(r.date) as year,
-                MONTH(r.date) as month,
-                SUM(r.amount) as monthly_expense
-            FROM records r
-            WHERE r.type = 'expense'
-            GROUP BY YEAR(r.date), MONTH(r.date)
-            ORDER BY year, month
-        """
-        
-        cursor.execute(query)
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return result
+        if start_date or end_date:
+            where_conditions, params = Statistics._record_conditions(year, None, start_date, end_date)
+            where_clause = " AND ".join(["r.type = 'expense'"] + where_conditions)
+            rows = Statistics._query(f"""
+                SELECT 
+                    YEAR(r.date) as year,
+                    MONTH(r.date) as month,
+                    {rollup_cents(get_backend())} as total_cents
+                FROM records r
+                WHERE {where_clause}
+                GROUP BY YEAR(r.date), MONTH(r.date)
+                ORDER BY year, month
+            """, params)
+        else:
+            where_conditions, params = Statistics._rollup_conditions(year, None, 'expense')
+            rows = Statistics._query(f"""
+                SELECT mr.year, mr.month, SUM(mr.total_cents) as total_cents
+                FROM monthly_rollups mr
+                WHERE {" AND ".join(where_conditions)}
+                GROUP BY mr.year, mr.month
+                ORDER BY mr.year, mr.month
+            """, params)
+        return [
+            {"year": int(r["year"]), "month": int(r["month"]), "monthly_expense": Money(int(r["total_cents"]))}
+            for r in rows
+        ]
     
-    def get_income_vs_expense(self, year=None, month=None):
+    @cached("statistics.get_income_vs_expense")
+    def get_income_vs_expense(self, year=None, month=None, start_date=None, end_date=None):
         """获取收入支出对比"""
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        where_conditions = []
-        params = []
-        
-        if year and month:
-            where_conditions.append("YEAR(date) = %s AND MONTH(date) = %s")
-            params.extend([year, month])
-        elif year:
-            where_conditions.append("YEAR(date) = %s")
-            params.append(year)
-        
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-        
-        query = f"""
-            SELECT 
-                type,
-                SUM(amount) as total
-            FROM records 
-            WHERE {where_clause}
-            GROUP BY type
-        """
-        
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return result
+        if start_date or end_date:
+            where_conditions, params = Statistics._record_conditions(year, month, start_date, end_date)
+            where_clause = " AND ".join(where_conditions)
+            rows = Statistics._query(f"""
+                SELECT 
+                    r.type,
+                    {rollup_cents(get_backend())} as total_cents
+                FROM records r
+                WHERE {where_clause}
+                GROUP BY r.type
+            """, params)
+        else:
+            where_conditions, params = Statistics._rollup_conditions(year, month)
+            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+            rows = Statistics._query(f"""
+                SELECT mr.type, SUM(mr.total_cents) as total_cents
+                FROM monthly_rollups mr
+                WHERE {where_clause}
+                GROUP BY mr.type
+            """, params)
+        return [{"type": r["type"], "total": Money(int(r["total_cents"]))} for r in rows]
 
 
 class Chart:
@@ -138,8 +189,8 @@ class Chart:
             return False
         
         categories = [item['category'] for item in category_data]
-        amounts = [float(item['total']) for item in category_data]
-        total = sum(amounts)
+        amounts = (Money.to_cents_array(item['total'] for item in category_data) / 100).tolist()
+        total = Money.total(item['total'] for item in category_data)
         
         plt.figure(figsize=(10, 8))
         
@@ -172,7 +223,7 @@ class Chart:
         
         # 格式化月份标签
         months = [f"{item['year']}-{item['month']:02d}" for item in trend_data]
-        expenses = [float(item['monthly_expense']) for item in trend_data]
+        expenses = (Money.to_cents_array(item['monthly_expense'] for item in trend_data) / 100).tolist()
         
         plt.figure(figsize=(12, 6))
         plt.plot(months, expenses, marker='o', linewidth=2, markersize=6, color='#FF6B6B')
@@ -209,7 +260,7 @@ class Chart:
         # 使用英文标签避免中文显示问题
         type_mapping = {'income': 'Income', 'expense': 'Expense'}
         types = [type_mapping.get(item['type'], item['type']) for item in comparison_data]
-        amounts = [float(item['total']) for item in comparison_data]
+        amounts = (Money.to_cents_array(item['total'] for item in comparison_data) / 100).tolist()
         colors = ['#4CAF50' if t == 'Income' else '#FF6B6B' for t in types]
         
         plt.figure(figsize=(8, 6))
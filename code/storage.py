@@ -0,0 +1,497 @@
+"""
+存储后端模块：统一 MySQL 与嵌入式 SQLite 的连接方式和方言差异
+业务模块只写一种 SQL（MySQL 风格的 %s 占位符与 YEAR()/MONTH()/DATE_FORMAT()），
+SQLite 驱动在这里一次性完成占位符转换、函数注册和建表语句替换。
+"""
+
+import itertools
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from .config import ConfigError
+
+
+class StorageBackend:
+    """存储后端基类"""
+
+    name = None
+    # 连接失败时 get_connection() 捕获的异常类型
+    errors = ()
+
+    def connect(self):
+        """建立一条新连接"""
+        raise NotImplementedError
+
+    def ping(self, conn):
+        """连接存活检查"""
+        raise NotImplementedError
+
+    def reset(self, conn):
+        """归还连接池前回滚未结束的事务"""
+        if getattr(conn, "in_transaction", True):
+            conn.rollback()
+
+    def schema_statements(self):
+        """建表语句列表"""
+        raise NotImplementedError
+
+    # 全文检索：检索词短于该长度时回退到 LIKE；None 表示不支持全文检索
+    fulltext_min_length = None
+
+    def fulltext_statements(self):
+        """建立 records.description 全文索引的语句"""
+        return []
+
+    def fulltext_match(self, term):
+        """
+        返回 (JOIN 子句, WHERE 条件, 条件参数, 按相关度排序的 ORDER BY 表达式, 排序参数)
+        """
+        raise NotImplementedError
+
+    def upsert_increment_sql(self, table, keys, columns):
+        """插入一行；唯一键 keys 冲突时把 columns 累加到已有行上"""
+        raise NotImplementedError
+
+    def cast_integer(self, expression):
+        """把数值表达式转换为整数"""
+        return f"CAST({expression} AS INTEGER)"
+
+    def begin_snapshot(self, conn):
+        """开启只读的一致性快照事务，之后的查询看到同一时刻的数据；以 rollback() 结束"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端持有的资源"""
+
+
+# ==================== MySQL ====================
+
+MYSQL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        keywords TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS records (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        type ENUM('income', 'expense') NOT NULL,
+        amount DECIMAL(10,2) NOT NULL,
+        category_id INT,
+        description VARCHAR(255),
+        date DATE,
+        FOREIGN KEY (category_id) REFERENCES categories(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS budgets (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        period ENUM('month','year') NOT NULL,
+        amount DECIMAL(10,2),
+        start_date DATE,
+        end_date DATE
+    )
+    """,
+]
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL 驱动（mysql-connector-python）"""
+
+    name = "mysql"
+
+    def __init__(self, host="localhost", user="root", password=None,
+                 database="accounting_system", port=3306, **options):
+        import mysql.connector
+        self._connector = mysql.connector
+        self.errors = (mysql.connector.Error,)
+        self.params = dict(host=host, user=user, password=password,
+                           database=database, port=port, **options)
+
+    def connect(self):
+        # 密码只来自配置（config.json 的 mysql.password 或 ACCOUNTING_MYSQL_PASSWORD），
+        # 在建立连接时才检查，只创建后端对象（如切换到 SQLite 前）不需要密码
+        if self.params["password"] is None:
+            raise ConfigError("未配置 MySQL 密码：请设置 config.json 的 mysql.password 或环境变量 ACCOUNTING_MYSQL_PASSWORD")
+        return self._connector.connect(**self.params)
+
+    def ping(self, conn):
+        return conn.is_connected()
+
+    def schema_statements(self):
+        return list(MYSQL_SCHEMA)
+
+    # ngram 解析器默认 ngram_token_size=2，单字检索无法命中索引
+    fulltext_min_length = 2
+
+    def fulltext_statements(self):
+        return [
+            "ALTER TABLE records ADD FULLTEXT INDEX ft_records_description (description) WITH PARSER ngram"
+        ]
+
+    def fulltext_match(self, term):
+        # 布尔模式下的短语查询要求 ngram 连续出现，与 LIKE '%term%' 语义一致
+        phrase = '"' + term.replace('"', " ") + '"'
+        expression = "MATCH(r.description) AGAINST (%s IN BOOLEAN MODE)"
+        return "", expression, [phrase], f"{expression} DESC", [phrase]
+
+    def upsert_increment_sql(self, table, keys, columns):
+        names = list(keys) + list(columns)
+        updates = ", ".join(f"{c} = {c} + VALUES({c})" for c in columns)
+        return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+                f"ON DUPLICATE KEY UPDATE {updates}")
+
+    def cast_integer(self, expression):
+        return f"CAST({expression} AS SIGNED)"
+
+    def begin_snapshot(self, conn):
+        # InnoDB 在 REPEATABLE READ 下立即建立读视图
+        conn.start_transaction(consistent_snapshot=True, isolation_level="REPEATABLE READ", readonly=True)
+
+
+# ==================== SQLite ====================
+
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100) NOT NULL,
+        keywords TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+        amount DECIMAL(10,2) NOT NULL,
+        category_id INTEGER REFERENCES categories(id),
+        description VARCHAR(255),
+        date DATE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS budgets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        period TEXT NOT NULL CHECK (period IN ('month', 'year')),
+        amount DECIMAL(10,2),
+        start_date DATE,
+        end_date DATE
+    )
+    """,
+]
+
+# records.description 的 FTS5 外部内容索引，由触发器与 records 保持同步
+SQLITE_FULLTEXT = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+        description, content='records', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS records_fts_ai AFTER INSERT ON records BEGIN
+        INSERT INTO records_fts (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON records BEGIN
+        INSERT INTO records_fts (records_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF description ON records BEGIN
+        INSERT INTO records_fts (records_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO records_fts (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    # 为迁移前已存在的记录建立索引
+    "INSERT INTO records_fts (records_fts) VALUES ('rebuild')",
+]
+
+# 读写性能相关的 PRAGMA；journal_mode 单独处理（内存库不支持 WAL）
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",      # WAL 下 NORMAL 足以保证崩溃一致性
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+    "cache_size": -32000,         # 约 32MB 页缓存
+    "mmap_size": 268435456,       # 256MB 内存映射读
+    "busy_timeout": 5000,
+}
+
+_PLACEHOLDER = re.compile(r"%[s%]")
+_DATE_FORMAT_CODES = {"%Y": "%Y", "%y": "%y", "%m": "%m", "%c": "%m", "%d": "%d", "%e": "%d",
+                      "%H": "%H", "%i": "%M", "%s": "%S", "%S": "%S"}
+_FORMAT_CODE = re.compile(r"%[a-zA-Z]")
+_memory_ids = itertools.count(1)
+
+
+@lru_cache(maxsize=512)
+def _translate(operation):
+    """把 MySQL 的 %s 占位符转换成 SQLite 的 ?（%% 还原为 %）"""
+    return _PLACEHOLDER.sub(lambda m: "?" if m.group() == "%s" else "%", operation)
+
+
+def _as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def _sql_year(value):
+    d = _as_date(value)
+    return d.year if d else None
+
+
+def _sql_month(value):
+    d = _as_date(value)
+    return d.month if d else None
+
+
+def _sql_date_format(value, fmt):
+    d = _as_date(value)
+    if d is None or fmt is None:
+        return None
+    return d.strftime(_strftime_format(fmt))
+
+
+@lru_cache(maxsize=64)
+def _strftime_format(fmt):
+    """MySQL DATE_FORMAT 格式串转 strftime 格式串"""
+    return _FORMAT_CODE.sub(lambda m: _DATE_FORMAT_CODES.get(m.group(), m.group()), fmt)
+
+
+def _convert_decimal(raw):
+    return Decimal(raw.decode()).quantize(Decimal("0.01"))
+
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("DECIMAL", _convert_decimal)
+
+
+class SQLiteCursor:
+    """让 sqlite3 游标表现得像 mysql-connector 游标（%s 占位符、字典行）"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._columns = None
+        self._lastrowid = None
+
+    def execute(self, operation, params=None):
+        if params is None:
+            self._cursor.execute(operation)
+        else:
+            self._cursor.execute(_translate(operation), tuple(params))
+        self._after_execute()
+        self._lastrowid = self._cursor.lastrowid
+        return self
+
+    def executemany(self, operation, seq_of_params):
+        self._cursor.executemany(_translate(operation), seq_of_params)
+        self._after_execute()
+        # 与 MySQL 多行 INSERT 一致：lastrowid 指向本批第一行
+        count = self._cursor.rowcount
+        if count and count > 0 and operation.lstrip()[:6].upper() == "INSERT":
+            last = self._cursor.connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self._lastrowid = last - count + 1
+        else:
+            self._lastrowid = None
+        return self
+
+    def _after_execute(self):
+        description = self._cursor.description
+        self._columns = [d[0] for d in description] if description else None
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self._columns, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        if not self._dictionary:
+            return rows
+        columns = self._columns
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self._dictionary:
+            return rows
+        columns = self._columns
+        return [dict(zip(columns, row)) for row in rows]
+
+    def __iter__(self):
+        while True:
+            row = self._cursor.fetchone()
+            if row is None:
+                return
+            yield self._row(row)
+
+    @property
+    def lastrowid(self):
+        return self._lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(self._columns or ())
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 连接适配器，提供与 mysql-connector 连接相同的常用接口"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def begin(self):
+        """显式开启事务（sqlite3 默认只在写语句前隐式开启）"""
+        self._raw.execute("BEGIN")
+
+    def close(self):
+        self._raw.close()
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def is_connected(self):
+        try:
+            self._raw.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class SQLiteBackend(StorageBackend):
+    """嵌入式 SQLite 驱动：WAL 模式，适合单机部署和测试"""
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path="data/accounting.db", pragmas=None):
+        self.path = path
+        self.pragmas = dict(SQLITE_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self._anchor = None
+        if path == ":memory:":
+            # 连接池里的多条连接需要看到同一个内存库
+            self._target = f"file:accounting_mem_{next(_memory_ids)}?mode=memory&cache=shared"
+            self._uri = True
+            self._anchor = self._open()
+        else:
+            self._target = path
+            self._uri = False
+
+    def _open(self):
+        raw = sqlite3.connect(
+            self._target,
+            uri=self._uri,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=self.pragmas.get("busy_timeout", 5000) / 1000,
+        )
+        raw.create_function("YEAR", 1, _sql_year, deterministic=True)
+        raw.create_function("MONTH", 1, _sql_month, deterministic=True)
+        raw.create_function("DATE_FORMAT", 2, _sql_date_format, deterministic=True)
+        if not self._uri:
+            raw.execute("PRAGMA journal_mode=WAL")
+        for key, value in self.pragmas.items():
+            raw.execute(f"PRAGMA {key}={value}")
+        return raw
+
+    def connect(self):
+        if not self._uri:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        return SQLiteConnection(self._open())
+
+    def ping(self, conn):
+        return conn.is_connected()
+
+    def schema_statements(self):
+        return list(SQLITE_SCHEMA)
+
+    # FTS5 trigram 分词器（SQLite 3.34+）支持任意子串检索，检索词至少 3 个字符
+    fulltext_min_length = 3 if sqlite3.sqlite_version_info >= (3, 34, 0) else None
+
+    def fulltext_statements(self):
+        if self.fulltext_min_length is None:
+            return []
+        return list(SQLITE_FULLTEXT)
+
+    def fulltext_match(self, term):
+        phrase = '"' + term.replace('"', '""') + '"'
+        return (
+            "JOIN records_fts ON records_fts.rowid = r.id",
+            "records_fts MATCH %s",
+            [phrase],
+            "records_fts.rank",   # bm25 得分，越小越相关
+            [],
+        )
+
+    def begin_snapshot(self, conn):
+        # WAL 模式下读事务在第一条查询时固定快照，之后的写入对其不可见
+        conn.begin()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        cursor.fetchone()
+        cursor.close()
+
+    def upsert_increment_sql(self, table, keys, columns):
+        names = list(keys) + list(columns)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in columns)
+        return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}")
+
+    def close(self):
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+
+def create_backend(name, **options):
+    """按名称创建存储后端：'mysql' 或 'sqlite'"""
+    if name == "mysql":
+        return MySQLBackend(**options)
+    if name == "sqlite":
+        return SQLiteBackend(**options)
+    raise ValueError(f"未知的存储后端: {name}")
@@ -3,14 +3,23 @@
 包含植入的代码缺陷
 """
 
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from itertools import islice
 import sys
 
+import numpy as np
+
+from .logger import get_logger
+from .money import Money
+
+_logger = get_logger()
+
 
 def log(message: str, level: str = "INFO"):
-    """统一日志输出"""
-    time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{time_str}] [{level.upper()}] {message}")
+    """统一日志输出（由 logger 模块过滤级别并写出）"""
+    _logger.log(message, level)
 
 
 def validate_amount(amount_str: str) -> float:
@@ -30,23 +39,105 @@ def confirm_exit():
     ans = input("是否确认退出？(y/n): ")
     if ans.lower() in ("y", "yes"):
         log("程序已退出，再见！", "INFO")
+        _logger.flush()
         sys.exit(0)
 
 
-def format_currency(value: float) -> str:
-    """货币格式化输出"""
+def batched(iterable, size: int):
+    """把可迭代对象按 size 切分成列表批次（惰性，不会一次读入全部数据）"""
+    if size < 1:
+        raise ValueError("批次大小必须大于0")
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def to_cents(value) -> int:
+    """金额转换为整数分（四舍五入），避免浮点累加误差"""
+    if type(value) is Money:
+        return value.cents
+    if isinstance(value, int):
+        return value * 100
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def as_date(value):
+    """datetime / ISO 字符串统一为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        parsed = _parse_date_cached(value)
+        if parsed is None:
+            raise ValueError(f"日期格式错误: {value}")
+        return parsed
+    return value
+
+
+def format_currency(value) -> str:
+    """货币格式化输出（接受 Money 或普通数值）"""
+    if type(value) is Money:
+        return value.format()
     return f"¥{value:,.2f}"
 
 
-def parse_date(date_str: str):
-    """字符串转日期对象"""
+# 日期解析缓存的条目上限（账单中的日期高度重复）
+DATE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date_cached(date_str: str):
+    """
+    解析 YYYY-MM-DD，失败返回 None
+    标准的 10 位 ISO 写法直接按位切片构造 date，其余写法（如 2024-1-1）交给 strptime
+    """
+    if (len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-" and date_str.isascii()
+            and date_str[:4].isdigit() and date_str[5:7].isdigit() and date_str[8:].isdigit()):
+        try:
+            return date(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:]))
+        except ValueError:
+            return None
     try:
         return datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
-        log("日期格式错误，应为 YYYY-MM-DD", "ERROR")
         return None
 
 
+def parse_date(date_str: str):
+    """字符串转日期对象"""
+    result = _parse_date_cached(date_str)
+    if result is None:
+        log("日期格式错误，应为 YYYY-MM-DD", "ERROR")
+    return result
+
+
+def parse_dates(values, as_numpy: bool = False):
+    """
+    批量解析日期，不逐条输出日志
+    返回 (结果, 无效项下标列表)：as_numpy=False 时结果为 date 列表（无效项为 None），
+    as_numpy=True 时为 datetime64[D] 数组（无效项为 NaT）。已是 date 的元素原样保留。
+    """
+    parsed = []
+    bad = []
+    for index, value in enumerate(values):
+        if isinstance(value, datetime):
+            value = value.date()
+        elif isinstance(value, str):
+            value = _parse_date_cached(value)
+        elif not isinstance(value, date):
+            value = None
+        if value is None:
+            bad.append(index)
+        parsed.append(value)
+    if as_numpy:
+        return np.array(parsed, dtype="datetime64[D]"), bad
+    return parsed, bad
+
+
 # [IMPLANTED FLAW 4: 命令注入漏洞]
 def backup_data_unsafe(backup_dir):
     """
@@ -38,4 +38,21 @@ def setup_utils_module():
         sys.modules['code.utils'] = MockModule()
 
 # 在pytest启动时运行
-setup_utils_module()
\ No newline at end of file
+setup_utils_module()
+
+import pytest
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """切换到临时 SQLite 后端并建表，测试结束后恢复原后端"""
+    from code import database
+    from code.storage import SQLiteBackend
+
+    previous = database.get_backend()
+    backend = SQLiteBackend(str(tmp_path / "accounting.db"))
+    database.set_backend(backend)
+    database.init_database()
+    yield backend
+    database.set_backend(previous)
+    backend.close()
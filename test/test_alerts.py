@@ -0,0 +1,129 @@
+"""
+测试 alerts 模块：写入触发的预算提醒
+"""
+
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from code.alerts import AlertWorker, CallbackSink, LogFileSink, WebhookSink
+from code.budget import Budget
+from code.events import EventBus
+from code.record import Record
+
+
+@pytest.fixture
+def worker():
+    received = []
+    alert_worker = AlertWorker([CallbackSink(received.append)]).start()
+    alert_worker.received = received
+    yield alert_worker
+    alert_worker.stop()
+
+
+class TestEventBus:
+    """测试事件总线"""
+
+    def test_subscribe_and_errors(self):
+        """订阅者异常不影响其他订阅者"""
+        bus = EventBus()
+        seen = []
+        bus.subscribe("e", lambda p: 1 / 0)
+        unsubscribe = bus.subscribe("e", seen.append)
+        bus.emit("e", 1)
+        unsubscribe()
+        bus.emit("e", 2)
+        assert seen == [1]
+
+
+class TestAlertWorker:
+    """测试后台检测"""
+
+    def test_alert_on_threshold_crossing(self, sqlite_db, worker):
+        """只在状态升级时推送，未受影响的预算不推送"""
+        Budget('month', 100, date(2024, 5, 1)).save()
+        Budget('month', 100, date(2024, 6, 1)).save()
+
+        Record("expense", 50, "午餐", date(2024, 5, 2)).save()
+        worker.flush()
+        assert worker.received == []
+
+        Record("expense", 35, "晚餐", date(2024, 5, 3)).save()
+        worker.flush()
+        assert [(a['status'], a['previous_status']) for a in worker.received] == [('warning', 'ok')]
+
+        Record("expense", 5, "零食", date(2024, 5, 4)).save()
+        Record.save_many([{"type": "expense", "amount": 20, "description": "超市", "date": date(2024, 5, 5)}])
+        worker.flush()
+        assert [a['status'] for a in worker.received] == ['warning', 'exceeded']
+        assert all(a['start_date'] == date(2024, 5, 1) for a in worker.received)
+
+    def test_crossing_not_missed_when_later_writes_already_counted(self, sqlite_db):
+        """检测时计数器已包含后续批次的写入，状态升级仍只推送一次、不会漏报"""
+        received = []
+        Budget('month', 100, date(2024, 5, 1)).save()
+        Record("expense", 70, "房租", date(2024, 5, 1)).save()
+        alert_worker = AlertWorker([CallbackSink(received.append)]).start()
+        alert_worker.stop()
+
+        amounts = [5, 10, 5]
+        for amount in amounts:
+            Record("expense", amount, "杂项", date(2024, 5, 2)).save()
+        # 三批增量依次检测，此时 spent_cents 已是全部写入后的 90
+        for amount in amounts:
+            alert_worker.check({(date(2024, 5, 2), 0): amount * 100})
+        assert [(a['status'], a['previous_status']) for a in received] == [('warning', 'ok')]
+
+    def test_category_budget_only(self, sqlite_db, worker):
+        """分类预算只被本分类的支出触发"""
+        from code.category import Category
+
+        Category("交通", "地铁").save()
+        Budget('month', 10, date(2024, 5, 1), category_id=1).save()
+        Budget('month', 1000, date(2024, 5, 1)).save()
+
+        Record("expense", 50, "杂项", date(2024, 5, 2)).save()
+        Record("expense", 12, "地铁", date(2024, 5, 2)).save()
+        worker.flush()
+        assert [(a['category'], a['status']) for a in worker.received] == [('交通', 'exceeded')]
+
+
+class TestSinks:
+    """测试推送目标"""
+
+    def test_log_file_and_webhook(self, tmp_path):
+        """日志文件追加 JSON 行，Webhook 以 JSON POST"""
+        alert = {"status": "exceeded", "start_date": date(2024, 5, 1), "message": "超支"}
+
+        path = tmp_path / "alerts" / "alerts.log"
+        LogFileSink(str(path))(alert)
+        LogFileSink(str(path))(alert)
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 2 and json.loads(lines[0])["message"] == "超支"
+
+        posted = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                posted.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            WebhookSink(f"http://127.0.0.1:{server.server_port}/alerts")(alert)
+        finally:
+            thread.join(5)
+            server.server_close()
+        assert posted == [{"status": "exceeded", "start_date": "2024-05-01", "message": "超支"}]
+
+        with pytest.raises(ValueError):
+            WebhookSink("file:///etc/passwd")
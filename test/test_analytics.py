@@ -0,0 +1,88 @@
+"""
+测试 analytics 模块：向量化统计与 Statistics 结果一致
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from code.analytics import AnalyticsStatistics, Ledger
+from code.category import Category
+from code.database import get_connection
+from code.record import Record
+from code.statistics import Statistics
+
+
+def seed():
+    Category("餐饮", "午餐,晚餐").save()
+    Category("交通", "地铁").save()
+    rows = []
+    for i in range(60):
+        day = date(2023 + i % 2, 1 + i % 12, 1 + i % 28)
+        description = ("午餐", "地铁", "杂项", "晚餐")[i % 4]
+        rows.append({"type": "income" if i % 5 == 0 else "expense",
+                     "amount": Decimal(i * 13 % 500) + Decimal("0.35"),
+                     "description": description, "date": day})
+    Record.save_many(rows)
+
+
+def normalized(rows):
+    """SQLite 聚合结果为浮点数，MySQL 为 Decimal，统一量化后比较"""
+    return [{k: Decimal(str(v)).quantize(Decimal("0.01")) if isinstance(v, (float, Decimal)) else v
+             for k, v in row.items()} for row in rows]
+
+
+class TestAnalytics:
+    """测试 AnalyticsStatistics"""
+
+    @pytest.mark.parametrize("year,month", [(None, None), (2023, None), (2024, 3), (2030, 1)])
+    def test_matches_sql_statistics(self, sqlite_db, year, month):
+        """分类合计与收支对比与 SQL 结果一致"""
+        seed()
+        sql, vec = Statistics(), AnalyticsStatistics()
+        by_category = vec.get_expense_by_category(year, month)
+        assert [r["total"] for r in by_category] == sorted((r["total"] for r in by_category), reverse=True)
+        # 金额相同的分类顺序不确定，按分类名比较
+        assert (sorted(by_category, key=lambda r: r["category"])
+                == sorted(normalized(sql.get_expense_by_category(year, month)), key=lambda r: r["category"]))
+        assert (sorted(vec.get_income_vs_expense(year, month), key=lambda r: r["type"])
+                == sorted(normalized(sql.get_income_vs_expense(year, month)), key=lambda r: r["type"]))
+
+    def test_trend_and_reload(self, sqlite_db):
+        """月度趋势一致，写入后自动重新载入"""
+        seed()
+        vec = AnalyticsStatistics()
+        assert vec.get_expense_trend() == normalized(Statistics().get_expense_trend())
+        assert all(row["year"] == 2024 for row in vec.get_expense_trend(2024))
+
+        before = len(vec.ledger)
+        Record("expense", 1, "地铁", date(2025, 1, 1)).save()
+        assert len(vec.ledger) == before + 1
+
+    def test_ledger_columns(self, sqlite_db):
+        """列类型与切片"""
+        seed()
+        ledger = Ledger.load(chunk_size=7)
+        assert len(ledger) == 60
+        assert ledger.cents.dtype == "int64" and ledger.days.dtype == "int32"
+        assert ledger.categories.dtype == "uint16" and ledger.types.dtype == "uint8"
+        sliced = ledger.subset(ledger.date_mask(date(2024, 1, 1), date(2024, 12, 31)))
+        assert len(sliced) == 30
+
+    def test_undated_records_skipped(self, sqlite_db):
+        """没有日期的记录不影响载入，也不计入统计"""
+        assert len(Ledger.load()) == 0
+        seed()
+        expected = Ledger.load()
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO records (type, amount, category_id, description, date) "
+                       "VALUES ('expense', 3.5, NULL, '无日期', NULL)")
+        conn.commit()
+        cursor.close()
+        conn.close()
+        ledger = Ledger.load(chunk_size=7)
+        assert len(ledger) == 60 and int(ledger.cents.sum()) == int(expected.cents.sum())
+        assert ledger.cents.sum() == sum(Decimal(i * 13 % 500) * 100 + 35 for i in range(60))
+        assert set(ledger.categories.tolist()) == {0, 1, 2}
@@ -0,0 +1,102 @@
+"""
+备份与恢复测试
+"""
+
+import json
+import os
+from datetime import date
+
+import pytest
+
+from code.backup import BackupError, create_backup, list_backups, main, restore_backup
+from code.budget import Budget
+from code.record import Record
+from code.statistics import Statistics
+
+
+def _snapshot():
+    records = [(r["type"], r["amount"], r["category"], r["description"], r["date"]) for r in Record.get_all()]
+    return sorted(records, key=repr), Budget.evaluate_all(date(2024, 1, 15)), Statistics().get_income_vs_expense()
+
+
+class TestBackup:
+    """全量 / 增量备份与恢复"""
+
+    def test_full_and_incremental_roundtrip(self, sqlite_db, tmp_path):
+        root = str(tmp_path / "backups")
+        Record.save_many([
+            {"type": "expense", "amount": i + 0.5, "description": f"午餐{i}", "date": date(2024, 1, 1 + i % 28)}
+            for i in range(25)
+        ])
+        Budget("month", 500, date(2024, 1, 1)).save()
+        full = create_backup(root, chunk_size=10)
+        assert full["base"] is None
+        assert [c["rows"] for c in full["tables"]["records"]["chunks"]] == [10, 10, 5]
+
+        Record("income", 8000, "工资", date(2024, 1, 10)).save()
+        Record("expense", "12.34", "地铁", date(2024, 1, 11)).save()
+        incremental = create_backup(root, incremental=True, compression="lzma", chunk_size=10)
+        assert incremental["base"] == full["id"]
+        assert incremental["tables"]["records"]["rows"] == 2
+        assert incremental["watermarks"]["records"] == full["watermarks"]["records"] + 2
+        expected = _snapshot()
+
+        # 恢复前随意改动数据
+        Record("expense", 1, "恢复后应消失", date(2024, 1, 12)).save()
+        counts = restore_backup(root, workers=3)
+        assert counts["records"] == 27
+        assert _snapshot() == expected
+
+        # 恢复到更早的全量备份
+        restore_backup(root, backup_id=full["id"])
+        assert len(Record.get_all()) == 25
+
+    def test_checksum_mismatch(self, sqlite_db, tmp_path):
+        root = str(tmp_path / "backups")
+        Record("expense", 10, "午餐", date(2024, 1, 5)).save()
+        manifest = create_backup(root)
+        chunk = manifest["tables"]["records"]["chunks"][0]
+        with open(os.path.join(root, manifest["id"], chunk["file"]), "ab") as f:
+            f.write(b"x")
+        with pytest.raises(BackupError):
+            restore_backup(root)
+
+    def test_incomplete_backups_ignored(self, sqlite_db, tmp_path):
+        root = tmp_path / "backups"
+        (root / "20990101-000000-000000.partial").mkdir(parents=True)
+        assert list_backups(str(root)) == []
+        with pytest.raises(BackupError):
+            restore_backup(str(root))
+
+    def test_cli_list(self, sqlite_db, tmp_path, capsys):
+        root = str(tmp_path / "backups")
+        main(["create", "--dir", root])
+        main(["create", "--dir", root, "--incremental"])
+        capsys.readouterr()
+        main(["list", "--dir", root])
+        lines = capsys.readouterr().out.strip().splitlines()
+        assert len(lines) == 2 and "全量" in lines[0] and "增量" in lines[1]
+        with open(os.path.join(root, lines[0].split()[0], "manifest.json"), encoding="utf-8") as f:
+            assert json.load(f)["format"] == 1
+
+    def test_corrupt_chunk_keeps_existing_data(self, sqlite_db, tmp_path):
+        root = str(tmp_path / "backups")
+        Record.save_many([
+            {"type": "expense", "amount": i + 1, "description": f"早餐{i}", "date": date(2024, 3, 1)}
+            for i in range(12)
+        ])
+        create_backup(root, chunk_size=5)
+        Record("expense", 3, "晚餐", date(2024, 3, 2)).save()
+        incremental = create_backup(root, incremental=True, chunk_size=5)
+        Record("income", 50, "红包", date(2024, 3, 3)).save()
+        expected = _snapshot()
+
+        # 链上最后一块损坏：前面各块都正常，也不能先清空数据
+        chunk = incremental["tables"]["monthly_rollups"]["chunks"][-1]
+        with open(os.path.join(root, incremental["id"], chunk["file"]), "r+b") as f:
+            f.seek(10)
+            f.write(b"\xff\xff")
+        with pytest.raises(BackupError):
+            restore_backup(root, workers=2)
+        assert _snapshot() == expected
+        assert len(Record.get_all()) == 14
@@ -0,0 +1,113 @@
+"""
+余额服务测试
+"""
+
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from code.balance import ENTRY, BalanceService, JournalError, update_balance
+from code.money import Money
+
+
+def _worker(path, count):
+    service = BalanceService(path)
+    for _ in range(count):
+        service.update(1)
+    service.close()
+
+
+class TestBalanceService:
+    """内存余额 + 追加日志"""
+
+    def test_update_and_replay(self, tmp_path):
+        path = str(tmp_path / "balance.journal")
+        service = BalanceService(path)
+        assert service.update(100) == Money(10000)
+        assert service.update("-0.5") == Money(9950)
+        service.close()
+        assert BalanceService(path).balance() == Money.parse("99.50")
+
+    def test_concurrent_updates_not_lost(self, tmp_path):
+        service = BalanceService(str(tmp_path / "balance.journal"))
+        threads = [
+            threading.Thread(target=lambda: [service.update("0.01") for _ in range(500)])
+            for _ in range(20)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert service.balance() == Money(10000)
+        stats = service.stats()
+        assert stats["updates"] == 10000 and stats["sequence"] == 10000
+        # 组提交：fsync 次数远少于变动次数
+        assert stats["fsyncs"] < stats["updates"]
+
+    def test_instances_share_journal(self, tmp_path):
+        """两个实例（如两个进程）交替写入同一日志"""
+        path = str(tmp_path / "balance.journal")
+        a, b = BalanceService(path), BalanceService(path)
+        a.update(10)
+        assert b.update(5) == Money(1500)
+        assert a.balance() == Money(1000)
+        assert a.refresh() == Money(1500)
+
+        assert b.compact() == Money(1500)
+        assert os.path.getsize(path) == 8 + ENTRY.size
+        # a 持有被替换前的文件，写入时应切换到新文件
+        assert a.update(1) == Money(1600)
+        assert BalanceService(path).balance() == Money(1600)
+
+    def test_torn_tail_truncated(self, tmp_path):
+        path = str(tmp_path / "balance.journal")
+        BalanceService(path).update(7)
+        with open(path, "ab") as f:
+            f.write(b"\x01\x02\x03")
+        service = BalanceService(path)
+        assert service.balance() == Money(700)
+        assert service.update(1) == Money(800)
+        assert BalanceService(path).balance() == Money(800)
+
+    def test_failed_fsync_rolls_back_batch(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "balance.journal")
+        service = BalanceService(path)
+        service.update(5)
+        size = os.path.getsize(path)
+
+        def broken_fsync(fd):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(os, "fsync", broken_fsync)
+        with pytest.raises(OSError):
+            service.update(100)
+        monkeypatch.undo()
+        assert service.balance() == Money(500)
+        assert os.path.getsize(path) == size
+        # 失败的批次不会在后续写入或重放时被计入
+        assert service.update(1) == Money(600)
+        assert BalanceService(path).balance() == Money(600)
+
+    def test_bad_header(self, tmp_path):
+        path = tmp_path / "balance.journal"
+        path.write_bytes(b"not a journal")
+        with pytest.raises(JournalError):
+            BalanceService(str(path))
+
+    @pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="需要 fork")
+    def test_multi_process(self, tmp_path):
+        path = str(tmp_path / "balance.journal")
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=_worker, args=(path, 200)) for _ in range(3)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        assert BalanceService(path).balance() == Money(60000)
+
+    def test_update_balance_helper(self, tmp_path):
+        path = str(tmp_path / "balance.journal")
+        update_balance(3, path)
+        assert update_balance(Money(50), path) == Money(350)
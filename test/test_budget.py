@@ -3,7 +3,7 @@
 """
 
 import pytest
-from datetime import date
+from datetime import date, timedelta
 from unittest.mock import Mock, patch, MagicMock
 from code.budget import Budget, BudgetManager
 
@@ -428,5 +428,117 @@ def test_budget_calculate_current_expense_details():
             result = Budget.calculate_current_expense('year')
             assert result == 5000
 
+class TestBudgetCounters:
+    """测试预算支出计数器"""
+
+    def test_counters_follow_writes(self, sqlite_db):
+        """已有记录在保存预算时计入，之后的支出写入时累加"""
+        from code.record import Record
+
+        today = date.today()
+        Record("expense", 100, "早于预算设置的支出", today).save()
+        Record("income", 999, "收入不计入", today).save()
+        Budget('month', 1000, today.replace(day=1)).save()
+
+        budget = Budget.get_current_budget('month')
+        assert budget['spent_cents'] == 10000
+
+        Record("expense", 50.5, "午餐", today).save()
+        Record.save_many([
+            {"type": "expense", "amount": 20, "description": "地铁", "date": today},
+            {"type": "expense", "amount": 30, "description": "去年", "date": today - timedelta(days=400)},
+        ])
+        assert Budget.calculate_current_expense('month') == 170.5
+
+    def test_status_uses_single_lookup(self, sqlite_db):
+        """显示预算状态只查询一次预算"""
+        from code.record import Record
+
+        today = date.today()
+        Budget('month', 100, today.replace(day=1)).save()
+        Record("expense", 90, "购物", today).save()
+
+        with patch('code.budget.Budget.get_current_budget', wraps=Budget.get_current_budget) as lookup:
+            assert BudgetManager.show_budget_status() is True
+        assert lookup.call_count == 1
+        assert Budget.check_budget_alert()['type'] == 'warning'
+
+
+class TestBudgetEvaluation:
+    """测试批量预算评估"""
+
+    def test_evaluate_thresholds(self):
+        """状态与 check_budget_alert 的阈值语义一致"""
+        row = {'id': 1, 'period': 'month', 'amount': 1000, 'spent_cents': 80000,
+               'start_date': date(2024, 1, 1), 'end_date': date(2024, 1, 31)}
+        result = Budget.evaluate(row)
+        assert result['status'] == 'warning' and result['alert']['type'] == 'warning'
+        assert result['remaining'] == 200.0 and result['ratio'] == 0.8
+        assert Budget.evaluate({**row, 'spent_cents': 100000})['status'] == 'exceeded'
+        assert Budget.evaluate({**row, 'spent_cents': 100})['alert'] is None
+        assert Budget.evaluate({**row, 'amount': 0})['ratio'] is None
+
+    def test_evaluate_all_active_budgets(self, sqlite_db):
+        """月度与年度预算一次查询返回，已过期的预算不包含在内"""
+        from code.record import Record
+
+        Budget('month', 100, date(2024, 3, 1)).save()
+        Budget('year', 1000, date(2024, 1, 1)).save()
+        Budget('month', 100, date(2024, 2, 1)).save()
+        Record("expense", 120, "三月", date(2024, 3, 5)).save()
+        Record("expense", 30, "二月", date(2024, 2, 5)).save()
+
+        results = {r['period']: r for r in Budget.evaluate_all(as_of=date(2024, 3, 10))}
+        assert set(results) == {'month', 'year'}
+        assert results['month']['status'] == 'exceeded' and results['month']['spent'] == 120.0
+        assert results['year']['status'] == 'ok' and results['year']['remaining'] == 850.0
+
+
+class TestCategoryBudgets:
+    """测试分类预算与矩阵评估"""
+
+    def seed(self):
+        from code.category import Category
+        from code.record import Record
+
+        Category("餐饮", "午餐").save()
+        Category("交通", "地铁").save()
+        Budget('month', 1000, date(2024, 3, 1)).save()
+        Budget('month', 100, date(2024, 3, 1), category_id=1).save()
+        Budget('year', 500, date(2024, 1, 1), category_id=2).save()
+        Record.save_many([
+            {"type": "expense", "amount": 90, "description": "午餐", "date": date(2024, 3, 2)},
+            {"type": "expense", "amount": 15.5, "description": "午餐", "date": date(2024, 3, 31)},
+            {"type": "expense", "amount": 40, "description": "地铁", "date": date(2024, 1, 9)},
+            {"type": "expense", "amount": 60, "description": "杂项", "date": date(2024, 3, 9)},
+            {"type": "expense", "amount": 70, "description": "午餐", "date": date(2024, 4, 1)},
+            {"type": "income", "amount": 900, "description": "午餐", "date": date(2024, 3, 9)},
+        ])
+
+    def test_counters_per_category(self, sqlite_db):
+        """分类预算只累计本分类支出，总预算累计全部"""
+        self.seed()
+        results = {r['category']: r for r in Budget.evaluate_all(as_of=date(2024, 3, 15))}
+        assert results[None]['spent'] == 165.5
+        assert results['餐饮']['spent'] == 105.5 and results['餐饮']['status'] == 'exceeded'
+        assert results['餐饮']['alert']['message'].startswith('[餐饮]')
+        assert results['交通']['spent'] == 40.0
+        # 总预算仍只有一条当前预算
+        assert Budget('month', 1, date(2024, 3, 1)).category_id == 0
+
+    def test_matrix_matches_counters(self, sqlite_db):
+        """矩阵评估结果与计数器一致，并可评估未保存的预算"""
+        from code.budget_eval import evaluate_budgets, evaluate_period
+
+        self.seed()
+        active = Budget.get_active(date(2024, 3, 15))
+        by_counter = Budget.evaluate_all(as_of=date(2024, 3, 15))
+        assert evaluate_budgets(active) == by_counter
+
+        preview = evaluate_budgets([Budget('month', 200, date(2024, 4, 1), category_id=1)])
+        assert preview[0]['spent'] == 70.0 and preview[0]['status'] == 'ok'
+        assert [r['category'] for r in evaluate_period(date(2024, 3, 15))] == ['餐饮']
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--cov=code.budget", "--cov-report=term-missing"])
\ No newline at end of file
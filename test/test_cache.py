@@ -0,0 +1,118 @@
+"""
+测试 cache 模块：查询结果缓存与写入失效
+"""
+
+import copy
+import json
+import time
+from datetime import date
+from unittest.mock import patch
+
+from code import cache as cache_module
+from code.cache import QueryCache, cached, get_cache, get_cache_stats
+from code.config import Config, set_config
+from code.money import Money
+from code.record import Record
+from code.search import SearchEngine
+from code.statistics import Statistics
+
+
+class TestQueryCache:
+    """测试 LRU 与 TTL"""
+
+    def test_lru_eviction(self):
+        """超出容量时淘汰最久未用的项"""
+        cache = QueryCache(max_entries=2, ttl=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == (True, 1)
+        cache.set("c", 3)
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, 1)
+        stats = cache.stats()
+        assert stats["evictions"] == 1 and stats["hits"] == 2 and stats["misses"] == 1
+
+    def test_ttl_expiry(self):
+        """过期项视为未命中"""
+        cache = QueryCache(ttl=10)
+        with patch("code.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("code.cache.time.monotonic", return_value=105.0):
+            assert cache.get("a") == (True, 1)
+        with patch("code.cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") == (False, None)
+        assert cache.stats()["expired"] == 1
+
+    def test_key_normalization_and_copy(self):
+        """默认参数补全后命中同一项，返回结果是副本"""
+        calls = []
+
+        @cached("test.normalize")
+        def query(year=None, month=None):
+            calls.append((year, month))
+            return [{"total": 1}]
+
+        first = query(2024)
+        first[0]["total"] = 99
+        assert query(year=2024, month=None) == [{"total": 1}]
+        assert calls == [(2024, None)]
+
+    def test_hit_copies_rows_shallowly(self):
+        """命中时只复制列表与行字典，比深拷贝整个结果便宜得多"""
+        rows = [{"id": i, "amount": Money(i), "date": date(2024, 1, 1 + i % 28)} for i in range(20000)]
+
+        @cached("test.shallow")
+        def query():
+            return rows
+
+        first = query()
+        with patch("code.cache.copy.deepcopy", side_effect=AssertionError("深拷贝")):
+            start = time.perf_counter()
+            hit = query()
+            hit_seconds = time.perf_counter() - start
+        assert hit == rows and hit is not rows and hit[0] is not rows[0]
+        assert hit[5]["amount"] is rows[5]["amount"]
+        first.append({"id": -1})
+        first[0]["id"] = 99
+        assert query()[0]["id"] == 0 and len(query()) == 20000
+
+        start = time.perf_counter()
+        copy.deepcopy(rows)
+        assert hit_seconds < time.perf_counter() - start
+
+    def test_shared_cache_built_lazily_from_config(self, tmp_path, monkeypatch):
+        """共享缓存首次使用时才读取配置，配置修改后同步容量与 TTL"""
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps({"cache": {"max_entries": 8}}), encoding="utf-8")
+        config = Config(str(path), environ={}, check_interval=0)
+        previous = set_config(config)
+        monkeypatch.setattr(cache_module, "_cache", None)
+        try:
+            assert get_cache().max_entries == 8
+            path.write_text(json.dumps({"cache": {"max_entries": 16, "ttl": None}}), encoding="utf-8")
+            config.reload(force=True)
+            assert get_cache().max_entries == 16 and get_cache().ttl is None
+        finally:
+            set_config(previous)
+
+
+class TestWriteInvalidation:
+    """测试写入驱动的失效"""
+
+    def test_search_and_statistics_invalidated_by_save(self, sqlite_db):
+        """相同查询命中缓存，Record.save 后重新查询"""
+        Record("expense", 10, "午餐", date(2024, 1, 5)).save()
+        stats = Statistics()
+
+        before = get_cache_stats()["hits"]
+        assert len(SearchEngine.search_records(record_type="expense")) == 1
+        assert len(SearchEngine.search_records(record_type="expense")) == 1
+        assert stats.get_expense_by_category(2024) == stats.get_expense_by_category(2024, None)
+        assert get_cache_stats()["hits"] - before == 2
+
+        Record("expense", 20, "晚餐", date(2024, 1, 6)).save()
+        assert len(SearchEngine.search_records(record_type="expense")) == 2
+        assert float(stats.get_expense_by_category(2024)[0]["total"]) == 30.0
+
+        Record.save_many([{"type": "expense", "amount": 5, "description": "早餐", "date": date(2024, 1, 7)}])
+        assert len(SearchEngine.search_records(record_type="expense")) == 3
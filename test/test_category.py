@@ -0,0 +1,66 @@
+"""
+测试 category 模块：关键字自动机与分类缓存
+"""
+
+from unittest.mock import patch
+
+from code.category import Category
+from code.matcher import KeywordMatcher
+
+
+class TestKeywordMatcher:
+    """测试Aho-Corasick自动机"""
+
+    def test_overlapping_keywords(self):
+        """经典 he/she/his/hers 用例：依赖失败指针找到后缀命中"""
+        matcher = KeywordMatcher([("he", 3), ("she", 2), ("his", 1), ("hers", 0)])
+        assert matcher.search("ushers") == 0
+        assert matcher.search("ushe") == 2
+        assert matcher.search("ahe") == 3
+        assert matcher.search("xyz") is None
+
+    def test_case_insensitive_and_empty(self):
+        """不区分大小写，空关键字被忽略"""
+        matcher = KeywordMatcher([("KTV", 0), ("", 1), ("  ", 2)])
+        assert matcher.search("周末去ktv唱歌") == 0
+        assert matcher.search("") is None
+        assert len(matcher) == 3
+
+    def test_suffix_inherits_lower_rank(self):
+        """长关键字的后缀是更优先的短关键字时取更优先者"""
+        matcher = KeywordMatcher([("咖啡", 0), ("星巴克咖啡豆", 1)])
+        assert matcher.search("买星巴克咖啡豆") == 0
+
+
+class TestCategoryMatching:
+    """测试分类匹配"""
+
+    CATEGORIES = [
+        {"id": 1, "name": "餐饮", "keywords": "星巴克,麦当劳,奶茶"},
+        {"id": 2, "name": "交通", "keywords": "地铁, 公交 ,打车"},
+        {"id": 3, "name": "空", "keywords": None},
+        {"id": 4, "name": "饮品", "keywords": "奶茶"},
+    ]
+
+    def test_keyword_inside_description(self):
+        """描述中包含关键字即命中，多个分类命中时取靠前者"""
+        matcher = Category.build_matcher(self.CATEGORIES)
+        assert matcher("早上在星巴克买咖啡")["name"] == "餐饮"
+        assert matcher("坐公交上班")["name"] == "交通"
+        assert matcher("一杯奶茶")["id"] == 1
+        assert matcher("房租") is None
+        assert matcher("") is None
+
+    def test_cache_reused_until_category_saved(self, sqlite_db):
+        """分类未变化时不再查询数据库，保存分类后失效"""
+        Category("餐饮", "星巴克").save()
+        Category.find_by_keyword("星巴克")
+
+        with patch.object(Category, "get_all", wraps=Category.get_all) as spy:
+            assert Category.find_by_keyword("星巴克拿铁")["name"] == "餐饮"
+            assert Category.find_by_keyword("地铁") is None
+            assert spy.call_count == 0
+
+            Category("交通", "地铁").save()
+            assert Category.find_by_keyword("地铁")["name"] == "交通"
+            assert spy.call_count == 1
@@ -0,0 +1,109 @@
+"""
+配置模块测试
+"""
+
+import json
+import os
+
+import pytest
+
+from code import database
+from code.config import Config, ConfigError, get_api_settings, read_config_file, set_config
+from code.storage import MySQLBackend
+
+
+def _write(path, data, mtime_ns):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class TestConfig:
+    """来源合并、按 mtime 重新加载与订阅"""
+
+    def test_sources_and_precedence(self, tmp_path):
+        path = tmp_path / "config.json"
+        _write(path, {"pool": {"max_size": 20, "min_size": 2}, "mysql": {"password": "p"}}, 10**18)
+        config = Config(str(path), environ={"ACCOUNTING_POOL_MAX_SIZE": "30", "ACCOUNTING_CACHE_TTL": "5"})
+        assert config.get("pool.max_size") == 30
+        assert config["pool.min_size"] == 2
+        assert config.get("cache.ttl") == 5.0
+        assert config.get("db.backend") == "mysql"
+        assert config.section("mysql")["password"] == "p"
+        assert "password" not in Config(str(tmp_path / "missing.json"), environ={}).section("mysql")
+
+    def test_invalid_values(self, tmp_path):
+        with pytest.raises(ConfigError):
+            Config(str(tmp_path / "none.json"), environ={"ACCOUNTING_POOL_MAX_SIZE": "many"})
+        path = tmp_path / "config.json"
+        path.write_text("{broken", encoding="utf-8")
+        with pytest.raises(ConfigError):
+            Config(str(path), environ={})
+        # 有默认值的键不能设为 null；cache.ttl 的 null 表示不过期
+        path.write_text(json.dumps({"pool": {"min_size": None}}), encoding="utf-8")
+        with pytest.raises(ConfigError):
+            Config(str(path), environ={})
+        path.write_text(json.dumps({"cache": {"ttl": None}}), encoding="utf-8")
+        assert Config(str(path), environ={}).get("cache.ttl") is None
+
+    def test_reload_only_on_mtime_change(self, tmp_path):
+        path = tmp_path / "config.json"
+        _write(path, {"pool": {"max_size": 5}}, 10**18)
+        config = Config(str(path), environ={}, check_interval=0)
+        changes = []
+        config.subscribe(changes.append, prefix="pool.")
+        for _ in range(5):
+            assert config.get("pool.max_size") == 5
+        assert config.stats()["loads"] == 1
+
+        _write(path, {"pool": {"max_size": 8}, "cache": {"ttl": 1}}, 2 * 10**18)
+        assert config.get("pool.max_size") == 8
+        assert changes == [{"pool.max_size": 8}]
+        assert config.stats()["loads"] == 2
+
+        # 改坏的文件不影响当前配置
+        path.write_text("{", encoding="utf-8")
+        os.utime(path, ns=(3 * 10**18, 3 * 10**18))
+        assert config.get("pool.max_size") == 8
+
+    def test_pool_resized_on_reload(self, sqlite_db, tmp_path):
+        path = tmp_path / "config.json"
+        _write(path, {"pool": {"max_size": 4}}, 10**18)
+        config = Config(str(path), environ={}, check_interval=0)
+        previous = set_config(config)
+        try:
+            database.close_pool()
+            assert database.get_pool().max_size == 4
+            _write(path, {"pool": {"max_size": 2, "checkout_timeout": 1.5}}, 2 * 10**18)
+            config.reload()
+            pool = database.get_pool()
+            assert pool.max_size == 2 and pool.checkout_timeout == 1.5
+        finally:
+            database.close_pool()
+            set_config(previous)
+
+    def test_read_config_file(self, tmp_path):
+        path = tmp_path / "app.ini"
+        path.write_text("key=value", encoding="utf-8")
+        assert read_config_file(str(path)) == "key=value"
+
+    def test_credentials_only_from_config(self, tmp_path):
+        with pytest.raises(ConfigError):
+            MySQLBackend().connect()
+        # get_connection 与连接失败一样记录错误并返回 None
+        previous_backend = database.get_backend()
+        database.set_backend(MySQLBackend())
+        try:
+            assert database.get_connection() is None
+        finally:
+            database.set_backend(previous_backend)
+
+        previous = set_config(Config(str(tmp_path / "none.json"), environ={}))
+        try:
+            with pytest.raises(ConfigError):
+                get_api_settings()
+            set_config(Config(str(tmp_path / "none.json"), environ={
+                "ACCOUNTING_API_KEY": "k", "ACCOUNTING_API_SECRET": "s",
+            }))
+            assert get_api_settings() == {"endpoint": "https://api.example.com/v1", "key": "k", "secret": "s"}
+        finally:
+            set_config(previous)
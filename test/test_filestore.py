@@ -0,0 +1,115 @@
+"""
+用户文件存储测试
+"""
+
+import os
+
+import pytest
+
+from code.filestore import FileStoreError, UserFileStore, read_user_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    root = tmp_path / "user_files"
+    (root / "alice" / "notes").mkdir(parents=True)
+    (root / "alice" / "notes" / "a.txt").write_text("账单备注", encoding="utf-8")
+    (root / "bob").mkdir()
+    (root / "bob" / "secret.txt").write_text("bob 的数据", encoding="utf-8")
+    return UserFileStore(str(root), mmap_threshold=1024)
+
+
+class TestUserFileStore:
+    """路径隔离与缓存"""
+
+    def test_rejects_escapes(self, store, tmp_path):
+        (tmp_path / "outside.txt").write_text("x")
+        os.symlink(str(tmp_path / "outside.txt"), os.path.join(store.root, "alice", "link.txt"))
+        for username, filename in [
+            ("alice", "../bob/secret.txt"),
+            ("alice", "../../outside.txt"),
+            ("alice", "/etc/passwd"),
+            ("alice", "link.txt"),
+            ("alice", "."),
+            ("..", "outside.txt"),
+            ("alice/../bob", "secret.txt"),
+            ("alice", "a\0.txt"),
+        ]:
+            with pytest.raises(FileStoreError):
+                store.read_text(username, filename)
+        with pytest.raises(FileNotFoundError):
+            store.read_text("alice", "missing.txt")
+
+    def test_stat_fast_path(self, store):
+        assert store.read_text("alice", "notes/a.txt") == "账单备注"
+        assert store.read_text("alice", "notes//./a.txt") == "账单备注"
+        stats = store.stats()
+        assert stats["misses"] == 1 and stats["hits"] == 1
+
+        path = os.path.join(store.root, "alice", "notes", "a.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("已修改的备注")
+        assert store.read_text("alice", "notes/a.txt") == "已修改的备注"
+        assert store.stats()["misses"] == 2
+
+    def test_large_file_mmap(self, store):
+        data = bytes(range(256)) * 40
+        store.write_bytes("alice", "big.bin", data)
+        assert store.read_bytes("alice", "big.bin", offset=300, length=10) == data[300:310]
+        view = store.open_view("alice", "big.bin")
+        assert view.readonly and view[:5] == data[:5]
+        assert store.stats()["mapped"] == 1 and store.stats()["bytes"] == 0
+
+        # 原子替换后旧映射仍可读，新读取得到新内容
+        store.write_bytes("alice", "big.bin", b"y" * 2048)
+        assert view[:5] == data[:5]
+        assert store.read_bytes("alice", "big.bin", length=3) == b"yyy"
+
+    def test_lru_eviction(self, tmp_path):
+        store = UserFileStore(str(tmp_path), max_bytes=250, mmap_threshold=10_000)
+        for i in range(3):
+            store.write_bytes("carol", f"{i}.txt", b"x" * 100)
+            store.read_bytes("carol", f"{i}.txt")
+        stats = store.stats()
+        assert stats["size"] == 2 and stats["bytes"] == 200 and stats["evictions"] == 1
+
+    def test_mapped_entries_capped(self, tmp_path):
+        store = UserFileStore(str(tmp_path), mmap_threshold=16, max_mapped=2)
+        store.write_bytes("dave", "small.txt", b"x")
+        store.read_bytes("dave", "small.txt")
+        for i in range(4):
+            store.write_bytes("dave", f"{i}.bin", bytes(32))
+            store.read_bytes("dave", f"{i}.bin")
+        stats = store.stats()
+        assert stats["maps"] == 2 and stats["size"] == 3 and stats["evictions"] == 2
+        # 淘汰的是最久未用的映射，小文件仍在缓存中
+        store.read_bytes("dave", "small.txt")
+        store.read_bytes("dave", "3.bin")
+        assert store.stats()["hits"] == 2
+
+    def test_evicted_mappings_closed(self, tmp_path):
+        """淘汰的映射立即关闭；仍被视图引用的映射在视图释放后关闭"""
+        store = UserFileStore(str(tmp_path), mmap_threshold=16, max_mapped=1)
+        store.write_bytes("erin", "a.bin", b"a" * 32)
+        store.write_bytes("erin", "b.bin", b"b" * 32)
+        store.read_bytes("erin", "a.bin")
+        store.read_bytes("erin", "b.bin")
+        assert store.stats()["maps"] == 1 and store.stats()["retired"] == 0
+
+        view = store.open_view("erin", "a.bin")
+        store.read_text("erin", "b.bin")
+        assert store.stats()["retired"] == 1
+        assert view[:3] == b"aaa"
+        view.release()
+        assert store.stats()["retired"] == 0
+        store.invalidate()
+        assert store.stats()["maps"] == 0 and store.stats()["retired"] == 0
+
+    def test_read_text_universal_newlines(self, store):
+        store.write_bytes("alice", "crlf.txt", "第一行\r\n第二行\r第三行\n".encode("utf-8"))
+        assert store.read_text("alice", "crlf.txt") == "第一行\n第二行\n第三行\n"
+        store.write_bytes("alice", "big.txt", b"a\r\n" * 600)
+        assert store.read_text("alice", "big.txt") == "a\n" * 600
+
+    def test_read_user_file(self, store):
+        assert read_user_file("bob", "secret.txt", root=store.root) == "bob 的数据"
@@ -0,0 +1,113 @@
+"""
+公式引擎测试
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from code.formula import FormulaError, calculate_expression, compile_formula
+from code.money import Money
+
+
+class TestFormula:
+    """编译、校验与求值"""
+
+    def test_scalar(self):
+        assert calculate_expression("amount / people", amount=120, people=3) == 40
+        assert calculate_expression("round(amount * 1.06, 2)", amount=Money.parse("9.99")) == 10.59
+        assert calculate_expression("max(amount - 100, 0) * 0.2", amount=80) == 0
+        assert calculate_expression("1 if 0 < x <= 10 else 2", x=10) == 1
+        assert calculate_expression("not (a or b) and True", a=0, b=0) is True
+        assert calculate_expression("2 ** 10") == 1024
+
+    def test_compiled_once(self):
+        assert compile_formula("a + b") is compile_formula("a + b")
+        assert compile_formula("a + b * c").variables == {"a", "b", "c"}
+
+    @pytest.mark.parametrize("source", [
+        "__import__('os').system('echo hi')",
+        "().__class__.__bases__",
+        "open('x')",
+        "a[0]",
+        "'abc'",
+        "lambda: 1",
+        "[x for x in y]",
+        "_secret + 1",
+        "abs",
+        "round(x, ndigits=2)",
+        "9 ** 9 ** 9",
+        "1 +",
+        "x" * 600,
+    ])
+    def test_rejected(self, source):
+        with pytest.raises(FormulaError):
+            compile_formula(source).evaluate(x=1, y=[1], a=[1])
+
+    def test_evaluation_errors(self):
+        with pytest.raises(FormulaError):
+            calculate_expression("a / b", a=1, b=0)
+        with pytest.raises(FormulaError):
+            calculate_expression("a + b", a=1)
+
+    def test_vectorized_matches_scalar(self):
+        formula = compile_formula("round(amount * 0.06, 2) if amount > 100 and not refund else -amount / 2")
+        amount = np.array([50.0, 150.0, 200.0, 99.99])
+        refund = np.array([False, False, True, False])
+        vector = formula.evaluate_columns({"amount": amount, "refund": refund})
+        scalar = [formula.evaluate(amount=a, refund=r) for a, r in zip(amount.tolist(), refund.tolist())]
+        np.testing.assert_allclose(vector, scalar)
+        assert compile_formula("1").evaluate_columns({}, length=3).tolist() == [1, 1, 1]
+        assert np.isinf(compile_formula("a / b").evaluate_columns({"a": np.ones(2), "b": np.zeros(2)})).all()
+
+
+class TestLedgerFormula:
+    """账本派生列"""
+
+    def test_ledger_columns(self):
+        from code.analytics import Ledger, TYPE_EXPENSE, TYPE_INCOME, EPOCH_ORDINAL
+        days = [date(2024, 3, 4).toordinal() - EPOCH_ORDINAL, date(2023, 12, 31).toordinal() - EPOCH_ORDINAL]
+        ledger = Ledger([1050, 20000], days, [1, 0], [TYPE_EXPENSE, TYPE_INCOME], ["未分类", "餐饮"])
+        columns = ledger.formula_columns()
+        assert columns["year"].tolist() == [2024, 2023]
+        assert columns["month"].tolist() == [3, 12]
+        assert columns["day"].tolist() == [4, 31]
+        assert columns["weekday"].tolist() == [0, 6]
+        np.testing.assert_allclose(ledger.evaluate("amount * 2 if is_expense else 0"), [21.0, 0.0])
+        with pytest.raises(FormulaError):
+            ledger.evaluate("price * 2")
+
+    def test_formula_by_category(self, sqlite_db):
+        from code.analytics import AnalyticsStatistics
+        from code.category import Category
+        from code.record import Record
+
+        Category("餐饮", "星巴克").save()
+        Record("expense", 100, "星巴克", date(2024, 1, 5)).save()
+        Record("expense", 50, "星巴克", date(2024, 2, 5)).save()
+        Record("expense", 10, "神秘支出", date(2024, 1, 6)).save()
+        Record("income", 1000, "工资", date(2024, 1, 7)).save()
+        result = AnalyticsStatistics().get_formula_by_category("amount * 0.1", year=2024, month=1)
+        assert [r["category"] for r in result] == ["餐饮", "未分类"]
+        assert [r["total"] for r in result] == pytest.approx([10.0, 1.0])
+
+
+class TestFormulaSemantics:
+    """标量短路语义与嵌套过深的公式"""
+
+    def test_scalar_short_circuit(self):
+        assert compile_formula("amount / people if people else 0").evaluate(amount=100, people=0) == 0
+        assert compile_formula("x or 5").evaluate(x=3) == 3
+        assert compile_formula("x and y").evaluate(x=0, y=1 / 1) == 0
+        assert compile_formula("people and amount / people").evaluate(amount=1, people=0) == 0
+        assert compile_formula("1 < x < 3").evaluate(x=2) is True
+
+    def test_vector_still_elementwise(self):
+        formula = compile_formula("amount / people if people else 0")
+        result = formula.evaluate_columns({"amount": np.array([100.0, 50.0]), "people": np.array([0, 2])})
+        assert result.tolist() == [0.0, 25.0]
+
+    def test_deep_nesting_rejected(self):
+        with pytest.raises(FormulaError):
+            compile_formula("-" * 450 + "1")
@@ -0,0 +1,159 @@
+"""
+测试 importer 模块：账单解析、规范化与流式导入
+"""
+
+import csv
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from code.importer import (
+    RowError, detect_encoding, get_parser, import_statement,
+    normalize_amount, normalize_date,
+)
+
+
+class TestNormalize:
+    """测试金额与日期规范化"""
+
+    def test_normalize_amount(self):
+        """去除货币符号与千分位"""
+        assert normalize_amount("¥1,234.5") == Decimal("1234.50")
+        assert normalize_amount("-12.30") == Decimal("-12.30")
+        for bad in ("", "abc", "1e999", "NaN", "100000000"):
+            with pytest.raises(RowError):
+                normalize_amount(bad)
+
+    def test_normalize_date(self):
+        """常见日期写法"""
+        assert normalize_date("2024-01-05") == date(2024, 1, 5)
+        assert normalize_date("2024/1/5 12:30:00") == date(2024, 1, 5)
+        assert normalize_date("20240105") == date(2024, 1, 5)
+        assert normalize_date("2024.01.05") == date(2024, 1, 5)
+        for bad in ("", "2024-13-01", "yesterday"):
+            with pytest.raises(RowError):
+                normalize_date(bad)
+
+    def test_unknown_parser(self):
+        """未知的账单格式"""
+        with pytest.raises(ValueError):
+            get_parser("nope")
+
+
+def write_csv(path, rows, encoding="utf-8"):
+    with open(path, "w", encoding=encoding, newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+class TestImport:
+    """测试导入流水线"""
+
+    def test_generic_csv_with_rejects(self, sqlite_db, tmp_path):
+        """通用 CSV：无类型列按正负号判断，坏行写入错误文件"""
+        from code.category import Category
+        from code.record import Record
+
+        Category("餐饮", "星巴克").save()
+        path = tmp_path / "bank.csv"
+        write_csv(path, [
+            ["日期", "金额", "描述"],
+            ["2024-01-05", "-30.50", "星巴克"],
+            ["2024/01/06", "5000", "工资"],
+            ["not-a-date", "-1", "坏日期"],
+            ["2024-01-07", "abc", "坏金额"],
+            [],
+        ])
+        progress = []
+
+        report = import_statement(str(path), parser="csv", batch_size=1,
+                                  progress=progress.append, progress_every=1)
+
+        assert report["read"] == 4
+        assert report["inserted"] == 2
+        assert report["rejected"] == 2
+        assert len(progress) == 2
+        records = {r["description"]: r for r in Record.get_all()}
+        assert records["星巴克"]["type"] == "expense"
+        assert records["星巴克"]["amount"] == Decimal("30.50")
+        assert records["星巴克"]["category"] == "餐饮"
+        assert records["工资"]["type"] == "income"
+
+        with open(report["error_file"], encoding="utf-8-sig") as f:
+            rejected = list(csv.reader(f))
+        assert rejected[0] == ["line", "reason", "row"]
+        assert [row[0] for row in rejected[1:]] == ["4", "5"]
+
+    def test_alipay_gbk_with_preamble(self, sqlite_db, tmp_path):
+        """支付宝账单：GBK 编码、表头前有说明行、不计收支跳过"""
+        from code.record import Record
+
+        path = tmp_path / "alipay.csv"
+        write_csv(path, [
+            ["支付宝交易记录明细查询"],
+            ["账号:[xxx@example.com]"],
+            ["交易时间", "交易分类", "交易对方", "商品说明", "收/支", "金额", "交易状态"],
+            ["2024-02-01 08:00:00", "餐饮美食", "麦当劳", "早餐", "支出", "15.00", "交易成功"],
+            ["2024-02-02 09:00:00", "转账", "余额宝", "转入", "不计收支", "100.00", "交易成功"],
+            ["2024-02-03 10:00:00", "退款", "淘宝", "退款", "收入", "20.00", "交易成功"],
+        ], encoding="gbk")
+
+        assert detect_encoding(str(path)) == "gb18030"
+        report = import_statement(str(path), parser="alipay", progress=None)
+
+        assert report == {**report, "read": 3, "inserted": 2, "skipped": 1, "rejected": 0}
+        assert report["error_file"] is None
+        assert sorted(r["description"] for r in Record.get_all()) == ["早餐", "退款"]
+
+    def test_wechat_and_cmb_layouts(self, sqlite_db, tmp_path):
+        """微信支付与招商银行流水"""
+        from code.record import Record
+
+        wechat = tmp_path / "wechat.csv"
+        write_csv(wechat, [
+            ["微信支付账单明细"],
+            ["----------------------微信支付账单明细列表--------------------"],
+            ["交易时间", "交易类型", "交易对方", "商品", "收/支", "金额(元)", "支付方式", "当前状态"],
+            ["2024-03-01 12:00:00", "商户消费", "奶茶店", "/", "支出", "¥18.00", "零钱", "支付成功"],
+        ])
+        cmb = tmp_path / "cmb.csv"
+        write_csv(cmb, [
+            ["交易日期", "交易时间", "收入", "支出", "余额", "交易类型", "交易备注"],
+            ["20240302", "10:00:00", "", "200.00", "800.00", "快捷支付", "京东"],
+            ["20240303", "10:00:00", "1000.00", "", "1800.00", "代发工资", ""],
+        ], encoding="utf-8-sig")
+
+        assert import_statement(str(wechat), parser="wechat", progress=None)["inserted"] == 1
+        assert import_statement(str(cmb), parser="cmb", progress=None)["inserted"] == 2
+        rows = {r["description"]: r for r in Record.get_all()}
+        assert rows["奶茶店"]["amount"] == Decimal("18.00")
+        assert rows["京东"]["type"] == "expense"
+        assert rows["代发工资"]["type"] == "income"
+
+    def test_missing_header(self, sqlite_db, tmp_path):
+        """找不到表头时报错"""
+        path = tmp_path / "empty.csv"
+        write_csv(path, [["foo", "bar"], ["1", "2"]])
+        with pytest.raises(ValueError):
+            import_statement(str(path), parser="alipay", progress=None)
+
+    def test_bad_bytes_and_csv_errors_rejected(self, sqlite_db, tmp_path):
+        """编码样本之后的坏字节、CSV 格式错误只拒绝该行，不中断导入"""
+        path = tmp_path / "big.csv"
+        rows = [["日期", "金额", "描述"]] + [["2024-01-05", "-1", f"第{i}笔午餐"] for i in range(3000)]
+        write_csv(path, rows)
+        with open(path, "ab") as f:
+            f.write("2024-01-06,-2,坏".encode("utf-8") + b"\xff\xfe" + b"\r\n")
+            f.write(b"2024-01-06,-3," + b"x" * (csv.field_size_limit() + 10) + b"\r\n")
+            f.write("2024-01-07,-4,晚餐\r\n".encode("utf-8"))
+        assert path.stat().st_size > 65536
+        assert detect_encoding(str(path)) == "utf-8"
+
+        report = import_statement(str(path), parser="csv", batch_size=1000, progress=None)
+
+        assert report["inserted"] == 3001
+        assert report["rejected"] == 2
+        with open(report["error_file"], encoding="utf-8-sig") as f:
+            rejected = list(csv.reader(f))
+        assert [row[0] for row in rejected[1:]] == ["3002", "3003"]
+        assert "\\xff" in rejected[1][-1]
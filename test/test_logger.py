@@ -0,0 +1,50 @@
+"""
+测试 logger 模块：级别过滤、时间戳缓存与后台写出
+"""
+
+import json
+from unittest.mock import patch
+
+from code.logger import Logger
+
+
+class TestLogger:
+    """测试 Logger"""
+
+    def test_level_filter_short_circuits(self, capsys):
+        """低于阈值的消息不格式化也不输出"""
+        logger = Logger(level="WARNING")
+        with patch("code.logger.time.strftime") as strftime:
+            logger.log("忽略", "INFO")
+        strftime.assert_not_called()
+        logger.log("保留", "error")
+        out = capsys.readouterr().out
+        assert "忽略" not in out and "[ERROR] 保留" in out
+
+    def test_timestamp_cached_per_second(self):
+        """同一秒内只格式化一次"""
+        logger = Logger(console=False)
+        with patch("code.logger.time.time", return_value=1700000000.2), \
+                patch("code.logger.time.strftime", return_value="T") as strftime:
+            for _ in range(100):
+                logger.log("x")
+        assert strftime.call_count == 1
+
+    def test_background_writer_and_json(self, capsys, tmp_path):
+        """后台线程按提交顺序写出，WARNING 立即写完，同时输出 JSON Lines"""
+        path = tmp_path / "app.jsonl"
+        logger = Logger(json_path=str(path)).start()
+        try:
+            for i in range(1000):
+                logger.log(f"行 {i}")
+            logger.log("警告", "WARNING")
+            out = capsys.readouterr().out.splitlines()
+            assert len(out) == 1001 and out[0].endswith("[INFO] 行 0") and out[-1].endswith("[WARNING] 警告")
+        finally:
+            logger.close()
+
+        records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert records[-1]["level"] == "WARNING" and records[0]["message"] == "行 0"
+        # 停止后恢复同步写出
+        logger.log("同步")
+        assert "同步" in capsys.readouterr().out
@@ -0,0 +1,131 @@
+"""
+测试 migrations 模块：版本化迁移与索引
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from code.migrations import CURRENT_VERSION, Migration, MigrationError, get_schema_version, migrate
+from code.storage import SQLiteBackend
+
+
+def index_names(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%'")
+    names = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return names
+
+
+class TestMigrations:
+    """测试迁移执行器"""
+
+    def test_fresh_database_reaches_current_version(self, tmp_path):
+        """新库一次升级到最新版本并创建索引"""
+        backend = SQLiteBackend(str(tmp_path / "m.db"))
+        conn = backend.connect()
+
+        applied = migrate(conn, backend)
+
+        assert applied == list(range(1, CURRENT_VERSION + 1))
+        assert get_schema_version(conn, backend) == CURRENT_VERSION
+        assert {
+            "idx_records_type_date",
+            "idx_records_category_date",
+            "idx_records_date",
+            "idx_records_amount",
+            "uq_budgets_period_start",
+        } <= index_names(conn)
+        conn.close()
+
+    def test_current_schema_needs_single_query(self, tmp_path):
+        """已是最新版本时只执行一条 SELECT"""
+        backend = SQLiteBackend(str(tmp_path / "m.db"))
+        conn = backend.connect()
+        migrate(conn, backend)
+
+        executed = []
+        original = conn.cursor
+
+        def counting_cursor(*args, **kwargs):
+            cursor = original(*args, **kwargs)
+            real_execute = cursor.execute
+
+            def execute(operation, params=None):
+                executed.append(operation)
+                return real_execute(operation, params)
+
+            cursor.execute = execute
+            return cursor
+
+        with patch.object(conn, "cursor", side_effect=counting_cursor):
+            assert migrate(conn, backend) == []
+        assert executed == ["SELECT MAX(version) FROM schema_version"]
+        conn.close()
+
+    def test_upgrade_legacy_database_with_duplicate_budgets(self, tmp_path):
+        """旧库有重复预算时中止升级并列出重复行，不删除数据；处理后可继续升级"""
+        backend = SQLiteBackend(str(tmp_path / "m.db"))
+        conn = backend.connect()
+        cursor = conn.cursor()
+        for statement in backend.schema_statements():
+            cursor.execute(statement)
+        for amount in (100, 200):
+            cursor.execute(
+                "INSERT INTO budgets (period, amount, start_date, end_date) VALUES (%s, %s, %s, %s)",
+                ("month", amount, "2024-01-01", "2024-01-31")
+            )
+        conn.commit()
+
+        with pytest.raises(MigrationError, match="id=1 .*id=2 "):
+            migrate(conn, backend)
+        assert get_schema_version(conn, backend) == 2
+        cursor.execute("SELECT COUNT(*) FROM budgets")
+        assert cursor.fetchone()[0] == 2
+
+        cursor.execute("DELETE FROM budgets WHERE id = 1")
+        conn.commit()
+        assert migrate(conn, backend) == list(range(3, CURRENT_VERSION + 1))
+        cursor.execute("SELECT amount FROM budgets")
+        assert [float(row[0]) for row in cursor.fetchall()] == [200.0]
+        conn.close()
+
+    def test_rollup_backfill_skips_undated_records(self, tmp_path):
+        """旧库中没有日期的记录不会让汇总表回填失败"""
+        backend = SQLiteBackend(str(tmp_path / "m.db"))
+        conn = backend.connect()
+        cursor = conn.cursor()
+        for statement in backend.schema_statements():
+            cursor.execute(statement)
+        cursor.executemany(
+            "INSERT INTO records (type, amount, description, date) VALUES (%s, %s, %s, %s)",
+            [("expense", 5, "有日期", "2024-03-02"), ("expense", 7, "无日期", None)]
+        )
+        conn.commit()
+
+        assert migrate(conn, backend) == list(range(1, CURRENT_VERSION + 1))
+        cursor.execute("SELECT year, month, total_cents, count FROM monthly_rollups")
+        assert cursor.fetchall() == [(2024, 3, 500, 1)]
+        conn.close()
+
+    def test_target_version_and_custom_migrations(self, tmp_path):
+        """可以升级到指定版本，后续再继续升级"""
+        backend = SQLiteBackend(str(tmp_path / "m.db"))
+        conn = backend.connect()
+        migrations = [
+            Migration(1, "t", ["CREATE TABLE t (x INTEGER)"]),
+            Migration(2, "t2", {"sqlite": ["CREATE TABLE t2 (x INTEGER)"], "mysql": []}),
+        ]
+        assert migrate(conn, backend, target=1, migrations=migrations) == [1]
+        assert migrate(conn, backend, migrations=migrations) == [2]
+        assert get_schema_version(conn, backend) == 2
+        conn.close()
+
+
+def test_init_database_uses_migrations(sqlite_db, capsys):
+    """init_database 第二次调用不再建表"""
+    from code.database import init_database
+
+    init_database()
+    assert "数据库初始化完成" in capsys.readouterr().out
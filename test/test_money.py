@@ -0,0 +1,149 @@
+"""
+Money 金额类型测试
+"""
+
+import copy
+import pickle
+from decimal import Decimal
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from code.money import Money, money_fields
+from code.utils import format_currency, to_cents
+
+
+class TestMoney:
+    """构造、比较与运算"""
+
+    def test_parse(self):
+        assert Money.parse("1234.5").cents == 123450
+        assert Money.parse("¥1,234.50").cents == 123450
+        assert Money.parse("-12.3").cents == -1230
+        assert Money.parse(".5").cents == 50
+        assert Money.parse("0.125").cents == 13  # 超过两位小数按四舍五入
+        assert Money.parse("1e3").cents == 100000
+        for bad in ("", "abc", "-", "1.2.3", "NaN", "inf"):
+            with pytest.raises(ValueError):
+                Money.parse(bad)
+
+    def test_of(self):
+        assert Money.of(12).cents == 1200
+        assert Money.of(0.1).cents == 10
+        assert Money.of(0.285).cents == 29
+        assert Money.of(Decimal("12.345")).cents == 1235
+        assert Money.of(Fraction(1, 3)).cents == 33
+        assert Money.of(np.int64(5)).cents == 500
+        with pytest.raises(TypeError):
+            Money.of(None)
+        with pytest.raises(TypeError):
+            Money(1.5)
+
+    def test_exact_equality_and_hash(self):
+        """与 int / Decimal / float 按数值精确比较，哈希一致"""
+        assert Money(500) == 5 and hash(Money(500)) == hash(5)
+        assert Money(1230) == Decimal("12.30") and hash(Money(1230)) == hash(Decimal("12.30"))
+        assert Money(1050) == 10.5 and hash(Money(1050)) == hash(10.5)
+        # 0.1 的二进制浮点不等于 1 角
+        assert Money(10) != 0.1
+        assert Money(10) == Fraction(1, 10)
+        assert len({Money(500), 5, Decimal("5.00")}) == 1
+        assert Money(100) != "1.00"
+        assert Money(100) < 2 and Money(100) >= Decimal("1")
+
+    def test_arithmetic(self):
+        assert Money(10) + Money(20) == Money(30)
+        assert sum([Money(10), Money(20)]) == Money(30)
+        assert Money(100) - 0.5 == Money(50)
+        assert Money(1000) * 3 == Money(3000)
+        assert Money(1000) * Decimal("0.333") == Money(333)
+        assert Money(1000) / 3 == Money(333)
+        assert Money(850) / Money(1000) == 0.85
+        assert -Money(5) == Money(-5) and abs(Money(-5)) == Money(5)
+        assert int(Money(-199)) == -1 and float(Money(199)) == 1.99
+
+    def test_no_float_drift(self):
+        """十万笔 0.1 元合计精确等于 1 万元"""
+        total = Money.total([0.1] * 100000)
+        assert total == 10000
+        assert sum([0.1] * 100000) != 10000
+
+    def test_immutable_and_copy(self):
+        m = Money(123)
+        with pytest.raises(AttributeError):
+            m.cents = 1
+        with pytest.raises(AttributeError):
+            m.other = 1
+        assert copy.deepcopy(m) is m
+        assert pickle.loads(pickle.dumps(m)) == m
+
+    def test_format(self):
+        assert str(Money(-5)) == "-0.05"
+        assert repr(Money(123450)) == "Money('1234.50')"
+        assert Money(123456789).format() == "¥1,234,567.89"
+        assert Money(-150).format() == "-¥1.50"
+        assert f"{Money(123456):,.2f}" == "1,234.56"
+        assert format_currency(Money(123456)) == "¥1,234.56"
+        assert Money(1230).to_decimal() == Decimal("12.30")
+        assert to_cents(Money(42)) == 42
+
+    def test_bulk_conversion(self):
+        cents = Money.to_cents_array([Money(1), Decimal("0.02"), 0.03, "0.04", 1])
+        assert cents.dtype == np.int64
+        assert cents.tolist() == [1, 2, 3, 4, 100]
+        floats = np.array([0.285, -1.005, 12.5, 0.0])
+        assert Money.to_cents_array(floats).tolist() == [Money.of(v).cents for v in floats.tolist()]
+        assert Money.from_cents_array(np.array([5, -5])) == [Money(5), Money(-5)]
+
+    def test_money_fields(self):
+        rows = [{"amount": Decimal("1.50")}, {"amount": None}]
+        assert money_fields(rows) == [{"amount": Money(150)}, {"amount": None}]
+        assert type(rows[0]["amount"]) is Money
+
+
+class TestMoneyIntegration:
+    """记录、统计与预算返回 Money"""
+
+    def test_end_to_end_totals(self, sqlite_db):
+        from datetime import date
+
+        from code.budget import Budget
+        from code.record import Record
+        from code.statistics import Statistics
+
+        Record.save_many([
+            {"type": "expense", "amount": 0.1, "description": "零钱", "date": date(2024, 1, 5)}
+            for _ in range(30)
+        ])
+        Record("expense", "19.99", "午餐", date(2024, 1, 6)).save()
+
+        records = Record.get_all()
+        assert all(type(r["amount"]) is Money for r in records)
+        assert Money.total(r["amount"] for r in records) == Decimal("22.99")
+
+        trend = Statistics().get_expense_trend(2024)
+        assert trend == [{"year": 2024, "month": 1, "monthly_expense": Money(2299)}]
+        raw = Statistics().get_expense_trend(2024, start_date=date(2024, 1, 1))
+        assert raw == trend
+
+        Budget("month", 20, date(2024, 1, 1)).save()
+        result = Budget.evaluate_all(date(2024, 1, 15))[0]
+        assert result["spent"] == Money(2299) and result["remaining"] == Money(-299)
+        assert result["status"] == "exceeded"
+
+    def test_record_queries_return_money(self, sqlite_db):
+        from datetime import date
+
+        from code.category import Category
+        from code.record import Record, get_by_category, get_by_date_range
+
+        Category("餐饮", "午餐").save()
+        Record("expense", "19.99", "午餐", date(2024, 1, 6)).save()
+        Record("expense", "0.10", "零钱", date(2024, 2, 1)).save()
+
+        ranged = get_by_date_range(date(2024, 1, 1), date(2024, 1, 31))
+        assert [r["amount"] for r in ranged] == [Money(1999)]
+        by_category = get_by_category("餐饮")
+        assert [r["amount"] for r in by_category] == [Money(1999)]
+        assert all(type(r["amount"]) is Money for r in ranged + by_category)
@@ -0,0 +1,199 @@
+"""
+测试 pool 模块：连接池的借出、归还、淘汰与计数器
+"""
+
+import gc
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+
+from code.pool import ConnectionPool, PooledConnection, PoolExhaustedError
+
+
+class FakeConnection:
+    """模拟的底层连接"""
+
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.rollbacks = 0
+
+    def cursor(self):
+        return "cursor"
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(connect, ping=lambda c: c.alive, **kwargs)
+    return pool, created
+
+
+class TestConnectionPool:
+    """测试ConnectionPool类"""
+
+    def test_close_returns_connection_to_pool(self):
+        """close() 归还连接，下次借出复用同一条连接"""
+        pool, created = make_pool(min_size=0, max_size=2)
+        conn = pool.acquire()
+        assert isinstance(conn, PooledConnection)
+        assert conn.cursor() == "cursor"
+        conn.close()
+        conn.close()  # 重复归还无副作用
+
+        again = pool.acquire()
+        assert again.raw is created[0]
+        assert len(created) == 1
+        assert not created[0].closed
+        again.close()
+
+    def test_context_manager_rolls_back_on_error(self):
+        """with 语句中出现异常时回滚并归还"""
+        pool, created = make_pool(min_size=0, max_size=1)
+        with pytest.raises(RuntimeError):
+            with pool.connection() as conn:
+                raise RuntimeError("boom")
+        assert created[0].rollbacks == 1
+        assert pool.stats()["idle"] == 1
+
+    def test_unreleased_connection_discarded_on_gc(self):
+        """未归还就被回收的连接被关闭并释放名额"""
+        pool, created = make_pool(min_size=0, max_size=1, checkout_timeout=0.05)
+        conn = pool.acquire()
+        del conn
+        gc.collect()
+        assert created[0].closed
+        assert pool.stats()["closed"] == 1
+        pool.acquire().close()
+        assert len(created) == 2
+
+    def test_exhaustion_times_out_and_counts(self):
+        """连接池耗尽时等待超时并计数"""
+        pool, _ = make_pool(min_size=0, max_size=1, checkout_timeout=0.05)
+        held = pool.acquire()
+        with pytest.raises(PoolExhaustedError):
+            pool.acquire()
+        stats = pool.stats()
+        assert stats["exhausted"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["in_use"] == 1
+        held.close()
+
+    def test_waiter_gets_released_connection(self):
+        """等待中的线程在连接归还后立即拿到连接"""
+        pool, created = make_pool(min_size=0, max_size=1, checkout_timeout=2)
+        held = pool.acquire()
+        got = []
+
+        def worker():
+            conn = pool.acquire()
+            got.append(conn.raw)
+            conn.close()
+
+        t = threading.Thread(target=worker)
+        t.start()
+        time.sleep(0.05)
+        held.close()
+        t.join(2)
+
+        assert got == [created[0]]
+        stats = pool.stats()
+        assert stats["waits"] == 1
+        assert stats["wait_time_max"] > 0
+
+    def test_dead_connection_replaced_on_checkout(self):
+        """ping 失败的连接在借出时被替换"""
+        pool, created = make_pool(min_size=0, max_size=1, ping_interval=0)
+        pool.acquire().close()
+        created[0].alive = False
+
+        conn = pool.acquire()
+        assert conn.raw is created[1]
+        assert created[0].closed
+        assert pool.stats()["ping_failures"] == 1
+        conn.close()
+
+    def test_idle_eviction_keeps_min_size(self):
+        """空闲超时的连接被淘汰，但保留 min_size 个"""
+        pool, created = make_pool(min_size=1, max_size=3, idle_timeout=10)
+        conns = [pool.acquire() for _ in range(3)]
+        for c in conns:
+            c.close()
+
+        with patch("code.pool.time.monotonic", return_value=time.monotonic() + 60):
+            pool.evict_idle()
+
+        stats = pool.stats()
+        assert stats["size"] == 1
+        assert stats["evicted"] == 2
+
+    def test_reset_called_on_release(self):
+        """归还时调用 reset 清理事务状态"""
+        resets = []
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, reset=resets.append)
+        conn = pool.acquire()
+        raw = conn.raw
+        conn.close()
+        assert resets == [raw]
+
+    def test_prefill_and_resize(self):
+        """预建连接与调整大小"""
+        pool, created = make_pool(min_size=2, max_size=4)
+        pool.prefill()
+        assert pool.stats()["idle"] == 2
+
+        pool.resize(min_size=0, max_size=1)
+        stats = pool.stats()
+        assert stats["size"] == 1
+        assert stats["max_size"] == 1
+
+    def test_invalid_sizes(self):
+        """非法大小配置"""
+        with pytest.raises(ValueError):
+            ConnectionPool(FakeConnection, min_size=3, max_size=2)
+
+
+class FakeBackend:
+    """模拟的存储后端"""
+
+    errors = (OSError,)
+
+    def connect(self):
+        return FakeConnection()
+
+    def ping(self, conn):
+        return conn.alive
+
+    def reset(self, conn):
+        conn.rollback()
+
+
+def test_get_connection_borrows_from_pool():
+    """database.get_connection 从共享连接池借出"""
+    from code import database
+
+    previous = database.get_backend()
+    database.set_backend(FakeBackend())
+    try:
+        conn = database.get_connection()
+        raw = conn.raw
+        conn.close()
+        again = database.get_connection()
+        assert again.raw is raw
+        again.close()
+        assert database.get_pool_stats()["checkouts"] == 2
+    finally:
+        database.set_backend(previous)
@@ -0,0 +1,125 @@
+"""
+测试 record 模块：批量写入
+"""
+
+from datetime import date
+
+import pytest
+
+from code.category import Category
+from code.record import Record
+
+
+class TestSaveMany:
+    """测试Record.save_many"""
+
+    def test_save_many_categorizes_and_returns_ids(self, sqlite_db):
+        """内存分类、按批提交并返回连续 id"""
+        Category("餐饮", "星巴克,麦当劳").save()
+        items = [
+            Record("expense", 30, "星巴克", date(2024, 1, 1)),
+            {"type": "expense", "amount": 12.5, "description": "麦当劳", "date": date(2024, 1, 2)},
+            {"type": "income", "amount": 500, "description": "工资", "date": date(2024, 1, 3)},
+            {"type": "expense", "amount": 8, "description": "星巴克", "date": date(2024, 1, 4),
+             "category_id": None},
+        ]
+
+        result = Record.save_many(items, batch_size=3)
+
+        assert result["inserted"] == 4
+        assert result["batches"] == 2
+        assert result["ids"] == [1, 2, 3, 4]
+        rows = {r["id"]: r for r in Record.get_all()}
+        assert rows[1]["category"] == "餐饮"
+        assert rows[2]["category"] == "餐饮"
+        assert rows[3]["category"] is None
+        assert rows[4]["category"] is None  # 显式给出的 category_id 不再匹配
+
+    def test_save_many_accepts_generator(self, sqlite_db):
+        """可以直接传入生成器，不需要先构造列表"""
+        rows = ({"type": "expense", "amount": i, "description": f"item{i}", "date": date(2024, 1, 1)}
+                for i in range(1, 2501))
+        result = Record.save_many(rows, batch_size=1000)
+        assert result["inserted"] == 2500
+        assert result["batches"] == 3
+        assert len(Record.get_all()) == 2500
+
+    def test_save_many_rolls_back_failed_batch(self, sqlite_db):
+        """失败的批次整体回滚，之前已提交的批次保留"""
+        rows = [
+            {"type": "expense", "amount": 1, "description": "ok", "date": date(2024, 1, 1)},
+            {"type": "expense", "amount": 2, "description": "ok", "date": date(2024, 1, 1)},
+            {"type": "bogus", "amount": 3, "description": "bad", "date": date(2024, 1, 1)},
+        ]
+        with pytest.raises(Exception):
+            Record.save_many(rows, batch_size=2)
+        assert len(Record.get_all()) == 2
+
+    def test_failed_save_releases_connection(self, sqlite_db):
+        """单条保存失败时连接照常归还，连续失败不会耗尽连接池"""
+        from code.database import get_pool, get_pool_stats
+
+        for _ in range(get_pool().max_size + 1):
+            with pytest.raises(Exception):
+                Record("bogus", 1, "bad", date(2024, 1, 1)).save()
+        assert get_pool_stats()["in_use"] == 0
+        Record("expense", 1, "ok", date(2024, 1, 1)).save()
+        assert len(Record.get_all()) == 1
+
+    def test_save_many_ids_verified(self, sqlite_db, monkeypatch):
+        """lastrowid 推算的 id 区间与实际插入的行不符时，改为逐行插入并返回真实 id"""
+        Record("expense", 1, "已有记录", date(2024, 1, 1)).save()
+        verify = Record._consecutive_ids
+        # 模拟 id 不连续：推算的区间向前错开一位，落在已有记录上
+        monkeypatch.setattr(Record, "_consecutive_ids",
+                            staticmethod(lambda cursor, first_id, rows: verify(cursor, first_id - 1, rows)))
+        rows = [{"type": "expense", "amount": i + 1, "description": f"d{i}", "date": date(2024, 1, 2)}
+                for i in range(3)]
+        result = Record.save_many(rows)
+        stored = {r["description"]: r["id"] for r in Record.get_all()}
+        assert len(stored) == 4 and result["inserted"] == 3
+        assert result["ids"] == [stored["d0"], stored["d1"], stored["d2"]]
+
+    def test_failed_notification_after_commit_not_raised(self, sqlite_db, monkeypatch):
+        """提交后的事件发布失败不抛给调用方，避免调用方重试造成重复写入"""
+        def broken_emit(event, payload=None):
+            raise RuntimeError("bus down")
+
+        monkeypatch.setattr("code.record.emit", broken_emit)
+        rows = [{"type": "expense", "amount": 1, "description": "x", "date": date(2024, 1, 1)}] * 3
+        assert Record.save_many(rows, batch_size=2)["inserted"] == 3
+        Record("expense", 1, "y", date(2024, 1, 2)).save()
+        assert len(Record.get_all()) == 4
+
+    def test_save_many_empty(self, sqlite_db):
+        """空输入"""
+        assert Record.save_many([]) == {"inserted": 0, "ids": [], "batches": 0}
+
+
+class TestIterAll:
+    """测试Record.iter_all"""
+
+    def test_iter_all_streams_in_order(self, sqlite_db):
+        """逐批返回与 get_all 相同的结果"""
+        rows = [{"type": "expense", "amount": i, "description": f"r{i}", "date": date(2024, 1, 1 + i % 28)}
+                for i in range(1, 101)]
+        Record.save_many(rows)
+
+        streamed = list(Record.iter_all(chunk_size=7))
+        assert streamed == Record.get_all()
+
+    def test_iter_all_early_exit_releases_connection(self, sqlite_db):
+        """提前退出时连接被丢弃，连接池名额释放"""
+        from code.database import get_pool_stats
+
+        Record.save_many([{"type": "expense", "amount": 1, "description": "x", "date": date(2024, 1, 1)}] * 10)
+        before = get_pool_stats()["size"]
+
+        iterator = Record.iter_all(chunk_size=2)
+        next(iterator)
+        assert get_pool_stats()["in_use"] == 1
+        iterator.close()
+
+        stats = get_pool_stats()
+        assert stats["in_use"] == 0
+        assert stats["size"] <= before
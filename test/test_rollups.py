@@ -0,0 +1,90 @@
+"""
+测试 rollups 模块：月度汇总表的增量维护与并行重建
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from code import rollups
+from code.database import get_connection
+from code.record import Record, get_expenses_summary
+from code.statistics import Statistics
+
+
+def rollup_rows():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT year, month, type, category_id, total_cents, count FROM monthly_rollups "
+                   "ORDER BY year, month, type, category_id")
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return rows
+
+
+def seed():
+    Record("expense", Decimal("12.34"), "午餐", date(2024, 1, 5)).save()
+    Record.save_many([
+        {"type": "expense", "amount": Decimal("0.66"), "description": "零食", "date": date(2024, 1, 31)},
+        {"type": "income", "amount": 5000, "description": "工资", "date": date(2024, 2, 1)},
+        {"type": "expense", "amount": Decimal("100.05"), "description": "超市", "date": date(2023, 12, 31)},
+    ], batch_size=2)
+
+
+class TestRollups:
+    """测试月度汇总"""
+
+    def test_maintained_on_write(self, sqlite_db):
+        """save / save_many 在同一事务内累加汇总"""
+        seed()
+        assert rollup_rows() == [
+            (2023, 12, "expense", 0, 10005, 1),
+            (2024, 1, "expense", 0, 1300, 2),
+            (2024, 2, "income", 0, 500000, 1),
+        ]
+        assert get_expenses_summary("month") == [
+            {"period": "2023-12", "total_expense": Decimal("100.05")},
+            {"period": "2024-01", "total_expense": Decimal("13.00")},
+        ]
+        assert [r["period"] for r in get_expenses_summary("year")] == [2023, 2024]
+
+    def test_statistics_read_rollups_and_fall_back(self, sqlite_db):
+        """按年月统计读汇总表，日期区间回退到原始记录"""
+        seed()
+        stats = Statistics()
+        assert stats.get_expense_by_category(2024, 1) == [{"category": "未分类", "total": Decimal("13.00")}]
+        assert [(r["year"], r["month"]) for r in stats.get_expense_trend()] == [(2023, 12), (2024, 1)]
+        ranged = stats.get_income_vs_expense(start_date=date(2024, 1, 10), end_date=date(2024, 2, 28))
+        assert {r["type"]: float(r["total"]) for r in ranged} == {"expense": 0.66, "income": 5000.0}
+
+    def test_rebuild(self, sqlite_db):
+        """重建后与增量维护的结果一致，无记录的月份被清空"""
+        seed()
+        expected = rollup_rows()
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE monthly_rollups SET total_cents = 0, count = 0")
+        cursor.execute("INSERT INTO monthly_rollups VALUES (1999, 1, 'expense', 0, 1, 1)")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        assert rollups.rebuild(workers=3) == 4
+        assert rollup_rows() == expected
+
+    def test_undated_records_skipped(self, sqlite_db):
+        """没有日期的记录不计入汇总，写入与重建都不会失败"""
+        seed()
+        expected = rollup_rows()
+        conn = get_connection()
+        cursor = conn.cursor()
+        row = ("expense", Decimal("9.99"), None, "无日期", None)
+        cursor.execute("INSERT INTO records (type, amount, category_id, description, date) "
+                       "VALUES (%s, %s, %s, %s, %s)", row)
+        rollups.apply_rows(cursor, [row])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        assert rollup_rows() == expected
+        assert rollups.rebuild(workers=2) == 3
+        assert rollup_rows() == expected
@@ -0,0 +1,166 @@
+"""
+测试 search 模块：键集分页
+"""
+
+from datetime import date
+
+import pytest
+
+from code.database import get_connection
+from code.pagination import InvalidPageToken, paginate
+from code.record import Record
+from code.search import SearchEngine
+
+
+def seed(count=23):
+    rows = [
+        {"type": "expense" if i % 3 else "income", "amount": (i * 7) % 10 + 1,
+         "description": f"item{i}", "date": date(2024, 1, 1 + i % 5)}
+        for i in range(count)
+    ]
+    Record.save_many(rows)
+
+
+def collect_pages(fetch, **kwargs):
+    pages, token = [], None
+    while True:
+        page = fetch(page_token=token, **kwargs)
+        pages.append(page["records"])
+        token = page["next_token"]
+        if token is None:
+            return pages
+
+
+class TestKeysetPagination:
+    """测试键集分页"""
+
+    @pytest.mark.parametrize("sort_by", ["date", "amount", "type", "category"])
+    @pytest.mark.parametrize("sort_order", ["DESC", "ASC"])
+    def test_pages_cover_full_ordered_result(self, sqlite_db, sort_by, sort_order):
+        """逐页拼接的结果与一次性查询顺序一致，且无重复无遗漏"""
+        seed()
+        pages = collect_pages(SearchEngine.search_page, page_size=5,
+                              sort_by=sort_by, sort_order=sort_order)
+        flat = [r["id"] for page in pages for r in page]
+        assert len(flat) == len(set(flat)) == 23
+        assert all(len(page) == 5 for page in pages[:-1])
+
+        column = SearchEngine.SORT_MAPPING[sort_by][1]
+        keys = [(r[column], r["id"]) for page in pages for r in page]
+        assert keys == sorted(keys, reverse=(sort_order == "DESC"))
+
+    def test_filters_apply_to_every_page(self, sqlite_db):
+        """过滤条件在每一页都生效"""
+        seed()
+        pages = collect_pages(SearchEngine.search_page, page_size=4, record_type="income")
+        flat = [r for page in pages for r in page]
+        assert flat and all(r["type"] == "income" for r in flat)
+        assert len(flat) == len(SearchEngine.search_records(record_type="income"))
+
+    @pytest.mark.parametrize("sort_order", ["DESC", "ASC"])
+    def test_null_sort_keys_not_skipped(self, sqlite_db, sort_order):
+        """排序键为 NULL 的行在翻页时不会被跳过"""
+        seed(12)
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE records SET date = NULL WHERE id % 2 = 0")
+        conn.commit()
+        cursor.close()
+        conn.close()
+        for fetch in (SearchEngine.search_page, Record.get_page):
+            pages = collect_pages(fetch, page_size=5, sort_order=sort_order)
+            assert [len(p) for p in pages] == [5, 5, 2]
+            flat = [r for page in pages for r in page]
+            assert sorted(r["id"] for r in flat) == list(range(1, 13))
+            # NULL 行单独成段：DESC 时在最后、ASC 时在最前，段内按 id 排序
+            nulls = [r["id"] for r in flat if r["date"] is None]
+            expected = sorted(nulls, reverse=(sort_order == "DESC"))
+            assert [r["id"] for r in (flat[-6:] if sort_order == "DESC" else flat[:6])] == expected
+
+    def test_seek_query_uses_date_index(self, sqlite_db):
+        """续页查询的排序列保持裸列，走 idx_records_date 而不是全表扫描 + 临时排序"""
+        seed(30)
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        executed = []
+        execute = cursor.execute
+
+        def recording_execute(query, params=None):
+            executed.append((query, params))
+            return execute(query, params)
+
+        cursor.execute = recording_execute
+        sql = SearchEngine.SELECT_SQL.format(joins="", where="{where}", order="{order}")
+        token = paginate(cursor, sql, [], [], "r.date", "date", "DESC", 5, None, "fp", "date", True)["next_token"]
+        executed.clear()
+        paginate(cursor, sql, [], [], "r.date", "date", "DESC", 5, token, "fp", "date", True)
+        query, params = executed[0]
+        assert "COALESCE(r.date" not in query
+        cursor.execute = execute
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        plan = " ".join(str(row["detail"]) for row in cursor.fetchall())
+        cursor.close()
+        conn.close()
+        assert "idx_records_date" in plan and "TEMP B-TREE" not in plan
+
+    def test_token_bound_to_query(self, sqlite_db):
+        """令牌不能用于不同的查询条件或排序"""
+        seed()
+        token = SearchEngine.search_page(page_size=5)["next_token"]
+        with pytest.raises(InvalidPageToken):
+            SearchEngine.search_page(page_size=5, page_token=token, record_type="income")
+        with pytest.raises(InvalidPageToken):
+            SearchEngine.search_page(page_size=5, page_token=token, sort_by="amount")
+        with pytest.raises(InvalidPageToken):
+            SearchEngine.search_page(page_size=5, page_token="garbage!")
+
+    def test_record_get_page(self, sqlite_db):
+        """记录列表分页"""
+        seed()
+        pages = collect_pages(Record.get_page, page_size=10)
+        assert [len(p) for p in pages] == [10, 10, 3]
+        flat = [r["id"] for page in pages for r in page]
+        assert sorted(flat) == sorted(r["id"] for r in Record.get_all())
+        with pytest.raises(ValueError):
+            Record.get_page(sort_by="description")
+
+
+class TestFullTextSearch:
+    """测试描述全文检索"""
+
+    DESCRIPTIONS = ["星巴克咖啡", "星巴克星巴克 拿铁", "瑞幸咖啡", "地铁通勤", "Starbucks 美式", "午餐"]
+
+    def seed(self):
+        Record.save_many([
+            {"type": "expense", "amount": 10, "description": d, "date": date(2024, 2, 1 + i)}
+            for i, d in enumerate(self.DESCRIPTIONS)
+        ])
+
+    @pytest.mark.parametrize("keyword", ["星巴克", "咖啡", "地铁", "starbucks", "拿铁", "不存在的词"])
+    def test_same_matches_as_like(self, sqlite_db, keyword):
+        """全文检索与 LIKE 命中的记录一致（短词自动回退）"""
+        self.seed()
+        fulltext = SearchEngine.search_records(keyword=keyword, match_mode='fulltext')
+        like = SearchEngine.search_records(keyword=keyword, match_mode='like')
+        assert sorted(r["id"] for r in fulltext) == sorted(r["id"] for r in like)
+
+    def test_uses_index_and_falls_back(self, sqlite_db):
+        """足够长的检索词走 FTS5，短词回退到 LIKE"""
+        conditions, _, joins, relevance = SearchEngine._build_conditions(keyword="星巴克")
+        assert "records_fts MATCH" in conditions[0] and joins and relevance
+        conditions, _, joins, relevance = SearchEngine._build_conditions(keyword="咖啡")
+        assert conditions == ["r.description LIKE %s"] and not joins and relevance is None
+
+        with pytest.raises(ValueError):
+            SearchEngine.search_records(keyword="星巴克", match_mode="regex")
+
+    def test_relevance_order_and_sync(self, sqlite_db):
+        """按相关度排序，且索引随记录更新同步"""
+        self.seed()
+        results = SearchEngine.quick_search("星巴克")
+        assert [r["description"] for r in results] == ["星巴克星巴克 拿铁", "星巴克咖啡"]
+
+        Record("expense", 5, "星巴克外卖", date(2024, 3, 1)).save()
+        assert len(SearchEngine.quick_search("星巴克")) == 3
+        page = SearchEngine.search_page(page_size=2, keyword="星巴克")
+        assert len(page["records"]) == 2 and page["next_token"]
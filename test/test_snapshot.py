@@ -0,0 +1,140 @@
+"""
+二进制快照测试
+"""
+
+import json
+import pickle
+import struct
+from datetime import date
+
+import numpy as np
+import pytest
+
+from code.analytics import Ledger
+from code.category import Category
+from code.money import Money
+from code.record import Record
+from code.snapshot import (
+    MAGIC, PREFIX, SnapshotError, dump_ledger, dump_user_data, dumps, load, load_ledger,
+    load_user_data, loads,
+)
+
+
+def _rewrite_header(data, mutate):
+    """按 mutate 修改快照头部后重新拼装（数据区不变）"""
+    header_size = PREFIX.unpack_from(data)[3]
+    header = json.loads(data[PREFIX.size:PREFIX.size + header_size])
+    mutate(header)
+    encoded = json.dumps(header).encode("utf-8")
+    return PREFIX.pack(MAGIC, 1, 0, len(encoded)) + encoded + data[PREFIX.size + header_size:]
+
+
+class TestSnapshot:
+    """格式编解码"""
+
+    def test_roundtrip_zero_copy(self):
+        cents = np.arange(1000, dtype=np.int64) * 7
+        data = bytearray(dumps({"cents": cents, "flag": cents % 2 == 0, "name": ["甲", "乙"] * 500}, {"v": 1}))
+        snapshot = loads(data)
+        assert len(snapshot) == 1000 and snapshot.meta == {"v": 1}
+        assert np.array_equal(snapshot["cents"], cents)
+        assert snapshot["flag"].dtype == np.bool_
+        assert snapshot["name"][3] == "乙" and snapshot["name"].values() == ["甲", "乙"]
+        # 数组是缓冲区的视图，不是副本
+        assert np.shares_memory(snapshot["cents"], np.frombuffer(data, dtype=np.uint8))
+
+    def test_load_from_file(self, tmp_path):
+        path = tmp_path / "data.snap"
+        path.write_bytes(dumps({"days": np.array([1, 2, 3], dtype=np.int32)}))
+        assert load(str(path))["days"].tolist() == [1, 2, 3]
+
+    def test_rejects_object_columns(self):
+        with pytest.raises(SnapshotError):
+            dumps({"x": np.array([object()], dtype=object)})
+        with pytest.raises(SnapshotError):
+            dumps({"a": [1, 2], "b": [1]})
+
+    def test_rejects_bad_input(self):
+        data = bytearray(dumps({"cents": np.arange(4, dtype=np.int64)}))
+        with pytest.raises(SnapshotError):
+            loads(pickle.dumps({"user": "x"}))
+        with pytest.raises(SnapshotError):
+            loads(data[:-4])
+        corrupted = bytearray(data)
+        corrupted[-1] ^= 0xFF
+        with pytest.raises(SnapshotError):
+            loads(corrupted)
+        assert loads(corrupted, verify=False)["cents"][0] == 0
+
+        future = bytearray(data)
+        struct.pack_into("<H", future, len(MAGIC), 99)
+        with pytest.raises(SnapshotError, match="版本"):
+            loads(future)
+
+    def test_rejects_object_dtype_in_header(self):
+        data = dumps({"cents": np.arange(2, dtype=np.int64)})
+        header_size = PREFIX.unpack_from(data)[3]
+        header = data[PREFIX.size:PREFIX.size + header_size].replace(b'"<i8"', b'"|O" ')
+        with pytest.raises(SnapshotError):
+            loads(data[:PREFIX.size] + header + data[PREFIX.size + header_size:], verify=False)
+
+    def test_malformed_header_raises_snapshot_error(self):
+        data = dumps({"cents": np.arange(2, dtype=np.int64), "name": ["甲", "乙"]})
+        mutations = [
+            lambda h: h["columns"][0].pop("offset"),
+            lambda h: h["columns"][0].pop("name"),
+            lambda h: h["columns"][0].pop("dtype"),
+            lambda h: h["columns"][0].update(offset="x"),
+            lambda h: h["columns"][0].update(dtype={"names": ["a"], "formats": ["<i8"]}),
+            lambda h: h["columns"][0].update(dtype="bogus"),
+            lambda h: h["columns"].__setitem__(0, ["not", "a", "dict"]),
+            lambda h: h["columns"][1]["codes"].pop("nbytes"),
+            lambda h: h.update(columns=7),
+            lambda h: h.update(meta="x"),
+        ]
+        for mutate in mutations:
+            with pytest.raises(SnapshotError):
+                loads(_rewrite_header(data, mutate), verify=False)
+        assert loads(_rewrite_header(data, lambda h: None), verify=False)["name"][1] == "乙"
+
+    def test_invalid_string_table(self):
+        data = bytearray(dumps({"name": ["ab"]}))
+        data[data.rindex(b"ab")] = 0xFF
+        with pytest.raises(SnapshotError, match="UTF-8"):
+            loads(data, verify=False)
+
+    def test_load_empty_file(self, tmp_path):
+        path = tmp_path / "empty.snap"
+        path.write_bytes(b"")
+        with pytest.raises(SnapshotError):
+            load(str(path))
+
+
+class TestUserDataAndLedger:
+    """用户数据与账本快照"""
+
+    def test_user_data(self, sqlite_db):
+        Record("expense", "12.34", "午餐", date(2024, 1, 5)).save()
+        Record("income", 8000, "工资", date(2024, 1, 10)).save()
+        snapshot = load_user_data(dump_user_data({"name": "张三", "currency": "CNY"}, Record.get_all()))
+        assert snapshot.meta["user"]["name"] == "张三"
+        rows = sorted(snapshot.iter_rows(), key=lambda r: r["days"])
+        assert [r["type"] for r in rows] == ["expense", "income"]
+        assert [Money(r["amount_cents"]) for r in rows] == [Money.parse("12.34"), Money(800000)]
+        assert rows[0]["description"] == "午餐"
+
+    def test_empty_user_data(self):
+        snapshot = load_user_data(dump_user_data({"name": "空"}))
+        assert len(snapshot) == 0 and list(snapshot.iter_rows()) == []
+
+    def test_ledger_roundtrip(self, sqlite_db):
+        Category("餐饮", "星巴克").save()
+        Record("expense", 30, "星巴克", date(2024, 2, 1)).save()
+        Record("income", 100, "红包", date(2024, 2, 3)).save()
+        ledger = Ledger.load()
+        restored = load_ledger(dump_ledger(ledger))
+        for name in ("cents", "days", "categories", "types", "months"):
+            assert np.array_equal(getattr(restored, name), getattr(ledger, name))
+        assert restored.category_names == ledger.category_names
+        with pytest.raises(SnapshotError):
+            load_ledger(dumps({"x": np.zeros(1)}))
@@ -0,0 +1,114 @@
+"""
+测试 storage 模块：在嵌入式 SQLite 后端上运行真实的业务 SQL
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from code.storage import SQLiteBackend, create_backend, _translate
+
+
+class TestDialect:
+    """测试方言转换"""
+
+    def test_translate_placeholders(self):
+        """%s 转为 ?，%% 还原为 %"""
+        assert _translate("SELECT * FROM t WHERE a = %s AND b LIKE %s") == \
+            "SELECT * FROM t WHERE a = ? AND b LIKE ?"
+        assert _translate("SELECT '100%%' WHERE x = %s") == "SELECT '100%' WHERE x = ?"
+
+    def test_create_backend_unknown(self):
+        """未知后端名称"""
+        with pytest.raises(ValueError):
+            create_backend("oracle")
+
+    def test_sqlite_functions_and_pragmas(self, tmp_path):
+        """注册的 MySQL 函数与 WAL 模式"""
+        backend = SQLiteBackend(str(tmp_path / "t.db"))
+        conn = backend.connect()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT YEAR(%s) AS y, MONTH(%s) AS m, DATE_FORMAT(%s, '%%Y-%%m') AS p",
+                       ("2024-03-15", "2024-03-15", "2024-03-15"))
+        assert cursor.fetchone() == {"y": 2024, "m": 3, "p": "2024-03"}
+        cursor.execute("PRAGMA journal_mode")
+        assert cursor.fetchone()["journal_mode"] == "wal"
+        conn.close()
+
+    def test_memory_database_shared_between_connections(self):
+        """内存库在多条连接之间共享"""
+        backend = SQLiteBackend(":memory:")
+        a = backend.connect()
+        a.cursor().execute("CREATE TABLE t (x INTEGER)")
+        a.cursor().execute("INSERT INTO t VALUES (%s)", (1,))
+        a.commit()
+        b = backend.connect()
+        cursor = b.cursor()
+        cursor.execute("SELECT x FROM t")
+        assert cursor.fetchall() == [(1,)]
+        a.close()
+        b.close()
+        backend.close()
+
+
+class TestBusinessQueriesOnSQLite:
+    """在 SQLite 上运行 Record / Search / Statistics / Budget 的真实 SQL"""
+
+    def seed(self):
+        from code.category import Category
+        from code.record import Record
+
+        Category("餐饮", "星巴克,麦当劳").save()
+        Category("交通", "地铁,打车").save()
+        Record("expense", 30.5, "星巴克", date(2024, 1, 5)).save()
+        Record("expense", 4, "地铁", date(2024, 1, 6)).save()
+        Record("expense", 20, "麦当劳", date(2024, 2, 1)).save()
+        Record("income", 1000, "工资", date(2024, 1, 31)).save()
+
+    def test_record_roundtrip(self, sqlite_db):
+        """保存并读取记录，类型与 MySQL 驱动一致"""
+        from code.record import Record
+
+        self.seed()
+        records = Record.get_all()
+        assert len(records) == 4
+        assert records[0]["date"] == date(2024, 2, 1)
+        assert records[0]["amount"] == Decimal("20.00")
+        starbucks = [r for r in records if r["description"] == "星巴克"][0]
+        assert starbucks["category"] == "餐饮"
+
+    def test_search(self, sqlite_db):
+        """多条件搜索"""
+        from code.search import SearchEngine
+
+        self.seed()
+        results = SearchEngine.search_records(record_type="expense", min_amount=10,
+                                              sort_by="amount", sort_order="ASC")
+        assert [r["description"] for r in results] == ["麦当劳", "星巴克"]
+        assert SearchEngine.quick_search("地铁")[0]["category"] == "交通"
+
+    def test_statistics(self, sqlite_db):
+        """统计查询中的 YEAR()/MONTH() 与 HAVING 别名"""
+        from code.statistics import Statistics
+
+        self.seed()
+        stats = Statistics()
+        by_category = stats.get_expense_by_category(2024, 1)
+        assert {r["category"]: float(r["total"]) for r in by_category} == {"餐饮": 30.5, "交通": 4.0}
+        trend = stats.get_expense_trend()
+        assert [(r["year"], r["month"]) for r in trend] == [(2024, 1), (2024, 2)]
+        totals = {r["type"]: float(r["total"]) for r in stats.get_income_vs_expense(2024)}
+        assert totals == {"expense": 54.5, "income": 1000.0}
+
+    def test_budget(self, sqlite_db):
+        """预算保存与当前支出计算"""
+        from code.budget import Budget
+        from code.record import Record
+
+        today = date.today()
+        Budget("month", 100, today.replace(day=1)).save()
+        Record("expense", 85, "房租", today).save()
+        assert Budget.get_current_budget("month")["amount"] == Decimal("100.00")
+        assert Budget.calculate_current_expense("month") == 85.0
+        assert Budget.check_budget_alert()["type"] == "warning"
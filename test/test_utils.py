@@ -331,5 +331,33 @@ def test_comprehensive_coverage():
     assert True
 
 
+class TestParseDates:
+    """批量日期解析"""
+
+    def test_fast_path_matches_strptime(self):
+        from datetime import datetime
+        from code.utils import parse_date
+        for text in ("2024-01-01", "2000-02-29", "1999-12-31", "2024-1-1", "0001-01-01"):
+            assert parse_date(text) == datetime.strptime(text, "%Y-%m-%d").date()
+        for text in ("2024-13-01", "2023-02-29", "2024-0a-01", "2024-01-01 "):
+            assert parse_date(text) is None
+
+    def test_parse_dates_reports_bad_indices(self):
+        from code.utils import parse_dates
+        with patch('code.utils.log') as mock_log:
+            values, bad = parse_dates(["2024-01-05", "bad", date(2024, 2, 1), None, "2024-02-30"])
+        assert values == [date(2024, 1, 5), None, date(2024, 2, 1), None, None]
+        assert bad == [1, 3, 4]
+        mock_log.assert_not_called()
+
+    def test_parse_dates_numpy(self):
+        import numpy as np
+        from code.utils import parse_dates
+        values, bad = parse_dates(["2024-01-05", "x", "2024-01-06"], as_numpy=True)
+        assert values.dtype == np.dtype("datetime64[D]")
+        assert values[0] == np.datetime64("2024-01-05") and np.isnat(values[1])
+        assert bad == [1]
+
+
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])